@@ -0,0 +1,421 @@
+#!/usr/bin/env python3
+"""
+여러 기획서를 각각 독립된 작업으로 실행하는 일괄 실행기
+
+사용 예:
+    python batch.py specs/                       # specs 안의 하위 폴더와 기획서 파일 하나하나가 작업
+    python batch.py nightly.json --workers 2     # 작업 목록 파일
+    python batch.py specs/ --resume              # 끝나지 않은 작업만 이어서 실행
+
+작업 목록 파일 형식 (spec 은 목록 파일 기준 상대 경로 가능, settings 는 config 이름과 값):
+    {
+        "defaults": {"MAX_RUNTIME_HOURS": 1},
+        "jobs": [
+            {"name": "crm", "spec": "specs/crm", "settings": {"MODEL_NAME": "llama3"}},
+            {"spec": "specs/shop.md"}
+        ]
+    }
+
+작업마다 BATCH_OUTPUT_DIR/<작업 이름>/ 에 출력, 로그, 상태 저널이 따로 저장되며,
+작업은 별도 프로세스에서 실행되므로 작업별 설정이 다른 작업에 영향을 주지 않습니다.
+"""
+import os
+import re
+import sys
+import copy
+import json
+import logging
+import argparse
+import multiprocessing
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field, asdict
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+import config
+import utils
+from doc_loader import SUPPORTED_EXTENSIONS
+from host_pool import HostPool
+
+# 로거 설정
+logger = logging.getLogger(__name__)
+
+# 작업 결과 상태
+FINISHED = "completed"
+FAILED = "failed"
+INTERRUPTED = "interrupted"
+
+
+@dataclass
+class BatchJob:
+    """기획서 하나에 대한 실행 작업"""
+    name: str
+    spec: str  # 기획서 폴더 또는 파일
+    settings: Dict[str, Any] = field(default_factory=dict)  # 이 작업에만 적용할 config 값
+    status: str = "pending"
+    attempts: int = 0
+    result: Dict[str, Any] = field(default_factory=dict)
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'BatchJob':
+        return cls(**{key: value for key, value in data.items() if key in cls.__dataclass_fields__})
+
+
+def validate_settings(settings: Dict[str, Any]) -> Dict[str, Any]:
+    """작업별 설정이 config 에 있는 이름인지 확인합니다."""
+    for name in settings:
+        if not name.isupper() or not hasattr(config, name):
+            raise ValueError(f"Unknown setting: {name}")
+    return dict(settings)
+
+
+def job_name(spec: str, used: set) -> str:
+    """기획서 경로로 출력 폴더 이름으로 쓸 수 있는 고유한 작업 이름을 만듭니다."""
+    base = os.path.basename(os.path.normpath(spec))
+    if os.path.isfile(spec):
+        base = os.path.splitext(base)[0]
+    base = re.sub(r"[^\w.-]+", "_", base).strip("._") or "job"
+    name, suffix = base, 2
+    while name in used:
+        name, suffix = f"{base}_{suffix}", suffix + 1
+    used.add(name)
+    return name
+
+
+def discover_jobs(directory: str) -> List[BatchJob]:
+    """폴더 안의 하위 폴더(여러 문서로 된 기획서)와 기획서 파일을 각각 작업으로 만듭니다."""
+    jobs, used = [], set()
+    for entry in sorted(os.scandir(directory), key=lambda entry: entry.name):
+        if entry.name.startswith((".", "~$")):
+            continue
+        if entry.is_dir() or entry.is_file() and entry.name.lower().endswith(SUPPORTED_EXTENSIONS):
+            jobs.append(BatchJob(name=job_name(entry.path, used), spec=entry.path))
+    return jobs
+
+
+def load_manifest(path: str) -> List[BatchJob]:
+    """작업 목록 파일(JSON)을 읽습니다. 최상위가 목록이면 작업 목록으로 봅니다."""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if isinstance(data, list):
+        data = {"jobs": data}
+
+    base_dir = os.path.dirname(os.path.abspath(path))
+    defaults = validate_settings(data.get("defaults", {}))
+    jobs, used = [], set()
+    for entry in data.get("jobs", []):
+        if isinstance(entry, str):
+            entry = {"spec": entry}
+        if "spec" not in entry:
+            raise ValueError(f"Manifest job without spec: {entry}")
+        spec = os.path.join(base_dir, entry["spec"])
+        if "name" in entry:
+            name = job_name(entry["name"], used)
+        else:
+            name = job_name(spec, used)
+        settings = {**defaults, **validate_settings(entry.get("settings", {}))}
+        jobs.append(BatchJob(name=name, spec=spec, settings=settings))
+    return jobs
+
+
+def ollama_capacity(hosts: List[str] = None, jobs_per_host: int = None) -> int:
+    """응답하는 Ollama 서버 수 × 서버당 작업 수로 동시 작업 수를 정합니다."""
+    hosts = hosts or config.OLLAMA_HOSTS or [config.OLLAMA_HOST]
+    jobs_per_host = config.BATCH_JOBS_PER_HOST if jobs_per_host is None else jobs_per_host
+    pool = HostPool(hosts, probe_interval=0)
+    try:
+        healthy = sum(pool.probe(host) for host in pool.hosts)
+    finally:
+        pool.close()
+        pool.session.close()
+    if not healthy:
+        logging.warning(f"No Ollama host responded ({', '.join(hosts)}); running one job at a time")
+    return max(1, healthy) * max(1, jobs_per_host)
+
+
+def _attach_job_logging(name: str, log_dir: str) -> List[logging.Handler]:
+    """작업 로그를 작업 폴더의 파일과 (작업 이름을 붙여) 콘솔에 기록합니다."""
+    os.makedirs(log_dir, exist_ok=True)
+    log_file = os.path.join(log_dir, f"app_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log")
+    handlers = [logging.FileHandler(log_file, encoding="utf-8"), logging.StreamHandler()]
+    handlers[0].setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    handlers[1].setFormatter(logging.Formatter(f'%(asctime)s - [{name}] %(levelname)s - %(message)s'))
+
+    root = logging.getLogger()
+    root.setLevel(logging.DEBUG if config.DEBUG_MODE else logging.INFO)
+    for handler in handlers:
+        root.addHandler(handler)
+    return handlers
+
+
+def run_job(job: Dict[str, Any], output_root: str, resume: bool) -> Dict[str, Any]:
+    """작업 프로세스에서 기획서 하나를 실행합니다.
+
+    작업별 설정은 이 프로세스의 config 에만 적용하고, 같은 프로세스가 다음 작업을
+    실행하기 전에 원래 값으로 되돌립니다.
+    """
+    import main
+
+    # Prometheus 포트는 작업끼리 겹치므로 작업별로 지정한 경우에만 사용
+    settings = {"PROMETHEUS_PORT": 0, **job["settings"]}
+    saved = {name: copy.deepcopy(getattr(config, name)) for name in settings}
+    for name, value in settings.items():
+        setattr(config, name, value)
+
+    output_dir = os.path.join(output_root, job["name"])
+    handlers = _attach_job_logging(job["name"], os.path.join(output_dir, "logs"))
+    try:
+        return main.run(docs_dir=job["spec"], output_dir=output_dir, resume=resume)
+    finally:
+        root = logging.getLogger()
+        for handler in handlers:
+            root.removeHandler(handler)
+            handler.close()
+        for name, value in saved.items():
+            setattr(config, name, value)
+
+
+class BatchRunner:
+    """작업을 제한된 수의 프로세스로 나누어 실행하고 작업별 상태를 기록합니다.
+
+    작업이 시작되고 끝날 때마다 상태를 state_file 에 원자적으로 저장하므로, 중단된 뒤
+    resume=True 로 다시 실행하면 끝난 작업은 건너뛰고 나머지 작업은 각자의 상태 저널에서
+    이어서 실행합니다. 오류로 끝난 작업은 max_attempts 번까지 이어서 다시 실행합니다.
+    처음 시작하는 작업의 폴더가 이미 있으면 output_dir/archive/ 로 옮긴 뒤 새로 시작합니다.
+    """
+
+    def __init__(self, jobs: List[BatchJob], output_dir: str = None, workers: int = None,
+                 max_attempts: int = None, resume: bool = False):
+        self.output_dir = output_dir or config.BATCH_OUTPUT_DIR
+        self.workers = workers or config.BATCH_WORKERS
+        self.max_attempts = config.BATCH_MAX_ATTEMPTS if max_attempts is None else max_attempts
+        self.resume = resume
+        self.state_path = os.path.join(self.output_dir, config.BATCH_STATE_FILE)
+        self.jobs: Dict[str, BatchJob] = {job.name: job for job in jobs}
+        if resume:
+            self._restore()
+
+    def _restore(self):
+        """이전 실행의 작업 상태를 불러옵니다. 작업 목록에 없는 작업은 무시합니다."""
+        if not os.path.exists(self.state_path):
+            logger.warning("이전 일괄 실행 상태를 찾을 수 없습니다. 모든 작업을 새로 시작합니다.")
+            self.resume = False
+            return
+        with open(self.state_path, "r", encoding="utf-8") as f:
+            saved = json.load(f).get("jobs", {})
+        for name, job in self.jobs.items():
+            if name in saved:
+                previous = BatchJob.from_dict(saved[name])
+                job.status, job.attempts, job.result = previous.status, previous.attempts, previous.result
+                job.started_at, job.finished_at = previous.started_at, previous.finished_at
+
+    def save_state(self):
+        utils.atomic_write_json(self.state_path, {
+            "updated_at": datetime.now().isoformat(),
+            "jobs": {name: asdict(job) for name, job in self.jobs.items()},
+        }, indent=2)
+
+    def _finish(self, job: BatchJob, result: Dict[str, Any]):
+        job.result = result
+        job.finished_at = datetime.now().isoformat()
+        status = result.get("status")
+        job.status = FINISHED if status == FINISHED else INTERRUPTED if status == INTERRUPTED else FAILED
+        self.save_state()
+        logger.info(
+            f"작업 '{job.name}' {job.status}: 반복 {result.get('iterations', 0)}회, "
+            f"기능 {result.get('features', 0)}개" + (f", 오류: {result['error']}" if result.get("error") else "")
+        )
+
+    def run(self) -> Dict[str, Any]:
+        """끝나지 않은 작업을 모두 실행하고 보고서를 반환합니다."""
+        pending = deque(job for job in self.jobs.values() if job.status != FINISHED)
+        if not self.workers:
+            self.workers = ollama_capacity()
+        workers = max(1, min(self.workers, len(pending) or 1))
+        logger.info(f"작업 {len(pending)}개를 동시에 {workers}개씩 실행합니다. (전체 {len(self.jobs)}개)")
+
+        # 처음 시작하는 작업의 폴더에 이전 일괄 실행의 결과가 남아 있으면 보관 폴더로 옮겨 새로 시작
+        archived = utils.archive_previous_run(self.output_dir, [job.name for job in pending if job.attempts == 0])
+        if archived:
+            logger.info(f"이전 일괄 실행의 작업 폴더를 {archived} 에 보관했습니다.")
+
+        # 이번 실행에서의 시도 횟수 (이전 실행에서 실패한 작업도 다시 max_attempts 번까지 시도)
+        tries: Counter = Counter()
+        running = {}
+        pools = {}  # 작업 future -> 그 작업을 실행 중인 프로세스 풀
+        context = multiprocessing.get_context("spawn")
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+        try:
+            while pending or running:
+                while pending and len(running) < workers:
+                    job = pending.popleft()
+                    # 이미 시작했던 작업은 작업 폴더의 상태 저널에서 이어서 실행
+                    resume = job.attempts > 0
+                    job.status, job.attempts = "running", job.attempts + 1
+                    job.started_at, job.finished_at = datetime.now().isoformat(), None
+                    tries[job.name] += 1
+                    self.save_state()
+                    logger.info(f"작업 '{job.name}' 시작 ({job.spec}{', 이어서 실행' if resume else ''})")
+                    future = executor.submit(run_job, asdict(job), self.output_dir, resume)
+                    running[future], pools[future] = job, executor
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                finished = []
+                for future in done:
+                    if future not in running:
+                        # 깨진 풀에서 실행 중이던 작업으로 이미 실패 처리됨
+                        continue
+                    job, pool = running.pop(future), pools.pop(future)
+                    try:
+                        result = future.result()
+                    except BrokenProcessPool as e:
+                        # 작업 프로세스가 비정상 종료되면 같은 풀의 다른 작업도 모두 실패 처리하고 풀은 한 번만 새로 만듦
+                        result = {"status": "error", "error": f"worker process died: {e}"}
+                        for other in [other for other, owner in pools.items() if owner is pool]:
+                            pools.pop(other)
+                            finished.append((running.pop(other), dict(result)))
+                        if pool is executor:
+                            executor = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+                        pool.shutdown(wait=False)
+                    except Exception as e:
+                        result = {"status": "error", "error": str(e)}
+                    finished.append((job, result))
+
+                for job, result in finished:
+                    self._finish(job, result)
+                    if job.status == FAILED and result.get("status") == "error" and tries[job.name] < self.max_attempts:
+                        logger.warning(f"작업 '{job.name}' 을 다시 실행합니다. ({tries[job.name]}/{self.max_attempts})")
+                        pending.append(job)
+        except KeyboardInterrupt:
+            # 작업 프로세스도 중단 신호를 받아 각자 상태를 저장하고 끝나므로 결과를 기다림
+            logger.info("사용자에 의해 중단되었습니다. 실행 중인 작업의 저장을 기다립니다.")
+            for future, job in running.items():
+                try:
+                    result = future.result()
+                except (Exception, KeyboardInterrupt) as e:
+                    result = {"status": INTERRUPTED, "error": str(e) or type(e).__name__}
+                self._finish(job, result)
+        finally:
+            executor.shutdown(wait=True)
+
+        report = self.report()
+        utils.atomic_write_json(os.path.join(self.output_dir, config.BATCH_REPORT_FILE), report, indent=2)
+        return report
+
+    def report(self) -> Dict[str, Any]:
+        """작업별 결과와 합계를 담은 보고서를 만듭니다."""
+        jobs = [
+            {
+                "name": job.name,
+                "spec": job.spec,
+                "status": job.status,
+                "attempts": job.attempts,
+                "started_at": job.started_at,
+                "finished_at": job.finished_at,
+                **{key: job.result.get(key) for key in (
+                    "stop_reason", "iterations", "runtime_seconds", "components", "features", "coverage", "output", "error"
+                )},
+            }
+            for job in self.jobs.values()
+        ]
+        return {
+            "generated_at": datetime.now().isoformat(),
+            "output_dir": self.output_dir,
+            "workers": self.workers,
+            "totals": {
+                "jobs": len(jobs),
+                **Counter(job["status"] for job in jobs),
+                "iterations": sum(job["iterations"] or 0 for job in jobs),
+                "features": sum(job["features"] or 0 for job in jobs),
+            },
+            "jobs": jobs,
+        }
+
+
+def parse_setting(entry: str) -> Dict[str, Any]:
+    """NAME=VALUE 형식의 --set 값을 파싱합니다. 값은 JSON 으로 읽고, 실패하면 문자열로 씁니다."""
+    name, _, value = entry.partition("=")
+    name = name.strip()
+    if not name or not _:
+        raise SystemExit(f"잘못된 --set 값: {entry} (예: --set MAX_ITERATIONS=50)")
+    try:
+        value = json.loads(value)
+    except ValueError:
+        pass
+    try:
+        return validate_settings({name: value})
+    except ValueError:
+        raise SystemExit(f"알 수 없는 설정 이름: {name}")
+
+
+def parse_arguments(argv: List[str] = None):
+    """명령줄 인수를 파싱합니다."""
+    parser = argparse.ArgumentParser(description="여러 기획서를 독립된 작업으로 일괄 실행")
+    parser.add_argument("source", type=str, help="기획서 폴더(하위 폴더/파일마다 작업) 또는 작업 목록 JSON 파일")
+    parser.add_argument("--output-dir", type=str, default=config.BATCH_OUTPUT_DIR,
+                        help=f"작업별 출력 폴더를 만들 폴더 (기본값: {config.BATCH_OUTPUT_DIR})")
+    parser.add_argument("--workers", type=int, default=config.BATCH_WORKERS,
+                        help="동시에 실행할 작업 수 (0이면 응답하는 Ollama 서버 수에 맞춤)")
+    parser.add_argument("--resume", action="store_true", help="끝나지 않은 작업만 이어서 실행")
+    parser.add_argument("--model", type=str, default=None, help="모든 작업에 사용할 Ollama 모델")
+    parser.add_argument("--runtime", type=float, default=None, help="작업당 최대 실행 시간 (시간 단위)")
+    parser.add_argument("--hosts", type=str, default=None, help="요청을 분산할 Ollama 서버 주소 목록 (쉼표로 구분)")
+    parser.add_argument("--set", action="append", default=[], metavar="NAME=VALUE",
+                        help="모든 작업에 적용할 config 값 (작업 목록의 작업별 설정이 우선, 여러 번 사용 가능)")
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_arguments()
+    utils.setup_logging(os.path.join(args.output_dir, "logs"))
+
+    # 명령줄 설정은 모든 작업에 적용 (작업 목록의 defaults 와 작업별 settings 가 우선)
+    overrides: Dict[str, Any] = {}
+    if args.model:
+        overrides["MODEL_NAME"] = args.model
+    if args.runtime is not None:
+        overrides["MAX_RUNTIME_HOURS"] = args.runtime
+    if args.hosts is not None:
+        overrides["OLLAMA_HOSTS"] = [host.strip() for host in args.hosts.split(",") if host.strip()]
+    for entry in args.set:
+        overrides.update(parse_setting(entry))
+
+    try:
+        if os.path.isdir(args.source):
+            jobs = discover_jobs(args.source)
+        else:
+            jobs = load_manifest(args.source)
+    except (OSError, ValueError) as e:
+        raise SystemExit(f"작업 목록을 읽을 수 없습니다: {e}")
+    if not jobs:
+        raise SystemExit(f"실행할 기획서가 없습니다: {args.source}")
+    for job in jobs:
+        job.settings = {**overrides, **job.settings}
+
+    # 동시 작업 수는 작업이 실제로 사용할 서버 목록 기준으로 계산
+    workers = args.workers or ollama_capacity(overrides.get("OLLAMA_HOSTS"))
+    runner = BatchRunner(jobs, args.output_dir, workers=workers, resume=args.resume)
+    report = runner.run()
+
+    logger.info("=" * 50)
+    logger.info("일괄 실행 완료")
+    for job in report["jobs"]:
+        coverage = f", 커버리지 {job['coverage'] * 100:.1f}%" if job["coverage"] is not None else ""
+        logger.info(
+            f"{job['name']}: {job['status']} ({job['stop_reason'] or '-'}), 반복 {job['iterations'] or 0}회, "
+            f"기능 {job['features'] or 0}개{coverage}"
+        )
+    totals = report["totals"]
+    logger.info(f"완료 {totals.get(FINISHED, 0)}개, 실패 {totals.get(FAILED, 0)}개, 중단 {totals.get(INTERRUPTED, 0)}개 / 전체 {totals['jobs']}개")
+    logger.info(f"보고서: {os.path.join(args.output_dir, config.BATCH_REPORT_FILE)}")
+    logger.info("=" * 50)
+    if totals.get(FAILED) or totals.get(INTERRUPTED):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,445 @@
+"""
+로컬 가짜 Ollama 서버로 메인 루프의 자체 오버헤드를 측정하는 벤치마크
+
+사용 예:
+    python benchmark.py --iterations 50 --latency 0.05 --token-rate 2000 --results bench.json
+    python benchmark.py --iterations 20 -- --no-stream --stateless
+
+-- 뒤의 인수는 그대로 main.py 에 전달됩니다.
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import logging
+import argparse
+import tempfile
+import threading
+import subprocess
+import tracemalloc
+import zlib
+from datetime import datetime
+from functools import wraps
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, Any, List, Optional
+
+import config
+
+
+# 가짜 Ollama 서버
+class FakeOllamaServer:
+    """/api/generate, /api/chat, /api/embeddings, /api/tags, /api/ps 를 흉내 내는 로컬 HTTP 서버
+
+    응답은 첫 토큰 지연(latency), 초당 토큰 수(token_rate), 응답 길이(response_chars),
+    코드 블록 수(code_blocks)와 블록당 줄 수(code_lines)에 맞춰 생성합니다.
+    토큰은 약 4글자로 계산합니다. 다음 질문 생성 요청(프롬프트가 "질문:" 으로 끝남)에는
+    짧은 질문을, format 이 지정된 요청에는 구조화 JSON 을 반환합니다. 임베딩은 글자
+    2-gram 해시로 만든 결정적 벡터입니다.
+    """
+
+    def __init__(self, latency: float = 0.0, token_rate: float = 0.0, response_chars: int = 2000,
+                 code_blocks: int = 2, code_lines: int = 20, modules: int = 5, seed: int = 0):
+        self.latency = latency
+        self.token_rate = token_rate
+        self.response_chars = response_chars
+        self.code_blocks = code_blocks
+        self.code_lines = code_lines
+        self.modules = modules
+        self.random = random.Random(seed)
+
+        self.requests = 0
+        self.request_bytes: List[int] = []  # 답변 요청 본문 크기 (바이트)
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self, port: int = 0) -> str:
+        """서버를 백그라운드 스레드에서 시작하고 주소를 반환합니다."""
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="fake-ollama", daemon=True).start()
+        return self.url
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def _code_block(self, index: int) -> str:
+        lines = [f"def generated_{index}_{line}(value):" if line == 0 else f"    value = value + {self.random.randint(0, 999)}"
+                 for line in range(self.code_lines)]
+        lines.append("    return value")
+        return "```python\n" + "\n".join(lines) + "\n```"
+
+    def answer_text(self) -> str:
+        """답변 요청에 대한 응답 본문을 만듭니다."""
+        with self._lock:
+            module = f"Module {self.random.randrange(self.modules)}"
+            blocks = [self._code_block(index) for index in range(self.code_blocks)]
+            filler_chars = max(0, self.response_chars - sum(len(block) for block in blocks))
+            filler = ("설계 설명 문장입니다. " * (filler_chars // 12 + 1))[:filler_chars]
+
+        parts = [f"모듈: {module}", f"기능 설명: {module} 기능 구현", filler] + blocks
+        return "\n\n".join(parts)
+
+    def structured_text(self) -> str:
+        """format 요청에 대한 구조화 JSON 응답을 만듭니다."""
+        text = self.answer_text()
+        blocks = [block.split("\n", 1)[1].rsplit("\n```", 1)[0] for block in text.split("```python")[1:]]
+        module = text.split("\n", 1)[0].replace("모듈: ", "")
+        return json.dumps({
+            "module": module,
+            "answer": text.split("```", 1)[0],
+            "features": [{"description": f"{module} 기능 구현",
+                          "code_blocks": [{"language": "python", "code": block} for block in blocks]}],
+            "next_question": f"{module}의 다음 기능은 무엇인가요?",
+        }, ensure_ascii=False)
+
+    @staticmethod
+    def embedding(text: str, dimensions: int = 64) -> List[float]:
+        """글자 2-gram 을 해시하여 만든 결정적 임베딩 (비슷한 텍스트일수록 비슷한 벡터)"""
+        vector = [0.0] * dimensions
+        for index in range(len(text) - 1):
+            vector[zlib.crc32(text[index:index + 2].encode("utf-8")) % dimensions] += 1.0
+        return vector
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, status: int, data: Dict[str, Any]):
+                body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _send_chunk(self, data: Dict[str, Any]):
+                body = (json.dumps(data, ensure_ascii=False) + "\n").encode("utf-8")
+                self.wfile.write(f"{len(body):x}\r\n".encode() + body + b"\r\n")
+                self.wfile.flush()
+
+            def do_GET(self):
+                if self.path == "/api/tags":
+                    self._send_json(200, {"models": [{"name": f"{config.MODEL_NAME}:latest"}]})
+                elif self.path == "/api/ps":
+                    self._send_json(200, {"models": []})
+                else:
+                    self._send_json(404, {"error": "not found"})
+
+            def do_POST(self):
+                raw = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                payload = json.loads(raw or b"{}")
+                if self.path == "/api/embeddings":
+                    return self._send_json(200, {"embedding": fake.embedding(payload.get("prompt", ""))})
+                if self.path not in ("/api/generate", "/api/chat"):
+                    return self._send_json(404, {"error": "not found"})
+
+                prompt = payload.get("prompt") or "".join(m.get("content", "") for m in payload.get("messages", []))
+                is_question = not payload.get("format") and prompt.rstrip().endswith("질문:")
+                if is_question:
+                    text = "다음으로 어떤 모듈의 어떤 기능을 구현해야 하나요?"
+                elif payload.get("format"):
+                    text = fake.structured_text()
+                else:
+                    text = fake.answer_text()
+                with fake._lock:
+                    fake.requests += 1
+                    if not is_question:
+                        fake.request_bytes.append(len(raw))
+
+                tokens = max(1, len(text) // 4)
+                prompt_tokens = max(1, len(prompt) // 4)
+                eval_seconds = tokens / fake.token_rate if fake.token_rate else 0.0
+                meta = {
+                    "done": True,
+                    "prompt_eval_count": prompt_tokens,
+                    "prompt_eval_duration": int(fake.latency * 1e9),
+                    "eval_count": tokens,
+                    "eval_duration": int(eval_seconds * 1e9),
+                    "load_duration": 0,
+                    "total_duration": int((fake.latency + eval_seconds) * 1e9),
+                }
+
+                def body(piece: str) -> Dict[str, Any]:
+                    if self.path == "/api/chat":
+                        return {"message": {"role": "assistant", "content": piece}}
+                    return {"response": piece}
+
+                time.sleep(fake.latency)
+                if not payload.get("stream", True):
+                    time.sleep(eval_seconds)
+                    return self._send_json(200, {**meta, **body(text)})
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+
+                # 약 20ms 분량씩 묶어 보내 초당 토큰 수를 맞춤
+                chunk_chars = max(4, int(fake.token_rate * 4 * 0.02)) if fake.token_rate else 256
+                for start in range(0, len(text), chunk_chars):
+                    if fake.token_rate:
+                        time.sleep(chunk_chars / 4 / fake.token_rate)
+                    self._send_chunk({**body(text[start:start + chunk_chars]), "done": False})
+                self._send_chunk({**meta, **body("")})
+                self.wfile.write(b"0\r\n\r\n")
+
+        return Handler
+
+
+# 구간별 시간 측정
+class PhaseTimer:
+    """함수 호출을 감싸 구간별 누적 시간을 측정합니다. 같은 구간의 중첩 호출은 한 번만 셉니다."""
+
+    def __init__(self):
+        self.totals: Dict[str, float] = {}
+        self.calls: Dict[str, int] = {}
+        self._depth = threading.local()
+        self._patched = []
+
+    def wrap(self, owner, name: str, phase: str, on_result=None):
+        """owner.name 을 시간 측정 함수로 바꿉니다. restore() 로 되돌립니다."""
+        original = getattr(owner, name)
+        timer = self
+
+        @wraps(original)
+        def timed(*args, **kwargs):
+            depth = getattr(timer._depth, phase, 0)
+            setattr(timer._depth, phase, depth + 1)
+            started = time.perf_counter()
+            try:
+                result = original(*args, **kwargs)
+            finally:
+                setattr(timer._depth, phase, depth)
+                if depth == 0:
+                    timer.totals[phase] = timer.totals.get(phase, 0.0) + time.perf_counter() - started
+                    timer.calls[phase] = timer.calls.get(phase, 0) + 1
+            if on_result is not None:
+                on_result(result)
+            return result
+
+        self._patched.append((owner, name, original))
+        setattr(owner, name, timed)
+
+    def restore(self):
+        for owner, name, original in reversed(self._patched):
+            setattr(owner, name, original)
+        self._patched.clear()
+
+
+def _slope(values: List[float]) -> float:
+    """반복 번호에 대한 값의 최소제곱 기울기 (반복당 증가량)"""
+    n = len(values)
+    if n < 2:
+        return 0.0
+    mean_x = (n - 1) / 2
+    mean_y = sum(values) / n
+    numerator = sum((x - mean_x) * (y - mean_y) for x, y in enumerate(values))
+    denominator = sum((x - mean_x) ** 2 for x in range(n))
+    return numerator / denominator
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_planning_doc(directory: str, chars: int, sections: int = 10):
+    """지정한 크기의 합성 기획서를 만듭니다."""
+    body_chars = max(1, chars // sections)
+    lines = []
+    for index in range(sections):
+        lines.append(f"## 섹션 {index + 1}: Module {index % 5}\n")
+        lines.append(("사용자는 이 기능으로 데이터를 조회하고 수정할 수 있어야 한다. " * (body_chars // 35 + 1))[:body_chars])
+        lines.append("")
+    with open(os.path.join(directory, "benchmark_spec.md"), "w", encoding="utf-8") as f:
+        f.write("# 벤치마크 기획서\n\n" + "\n".join(lines))
+
+
+def run_benchmark(args, main_args: List[str]) -> Dict[str, Any]:
+    """가짜 서버를 띄우고 main.main() 을 실행하여 측정 결과를 반환합니다."""
+    import main
+    import utils
+    from models import Project
+    from snippet_store import SnippetStore
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="ollama_planner_bench_")
+    docs_dir = os.path.join(workdir, "planning_docs")
+    os.makedirs(docs_dir, exist_ok=True)
+    write_planning_doc(docs_dir, args.doc_chars)
+
+    server = FakeOllamaServer(
+        latency=args.latency, token_rate=args.token_rate, response_chars=args.response_chars,
+        code_blocks=args.code_blocks, code_lines=args.code_lines, modules=args.modules, seed=args.seed,
+    )
+    url = server.start()
+
+    # 벤치마크용 설정 (측정 대상이 아닌 대기와 외부 의존성 제거)
+    overrides = {
+        "PLANNING_DOCS_DIR": docs_dir,
+        "OUTPUT_DIR": os.path.join(workdir, "output"),
+        "LOG_DIR": os.path.join(workdir, "logs"),
+        "OLLAMA_HOST": url,
+        "OLLAMA_HOSTS": [],
+        "MAX_ITERATIONS": args.iterations,
+        "WAIT_TIME_SECONDS": 0,
+        "PACING_MIN_WAIT": 0.0,
+        "RESPONSE_CACHE_MODE": "off",
+        "LOOP_DETECTION": False,  # 가짜 서버는 항상 같은 질문을 반환하므로 조기 종료되지 않도록 끔
+        "COVERAGE_TERMINATE": False,  # 지정한 반복 횟수를 모두 측정
+    }
+    saved = {name: getattr(config, name) for name in overrides}
+    for name, value in overrides.items():
+        setattr(config, name, value)
+
+    timer = PhaseTimer()
+    prompt_chars: List[int] = []
+    prompt_tokens: List[int] = []
+
+    def record_prompt(result):
+        prompt, plan = result
+        prompt_chars.append(len(prompt))
+        prompt_tokens.append(plan.tokens)
+
+    timer.wrap(main, "create_prompt", "create_prompt", on_result=record_prompt)
+    timer.wrap(main, "process_response", "process_response")
+    timer.wrap(main, "apply_structured_response", "process_response")
+    timer.wrap(main, "add_snippet", "process_response")
+    timer.wrap(utils.CodeBlockStreamParser, "feed", "process_response")
+    completed = []  # 반복이 끝날 때마다 저널에 한 번 기록됨
+    timer.wrap(utils.StateJournal, "append", "save_state", on_result=completed.append)
+    timer.wrap(utils.StateJournal, "snapshot", "save_state")
+    timer.wrap(utils.ProjectCheckpointer, "save", "save_state")
+    timer.wrap(SnippetStore, "flush", "save_state")
+    timer.wrap(Project, "save_to_json", "save_state")
+
+    # 루프 로그가 측정을 방해하지 않도록 기본 로깅을 먼저 경고 수준으로 설정
+    logging.basicConfig(level=logging.WARNING)
+    if args.tracemalloc:
+        tracemalloc.start()
+
+    saved_argv = sys.argv
+    sys.argv = ["main.py"] + main_args
+    started = time.perf_counter()
+    try:
+        main.main()
+    finally:
+        elapsed = time.perf_counter() - started
+        sys.argv = saved_argv
+        timer.restore()
+        server.stop()
+        for name, value in saved.items():
+            setattr(config, name, value)
+
+    python_peak = None
+    if args.tracemalloc:
+        python_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    iterations = len(completed)
+    try:
+        import resource
+        # 리눅스는 KB, macOS 는 바이트 단위
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        max_rss_bytes = max_rss if sys.platform == "darwin" else max_rss * 1024
+    except ImportError:
+        max_rss_bytes = None
+
+    result = {
+        "timestamp": datetime.now().isoformat(),
+        "commit": _git_commit(),
+        "python": sys.version.split()[0],
+        "parameters": {key: value for key, value in vars(args).items() if key not in ("results", "workdir", "keep")},
+        "main_args": main_args,
+        "iterations": iterations,
+        "elapsed_seconds": elapsed,
+        "iterations_per_second": iterations / elapsed if elapsed else 0.0,
+        "requests": server.requests,
+        "prompt": {
+            "first_chars": prompt_chars[0] if prompt_chars else 0,
+            "last_chars": prompt_chars[-1] if prompt_chars else 0,
+            "chars_growth_per_iteration": _slope(prompt_chars),
+            "tokens_growth_per_iteration": _slope(prompt_tokens),
+            "request_bytes_growth_per_iteration": _slope(server.request_bytes),
+            "last_request_bytes": server.request_bytes[-1] if server.request_bytes else 0,
+        },
+        "phases": {
+            phase: {"total_seconds": total, "calls": timer.calls[phase],
+                    "per_iteration_ms": total / iterations * 1000 if iterations else 0.0}
+            for phase, total in sorted(timer.totals.items())
+        },
+        "memory": {
+            "max_rss_bytes": max_rss_bytes,
+            "python_peak_bytes": python_peak,
+        },
+    }
+
+    if not args.keep and not args.workdir:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return result
+
+
+def parse_arguments(argv: List[str] = None):
+    """명령줄 인수를 파싱합니다. -- 뒤의 인수는 main.py 로 전달할 인수로 분리합니다."""
+    argv = sys.argv[1:] if argv is None else argv
+    main_args: List[str] = []
+    if "--" in argv:
+        index = argv.index("--")
+        argv, main_args = argv[:index], argv[index + 1:]
+
+    parser = argparse.ArgumentParser(description="가짜 Ollama 서버를 이용한 메인 루프 벤치마크")
+    parser.add_argument("--iterations", type=int, default=30, help="실행할 반복 횟수 (기본값: 30)")
+    parser.add_argument("--latency", type=float, default=0.0, help="요청당 첫 토큰까지의 지연 (초, 기본값: 0)")
+    parser.add_argument("--token-rate", type=float, default=0.0, help="초당 생성 토큰 수 (0이면 제한 없음)")
+    parser.add_argument("--response-chars", type=int, default=3000, help="답변 길이 (글자, 기본값: 3000)")
+    parser.add_argument("--code-blocks", type=int, default=2, help="답변당 코드 블록 수 (기본값: 2)")
+    parser.add_argument("--code-lines", type=int, default=20, help="코드 블록당 줄 수 (기본값: 20)")
+    parser.add_argument("--modules", type=int, default=5, help="답변에 등장하는 서로 다른 모듈 수 (기본값: 5)")
+    parser.add_argument("--doc-chars", type=int, default=20000, help="합성 기획서 크기 (글자, 기본값: 20000)")
+    parser.add_argument("--seed", type=int, default=0, help="응답 생성 난수 시드")
+    parser.add_argument("--tracemalloc", action="store_true", help="파이썬 힙 최대 사용량도 측정 (실행이 느려짐)")
+    parser.add_argument("--results", type=str, default="benchmark_results.json", help="결과 JSON 파일 경로")
+    parser.add_argument("--workdir", type=str, default=None, help="작업 폴더 (지정하면 삭제하지 않음)")
+    parser.add_argument("--keep", action="store_true", help="임시 작업 폴더를 삭제하지 않음")
+
+    return parser.parse_args(argv), main_args
+
+
+def main():
+    args, main_args = parse_arguments()
+    result = run_benchmark(args, main_args)
+
+    with open(args.results, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+
+    print(f"반복 {result['iterations']}회, {result['elapsed_seconds']:.2f}초 "
+          f"({result['iterations_per_second']:.2f} 반복/초)")
+    print(f"프롬프트 증가량: 반복당 {result['prompt']['chars_growth_per_iteration']:.0f}글자 "
+          f"({result['prompt']['tokens_growth_per_iteration']:.0f} 토큰)")
+    for phase, stats in result["phases"].items():
+        print(f"  {phase}: {stats['total_seconds']:.3f}초 (반복당 {stats['per_iteration_ms']:.2f}ms)")
+    if result["memory"]["max_rss_bytes"]:
+        print(f"최대 메모리(RSS): {result['memory']['max_rss_bytes'] / 1024 / 1024:.1f}MB")
+    print(f"결과 저장: {args.results}")
+
+
+if __name__ == "__main__":
+    main()
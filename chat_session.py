@@ -0,0 +1,75 @@
+"""
+KV 캐시 재사용을 위한 대화 세션
+"""
+import hashlib
+import logging
+from typing import List, Dict, Any, Tuple, Iterator
+
+import config
+from ollama_client import OllamaClient, OllamaResponseError
+
+
+class ChatSession:
+    """/api/chat 메시지 API 기반 대화 세션
+
+    시스템 프롬프트와 기획서를 하나의 시스템 메시지로 고정하고, 이전 대화는
+    질문/답변 메시지로 그대로 이어 붙입니다. 요청 앞부분이 매 반복마다 바이트 단위로
+    동일하므로 Ollama가 이전 호출의 KV 캐시를 재사용하여 기획서 prefill을 건너뜁니다.
+    서버가 /api/chat 을 지원하지 않으면 비활성화되어 호출 측이 기존 단일 프롬프트 방식으로
+    돌아갈 수 있도록 합니다.
+    KV 캐시는 모델별로 유지되므로 세션의 모든 호출은 같은 작업(task)의 모델을 사용합니다.
+    """
+
+    def __init__(self, client: OllamaClient, planning_doc: str = None, system_prompt: str = None,
+                 task: str = "answer"):
+        self.client = client
+        self.task = task
+        self.active = True
+        self.system_message = None
+        self.prefix_hash = None
+        if planning_doc is not None:
+            self.set_prefix(planning_doc, system_prompt)
+
+    def set_prefix(self, planning_doc: str, system_prompt: str = None) -> bool:
+        """고정 접두부를 설정합니다. 내용이 바뀌어 캐시가 무효화되면 True를 반환합니다."""
+        content = f"{system_prompt or config.SYSTEM_PROMPT}\n\n# 기획서 내용\n{planning_doc}"
+        prefix_hash = hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+        changed = self.prefix_hash not in (None, prefix_hash)
+        if changed:
+            logging.info("Chat session prefix changed; KV cache will be rebuilt on the next call")
+
+        self.system_message = {"role": "system", "content": content}
+        self.prefix_hash = prefix_hash
+        return changed
+
+    def build_messages(self, history: List[Tuple[str, str]], content: str) -> List[Dict[str, str]]:
+        """고정 접두부, 이전 대화, 현재 요청 순서로 메시지 목록을 만듭니다."""
+        messages = [self.system_message]
+        for question, answer in history:
+            messages.append({"role": "user", "content": question})
+            messages.append({"role": "assistant", "content": answer})
+        messages.append({"role": "user", "content": content})
+        return messages
+
+    def chat(self, history: List[Tuple[str, str]], content: str, options: Dict[str, Any] = None,
+             format: Any = None) -> str:
+        """완성된 응답을 반환합니다."""
+        return self.client.chat(self.build_messages(history, content), options=options, format=format, task=self.task)
+
+    def chat_stream(self, history: List[Tuple[str, str]], content: str, options: Dict[str, Any] = None) -> Iterator[str]:
+        """응답 조각을 순서대로 반환합니다."""
+        return self.client.chat_stream(self.build_messages(history, content), options=options, task=self.task)
+
+    def disable(self, reason: str):
+        """세션을 비활성화하고 단일 프롬프트 방식으로 전환합니다."""
+        self.active = False
+        logging.warning(f"Chat session disabled, falling back to stateless prompts: {reason}")
+
+    @staticmethod
+    def is_unsupported(error: OllamaResponseError) -> bool:
+        """서버가 /api/chat 을 지원하지 않아 발생한 오류인지 판단합니다.
+
+        Ollama는 모델이 없을 때도 404를 반환하므로, 모델 관련 오류는 제외합니다.
+        """
+        return error.status_code in (404, 405) and "model" not in str(error).lower()
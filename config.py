@@ -10,14 +10,97 @@ PLANNING_DOCS_DIR = os.path.join(BASE_DIR, "planning_docs")
 OUTPUT_DIR = os.path.join(BASE_DIR, "output")
 LOG_DIR = os.path.join(BASE_DIR, "logs")
 
+# 기획서 로드 설정
+PLANNING_DOC_CACHE_DIR = "doc_cache"  # OUTPUT_DIR 안의 기획서 파싱 결과 캐시 폴더 (빈 문자열이면 캐시 안 함)
+PLANNING_DOC_WATCH = True  # 실행 중 기획서 변경을 반복마다 확인하여 바뀐 문서만 다시 읽을지 여부
+
+# 기획서 검색 설정
+RETRIEVAL_ENABLED = True  # 기획서가 길면 현재 질문과 모듈에 관련된 섹션만 프롬프트에 넣을지 여부
+RETRIEVAL_MIN_TOKENS = 3000  # 기획서 전체가 이 토큰 수 이하이면 검색하지 않고 전체를 넣음
+RETRIEVAL_TOP_K = 6  # 프롬프트에 넣을 섹션 수
+RETRIEVAL_CHUNK_TOKENS = 600  # 제목 아래 내용이 이보다 길면 나누어 색인 (토큰)
+RETRIEVAL_OUTLINE_TOKENS = 800  # 검색 결과를 쓸 때 채팅 세션 접두부에 고정으로 넣을 섹션 제목 목록의 최대 토큰 수
+RETRIEVAL_EMBEDDINGS = False  # BM25 에 Ollama 임베딩 유사도를 섞을지 여부 (MODEL_ROUTES["embedding"] 모델 필요)
+RETRIEVAL_EMBEDDING_WEIGHT = 0.5  # 임베딩 사용 시 최종 점수에서 임베딩 유사도의 비중 (0~1)
+EMBEDDING_CACHE_FILE = "embedding_cache.sqlite3"  # OUTPUT_DIR 안의 섹션 임베딩 캐시 파일 이름
+
 # Ollama API 설정
-OLLAMA_API_URL = "http://localhost:11434/api/generate"
+OLLAMA_HOST = "http://localhost:11434"
+OLLAMA_HOSTS = []  # 여러 서버에 요청을 분산할 때의 서버 주소 목록 (비어 있으면 OLLAMA_HOST 만 사용)
+OLLAMA_API_URL = f"{OLLAMA_HOST}/api/generate"
 MODEL_NAME = "phi4"  # 사용할 모델 (예: "llama3", "mistral", "phi4")
 
+# 작업별 모델 설정 (model 이 None 이면 MODEL_NAME 사용, options 는 해당 작업 요청에만 추가되는 생성 옵션)
+# 질문 생성이나 요약처럼 짧은 작업은 작은 모델(예: "llama3.2:3b")로 보내 큰 모델의 GPU 시간을 코드 생성에 씀
+MODEL_ROUTES = {
+    "answer": {"model": None, "options": {}},  # 기획 분석 답변과 코드 생성
+    "next_question": {"model": None, "options": {}},  # 다음 질문 생성
+    "summary": {"model": None, "options": {}},  # 대화 요약
+    "extraction": {"model": None, "options": {}},  # 해석할 수 없는 구조화 응답을 JSON 으로 다시 추출
+    "embedding": {"model": "nomic-embed-text", "options": {}},  # 기획서 검색용 임베딩 (RETRIEVAL_EMBEDDINGS 가 True 일 때)
+}
+
+# Ollama 연결 설정
+OLLAMA_CONNECT_TIMEOUT = 10  # 연결 시간 제한 (초)
+OLLAMA_READ_TIMEOUT = 900  # 응답 대기 시간 제한 (초)
+OLLAMA_MAX_RETRIES = 5  # 연결 실패/5xx 오류 시 재시도 횟수
+OLLAMA_BACKOFF_BASE = 1.0  # 재시도 대기 시간 기본값 (초)
+OLLAMA_BACKOFF_MAX = 60.0  # 재시도 대기 시간 최대값 (초)
+OLLAMA_POOL_SIZE = 4  # 연결 풀 크기
+OLLAMA_KEEP_ALIVE = "30m"  # 마지막 호출 후 모델(및 KV 캐시)을 메모리에 유지할 시간
+OLLAMA_PROBE_INTERVAL = 30  # 서버가 여러 개일 때 상태 확인(/api/tags) 간격 (초)
+OLLAMA_EJECT_FAILURES = 3  # 연속 실패가 이 횟수에 도달한 서버는 상태 확인이 성공할 때까지 제외
+
 # 실행 설정
 MAX_RUNTIME_HOURS = 6  # 최대 실행 시간 (시간)
-WAIT_TIME_SECONDS = 10  # 반복 간 대기 시간 (초)
+WAIT_TIME_SECONDS = 10  # 반복 간 대기 시간 (초, PACING_MODE 가 "fixed" 일 때)
+PACING_MODE = "adaptive"  # "adaptive": 서버 상태에 따라 대기 시간 조절, "fixed": 항상 WAIT_TIME_SECONDS 대기
+PACING_DUTY_CYCLE = 1.0  # 목표 GPU 사용률 (0~1, 1이면 제한 없음. 0.8이면 호출 시간의 25%만큼 쉼)
+PACING_MIN_WAIT = 0.0  # 반복 간 최소 대기 시간 (초)
+PACING_MAX_WAIT = 120.0  # 반복 간 최대 대기 시간 (초)
+PACING_LATENCY_FACTOR = 1.5  # 호출 시간이 평균의 이 배수를 넘으면 부하로 보고 대기
+PACING_USE_PS = False  # /api/ps 로 다른 모델이 GPU를 함께 쓰는지 확인할지 여부
 MAX_ITERATIONS = 1000  # 최대 반복 횟수 (안전장치)
+MAX_CONSECUTIVE_ERRORS = 5  # 같은 질문의 호출이 연속으로 이 횟수만큼 실패하면 실행 종료 (0이면 제한 없음)
+DEADLINE_RESERVE_SECONDS = 30  # 최종 저장을 위해 실행 종료 시각 전에 남겨 둘 시간 (초, 실행 시간의 10% 이하로 적용)
+DEADLINE_MIN_TOKENS = 256  # 남은 시간에 이보다 적은 토큰만 생성할 수 있으면 새 호출을 시작하지 않음
+
+# 반복 순환 감지 설정
+LOOP_DETECTION = True  # 같은 질문이나 코드를 되풀이하는 반복을 감지하여 모듈 전환, 빠진 부분 질문, 조기 종료 순으로 대응할지 여부
+LOOP_WINDOW = 8  # 비교할 최근 반복 수
+LOOP_QUESTION_THRESHOLD = 0.8  # 질문 유사도(MinHash Jaccard 추정)가 이 값 이상이면 중복으로 판단
+LOOP_CODE_THRESHOLD = 0.85  # 코드(없으면 답변) 유사도가 이 값 이상이면 중복으로 판단
+LOOP_PATIENCE = 2  # 중복 반복이 연속 몇 번이면 대응할지
+
+# 기획서 커버리지 설정
+COVERAGE_TRACKING = True  # 기획서 요구사항이 컴포넌트/기능으로 구현되었는지 추적하고 다음 질문을 미구현 부분으로 유도할지 여부
+COVERAGE_TERMINATE = True  # 커버리지가 포화되면 실행 시간이 남아 있어도 종료할지 여부
+COVERAGE_MATCH_THRESHOLD = 0.6  # 요구사항 용어(IDF 가중)의 이 비율 이상이 기능 근거에 포함되면 구현된 것으로 판단
+COVERAGE_TARGET = 0.9  # 커버리지가 이 값에 도달하면 포화
+COVERAGE_PATIENCE = 8  # 커버리지가 이 횟수 동안 늘지 않고
+COVERAGE_MIN_NOVELTY = 0.5  # 그동안 반복당 새 기능 수가 이 값 미만이면 포화
+COVERAGE_STEER_AFTER = 3  # 커버리지가 이 횟수 동안 늘지 않으면 미구현 섹션을 직접 질문
+COVERAGE_IGNORE_SECTIONS = r"개요|목적|대상 ?사용자|개발 ?일정|마일스톤|로드맵|overview|introduction|milestone|roadmap"  # 구현 대상이 아닌 섹션 제목 (정규식, 문서 제목에는 적용 안 함)
+COVERAGE_FILE = "coverage.json"  # OUTPUT_DIR 안의 요구사항별 커버리지 보고서 파일 이름
+
+# 일괄 실행 설정 (batch.py)
+BATCH_OUTPUT_DIR = os.path.join(BASE_DIR, "batch_output")  # 작업별 출력 폴더를 만들 상위 폴더
+BATCH_WORKERS = 0  # 동시에 실행할 작업 수 (0이면 응답하는 Ollama 서버 수 × BATCH_JOBS_PER_HOST)
+BATCH_JOBS_PER_HOST = 1  # 서버당 동시 작업 수 (서버의 OLLAMA_NUM_PARALLEL 값에 맞춤)
+BATCH_MAX_ATTEMPTS = 2  # 오류로 끝난 작업을 이어서 다시 실행할 최대 횟수 (첫 실행 포함)
+BATCH_STATE_FILE = "batch_state.json"  # BATCH_OUTPUT_DIR 안의 작업별 진행 상태 파일 (--resume 에 사용)
+BATCH_REPORT_FILE = "batch_report.json"  # BATCH_OUTPUT_DIR 안의 작업별 결과 요약 보고서
+
+# 응답 캐시 설정
+RESPONSE_CACHE_MODE = "off"  # "off": 사용 안 함, "readwrite": 조회 및 저장, "replay": 조회만 (결정적 재실행, 캐시에 없는 호출은 오류)
+RESPONSE_CACHE_FILE = "response_cache.sqlite3"  # OUTPUT_DIR 안의 캐시 파일 이름
+RESPONSE_CACHE_MAX_MB = 512  # 캐시 최대 크기 (MB), 넘으면 오래 사용되지 않은 응답부터 삭제
+
+# 성능 지표 설정
+METRICS_FILE = "metrics.jsonl"  # OUTPUT_DIR 안의 반복별 지표 파일 (빈 문자열이면 기록 안 함)
+PROMETHEUS_FILE = ""  # OUTPUT_DIR 안의 Prometheus 텍스트 지표 파일 (빈 문자열이면 사용 안 함)
+PROMETHEUS_PORT = 0  # Prometheus 지표를 /metrics 로 제공할 HTTP 포트 (0이면 사용 안 함)
+PROMETHEUS_HOST = "127.0.0.1"  # 지표 HTTP 서버가 바인딩할 주소 (다른 머신에서 수집하려면 "0.0.0.0")
 
 # 로깅 설정
 CONVERSATION_LOG_FILE = "conversation_log.txt"
@@ -44,17 +127,37 @@ SYSTEM_PROMPT = """
 """
 
 INITIAL_QUESTION = "이 기획서를 분석하여 개발해야 할 독립적인 모듈들을 식별하고, 각 모듈의 MVP 버전부터 단계적으로 개발하는 계획을 수립해주세요."
+FALLBACK_QUESTION = "지금까지의 개발 내용을 검토하고, 기획서에서 아직 구현되지 않은 다음 모듈이나 기능을 구현해주세요."  # 질문 생성 실패 시 사용
+LOOP_SWITCH_QUESTION = "'{module}' 모듈에서 같은 내용이 반복되고 있습니다. 이 모듈은 여기서 마무리하고, 기획서에서 아직 다루지 않은 다른 모듈을 골라 개발해주세요. 지금까지 다룬 모듈: {modules}"  # 반복 감지 시 모듈 전환 질문
+COVERAGE_QUESTION = "기획서의 '{section}' 부분이 아직 구현되지 않았습니다. 다음 요구사항을 구현해주세요.\n{requirements}"  # 커버리지가 정체될 때 미구현 섹션을 직접 묻는 질문
+LOOP_MISSING_QUESTION = "지금까지 개발한 모듈과 기능을 기획서와 비교하여 아직 빠져 있는 요구사항을 목록으로 정리하고, 그중 가장 중요한 것부터 구현해주세요."  # 모듈 전환 후에도 반복될 때 사용
 
 # 컨텍스트 관리 설정
+USE_CHAT_SESSION = True  # /api/chat 세션으로 기획서 접두부의 KV 캐시를 재사용할지 여부
 MAX_CONVERSATION_HISTORY = 10  # 기억할 최대 대화 기록 수
-SUMMARIZE_INTERVAL = 5  # 몇 번의 대화마다 요약할지 설정
+SUMMARIZE_INTERVAL = 5  # 기록에서 밀려난 대화가 몇 개 쌓일 때마다 백그라운드로 요약할지 설정 (0이면 요약 안 함)
+SUMMARY_MAX_SEGMENTS = 4  # 장기 요약으로 합치기 전까지 유지할 구간 요약 수
+MODEL_CONTEXT_TOKENS = 16384  # 요청에 사용할 최대 컨텍스트 크기 (num_ctx 상한)
+RESPONSE_TOKEN_RESERVE = 4096  # 응답 생성을 위해 남겨둘 토큰 수 (프롬프트 예산 = 위 값 - 이 값)
+DIGEST_MAX_TOKENS = 2000  # 다음 질문 생성 시 포함할 프로젝트 요약의 최대 토큰 수
+DIGEST_MAX_FEATURES = 10  # 프로젝트 요약에서 모듈별로 보여줄 최근 기능 수
+DIGEST_MAX_SIGNATURES = 5  # 코드 스니펫별로 보여줄 함수/클래스 시그니처 수
 
 # 출력 설정
 SAVE_INTERMEDIATE_RESULTS = True  # 중간 결과 저장 여부
 INTERMEDIATE_SAVE_INTERVAL = 5  # 몇 번의 대화마다 중간 결과를 저장할지
+COMPACT_PROJECT_JSON = False  # 결과 프로젝트 파일을 들여쓰기 없이 저장할지 여부 (지연 로드 가능 형식)
+STATE_SNAPSHOT_INTERVAL = 10  # 몇 번의 대화마다 상태 저널을 전체 스냅샷(state.json)으로 압축할지
+STATE_FSYNC = "interval"  # 상태 저널 fsync 정책: "always", "interval", "never"
+STATE_FSYNC_INTERVAL = 30  # STATE_FSYNC 가 "interval" 일 때 동기화 간격 (초)
 
 # 기능 추출 설정
+STRUCTURED_OUTPUT = False  # JSON 스키마(format) 응답으로 답변과 다음 질문을 한 번의 호출로 받을지 여부
+STREAM_RESPONSES = True  # 스트리밍 모드로 응답을 받으며 코드 블록을 즉시 추출할지 여부
 EXTRACT_CODE_SNIPPETS = True  # 코드 스니펫 추출 여부
+COMPONENT_FUZZY_MERGE = True  # 비슷한 모듈 이름을 같은 컴포넌트로 병합할지 여부
+COMPONENT_MERGE_THRESHOLD = 0.85  # 모듈 이름 유사도(편집 거리 비율 또는 토큰 겹침)가 이 값 이상이면 병합
+LAZY_SNIPPET_CODE = True  # 저장소에 기록된 스니펫 코드를 메모리에서 내리고 필요할 때 파일에서 읽을지 여부
 EXTRACT_ARCHITECTURE_DIAGRAMS = True  # 아키텍처 다이어그램 추출 여부
 
 # 고급 설정
@@ -0,0 +1,81 @@
+"""
+실행 종료 시각 기준 호출 예산 계산
+"""
+import time
+from typing import Dict, Any, Optional
+
+import config
+
+
+class Deadline:
+    """실행 종료 시각까지 남은 시간으로 호출별 시간 제한과 생성 토큰 수를 정합니다.
+
+    reserve 초는 최종 저장을 위해 남겨 두며, 모델 호출은 그 전까지만 허용합니다.
+    생성 속도는 완료된 호출의 eval_count/eval_duration 으로 관측하여(지수 이동 평균)
+    남은 시간에 생성할 수 있는 토큰 수를 계산합니다. 이 값이 평소 응답 크기
+    (RESPONSE_TOKEN_RESERVE)보다 작아지면 num_predict 로 생성 길이를 제한합니다.
+    """
+
+    def __init__(self, seconds: float, reserve: float = None, min_tokens: int = None,
+                 safety: float = 0.9, smoothing: float = 0.3):
+        reserve = config.DEADLINE_RESERVE_SECONDS if reserve is None else reserve
+        # 아주 짧은 실행에서 여유분이 전체 시간을 차지하지 않도록 최대 10%로 제한
+        self.reserve = min(reserve, seconds * 0.1)
+        self.min_tokens = config.DEADLINE_MIN_TOKENS if min_tokens is None else min_tokens
+        self.safety = safety
+        self.smoothing = smoothing
+        self.end = time.monotonic() + seconds
+        self.tokens_per_second: Optional[float] = None  # 생성 속도
+        self.prompt_tokens_per_second: Optional[float] = None  # 프롬프트 처리(prefill) 속도
+
+    def remaining(self) -> float:
+        """모델 호출에 쓸 수 있는 남은 시간(초). 최종 저장 여유분은 제외합니다."""
+        return self.end - self.reserve - time.monotonic()
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def _smooth(self, previous: Optional[float], value: float) -> float:
+        return value if previous is None else previous + self.smoothing * (value - previous)
+
+    def observe(self, stats: Dict[str, Any]):
+        """완료된 호출의 성능 정보로 생성/prefill 속도를 갱신합니다."""
+        if stats.get("eval_count") and stats.get("eval_duration"):
+            rate = stats["eval_count"] / (stats["eval_duration"] / 1e9)
+            self.tokens_per_second = self._smooth(self.tokens_per_second, rate)
+        if stats.get("prompt_eval_count") and stats.get("prompt_eval_duration"):
+            rate = stats["prompt_eval_count"] / (stats["prompt_eval_duration"] / 1e9)
+            self.prompt_tokens_per_second = self._smooth(self.prompt_tokens_per_second, rate)
+
+    def timeout(self, default: float) -> float:
+        """이번 요청의 읽기 시간 제한(초)을 반환합니다."""
+        return max(0.0, min(default, self.remaining()))
+
+    def token_budget(self, prompt_tokens: int = 0) -> Optional[int]:
+        """남은 시간에 생성할 수 있는 토큰 수. 생성 속도를 아직 모르면 None."""
+        if self.tokens_per_second is None:
+            return None
+        seconds = self.remaining()
+        if self.prompt_tokens_per_second:
+            seconds -= prompt_tokens / self.prompt_tokens_per_second
+        return max(0, int(seconds * self.tokens_per_second * self.safety))
+
+    def limit(self, options: Dict[str, Any], prompt_tokens: int = 0) -> Optional[Dict[str, Any]]:
+        """생성 옵션에 남은 시간에 맞는 num_predict 를 적용한 사본을 반환합니다.
+
+        남은 시간으로 min_tokens 도 생성할 수 없으면 None 을 반환하여 호출하지 않도록 합니다.
+        평소 응답 크기보다 여유가 있으면 옵션을 바꾸지 않으므로 응답 캐시 키도 유지됩니다.
+        """
+        if self.expired():
+            return None
+
+        budget = self.token_budget(prompt_tokens)
+        if budget is None or budget >= config.RESPONSE_TOKEN_RESERVE:
+            return options
+        if budget < self.min_tokens:
+            return None
+
+        current = options.get("num_predict")
+        if current is not None and 0 < current <= budget:
+            return options
+        return {**options, "num_predict": budget}
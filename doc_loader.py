@@ -0,0 +1,362 @@
+"""
+기획서 파일 로드 (형식별 파싱, 파싱 결과 캐시, 변경 감지)
+"""
+import os
+import re
+import zlib
+import hashlib
+import logging
+import zipfile
+import unicodedata
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import config
+
+
+# 파서가 바뀌면 올려서 이전 캐시를 무효화
+PARSER_VERSION = 1
+
+SUPPORTED_EXTENSIONS = (".txt", ".md", ".docx")
+
+# WordprocessingML 네임스페이스
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+
+class DocumentParseError(ValueError):
+    """기획서 파일을 읽을 수 없는 경우"""
+
+
+# 텍스트 정규화
+def normalize_lines(lines: Iterable[str]) -> Iterator[str]:
+    """줄 단위로 텍스트를 정규화합니다.
+
+    유니코드를 NFC 로 맞추고(macOS 에서 만든 한글 파일은 NFD), BOM 과 줄 끝 공백,
+    줄 바꿈 문자를 정리하며, 연속된 빈 줄은 하나로 줄입니다. 앞뒤 빈 줄은 버립니다.
+    """
+    blank = False
+    started = False
+    for line in lines:
+        line = unicodedata.normalize("NFC", line.replace("\ufeff", "").replace("\u00a0", " ")).rstrip()
+        if not line:
+            blank = started
+            continue
+        if blank:
+            yield ""
+            blank = False
+        started = True
+        yield line
+
+
+# 형식별 파서
+def _iter_text_lines(path: str, encoding: str, errors: str = "strict") -> Iterator[str]:
+    with open(path, "r", encoding=encoding, errors=errors, newline=None) as f:
+        for line in f:
+            yield line
+
+
+def parse_text(path: str) -> str:
+    """텍스트/마크다운 파일을 한 줄씩 읽어 정규화합니다 (큰 파일도 한 번에 읽지 않음).
+
+    UTF-8 로 읽을 수 없으면 Windows 에서 흔한 CP949 로 다시 읽습니다.
+    """
+    try:
+        return "\n".join(normalize_lines(_iter_text_lines(path, "utf-8-sig")))
+    except UnicodeDecodeError:
+        logging.warning(f"{os.path.basename(path)} is not valid UTF-8; reading it as CP949")
+        return "\n".join(normalize_lines(_iter_text_lines(path, "cp949", errors="replace")))
+
+
+def _docx_heading_styles(archive: zipfile.ZipFile) -> Dict[str, int]:
+    """styles.xml 에서 제목 스타일 ID 와 제목 수준(1부터)을 읽습니다.
+
+    스타일 ID 는 언어에 따라 다르므로("Heading1", 한국어 Word 의 "1" 등) 스타일 이름
+    ("heading 1", "Title")과 개요 수준(outlineLvl)으로 판단합니다.
+    """
+    try:
+        data = archive.read("word/styles.xml")
+    except KeyError:
+        return {}
+    except (zipfile.BadZipFile, zlib.error, EOFError) as e:
+        raise DocumentParseError(f"Corrupt styles.xml: {e}") from e
+
+    try:
+        root = ET.fromstring(data)
+    except ET.ParseError as e:
+        raise DocumentParseError(f"Malformed styles.xml: {e}") from e
+
+    levels = {}
+    for style in root.iter(f"{_W}style"):
+        style_id = style.get(f"{_W}styleId")
+        name = style.find(f"{_W}name")
+        name = (name.get(f"{_W}val") if name is not None else "") or ""
+        outline = style.find(f"{_W}pPr/{_W}outlineLvl")
+
+        match = re.fullmatch(r"heading\s*(\d)", name.strip(), re.IGNORECASE)
+        if match:
+            levels[style_id] = int(match.group(1))
+        elif name.strip().lower() == "title":
+            levels[style_id] = 1
+        elif outline is not None and outline.get(f"{_W}val", "").isdigit():
+            levels[style_id] = int(outline.get(f"{_W}val")) + 1
+    return levels
+
+
+def _docx_paragraph(paragraph: ET.Element, headings: Dict[str, int]) -> str:
+    """문단 하나를 마크다운 한 줄로 변환합니다 (제목은 #, 목록은 -)."""
+    parts = []
+    for node in paragraph.iter():
+        if node.tag == f"{_W}t":
+            parts.append(node.text or "")
+        elif node.tag == f"{_W}tab":
+            parts.append("\t")
+        elif node.tag in (f"{_W}br", f"{_W}cr"):
+            parts.append("\n")
+    text = "".join(parts).strip()
+    if not text:
+        return ""
+
+    properties = paragraph.find(f"{_W}pPr")
+    if properties is None:
+        return text
+
+    level = None
+    style = properties.find(f"{_W}pStyle")
+    if style is not None:
+        level = headings.get(style.get(f"{_W}val"))
+    outline = properties.find(f"{_W}outlineLvl")
+    if level is None and outline is not None and outline.get(f"{_W}val", "").isdigit():
+        level = int(outline.get(f"{_W}val")) + 1
+    if level is not None and level <= 6:
+        return f"{'#' * level} {' '.join(text.split())}"
+
+    if properties.find(f"{_W}numPr") is not None:
+        return f"- {text}"
+    return text
+
+
+def iter_docx_lines(path: str) -> Iterator[str]:
+    """.docx 본문을 스트리밍으로 읽어 마크다운 줄을 돌려줍니다.
+
+    word/document.xml 을 압축 해제하면서 iterparse 로 문단 단위로 처리하고, 처리한
+    요소는 바로 비워 큰 문서도 메모리에 모두 올리지 않습니다. 표는 행마다 "| 셀 | 셀 |"
+    한 줄로 변환합니다.
+    """
+    try:
+        archive = zipfile.ZipFile(path)
+    except (zipfile.BadZipFile, OSError) as e:
+        raise DocumentParseError(f"Not a valid .docx file: {e}") from e
+
+    with archive:
+        headings = _docx_heading_styles(archive)
+        try:
+            stream = archive.open("word/document.xml")
+        except KeyError as e:
+            raise DocumentParseError("word/document.xml is missing") from e
+        except zipfile.BadZipFile as e:
+            raise DocumentParseError(f"Corrupt document.xml: {e}") from e
+
+        table_depth = 0
+        row: List[str] = []
+        cell: List[str] = []
+        with stream:
+            try:
+                for event, element in ET.iterparse(stream, events=("start", "end")):
+                    tag = element.tag
+                    if event == "start":
+                        if tag == f"{_W}tbl":
+                            table_depth += 1
+                        continue
+
+                    if tag == f"{_W}p":
+                        line = _docx_paragraph(element, headings)
+                        element.clear()
+                        if table_depth:
+                            if line:
+                                cell.append(line)
+                        else:
+                            yield from line.split("\n")
+                    elif tag == f"{_W}tc" and table_depth:
+                        row.append(" ".join(cell).replace("|", "\\|"))
+                        cell = []
+                    elif tag == f"{_W}tr" and table_depth:
+                        if any(row):
+                            yield "| " + " | ".join(row) + " |"
+                        row = []
+                        element.clear()
+                    elif tag == f"{_W}tbl":
+                        table_depth -= 1
+                        element.clear()
+                        if not table_depth:
+                            yield ""
+            except ET.ParseError as e:
+                raise DocumentParseError(f"Malformed document.xml: {e}") from e
+            except (zipfile.BadZipFile, zlib.error, EOFError) as e:
+                # 압축 데이터 손상(CRC 불일치 등)은 읽는 도중에 드러남
+                raise DocumentParseError(f"Corrupt document.xml: {e}") from e
+
+
+def parse_docx(path: str) -> str:
+    """.docx 파일을 마크다운 텍스트로 변환합니다."""
+    return "\n".join(normalize_lines(iter_docx_lines(path)))
+
+
+PARSERS = {
+    ".txt": parse_text,
+    ".md": parse_text,
+    ".docx": parse_docx,
+}
+
+
+# 로더
+@dataclass
+class LoadedDocument:
+    """파싱한 기획서 하나"""
+    name: str
+    signature: Tuple[int, int]  # (mtime_ns, size)
+    key: str  # 캐시 키
+    text: str
+
+
+class PlanningDocLoader:
+    """기획서 폴더의 문서를 파싱하고, 파일 상태가 바뀐 문서만 다시 파싱합니다.
+
+    파싱 결과는 경로, 수정 시각, 크기로 만든 해시를 키로 cache_dir 에 저장하므로,
+    다시 실행해도 바뀌지 않은 문서는 파싱하지 않습니다. refresh() 는 파일 상태(stat)만
+    확인하여 추가/변경/삭제된 문서를 찾으며, 실행 중 반복마다 호출하여 기획서 수정을
+    반영합니다. 저장 도중이라 읽을 수 없는 파일은 이전 내용을 유지하고 파일 상태가
+    다시 바뀌면 재시도합니다. directory 에 파일 경로를 주면 그 문서 하나만 읽습니다.
+    """
+
+    def __init__(self, directory: str = None, cache_dir: str = None):
+        self.directory = directory or config.PLANNING_DOCS_DIR
+        if cache_dir is None and config.PLANNING_DOC_CACHE_DIR:
+            cache_dir = os.path.join(config.OUTPUT_DIR, config.PLANNING_DOC_CACHE_DIR)
+        self.cache_dir = cache_dir or None
+        self.documents: Dict[str, LoadedDocument] = {}
+        self.failed: Dict[str, Tuple[int, int]] = {}  # 읽지 못한 파일의 상태 (바뀌면 다시 시도)
+        self.text = ""
+        self.parsed = 0  # 실제로 파싱한 횟수 (캐시 사용 제외)
+
+    @staticmethod
+    def cache_key(path: str, signature: Tuple[int, int]) -> str:
+        """경로, 수정 시각, 크기, 파서 버전으로 캐시 키를 만듭니다."""
+        raw = f"{PARSER_VERSION}\0{os.path.abspath(path)}\0{signature[0]}\0{signature[1]}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _scan(self) -> Dict[str, Tuple[str, Tuple[int, int]]]:
+        """지원하는 파일의 {이름: (경로, (mtime_ns, size))} 를 반환합니다."""
+        files = {}
+        if os.path.isfile(self.directory):
+            try:
+                stat = os.stat(self.directory)
+            except OSError:
+                return files
+            files[os.path.basename(self.directory)] = (self.directory, (stat.st_mtime_ns, stat.st_size))
+            return files
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if not entry.name.lower().endswith(SUPPORTED_EXTENSIONS) or entry.name.startswith(("~$", ".")):
+                    continue
+                try:
+                    if not entry.is_file():
+                        continue
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                files[entry.name] = (entry.path, (stat.st_mtime_ns, stat.st_size))
+        return files
+
+    def _cache_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.txt")
+
+    def _read_cache(self, key: str) -> Optional[str]:
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._cache_path(key), "r", encoding="utf-8") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _write_cache(self, key: str, text: str):
+        if not self.cache_dir:
+            return
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f"{self._cache_path(key)}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp_path, self._cache_path(key))
+        except OSError as e:
+            logging.warning(f"Could not write planning doc cache: {e}")
+
+    def _drop_cache(self, key: str):
+        if self.cache_dir:
+            try:
+                os.remove(self._cache_path(key))
+            except OSError:
+                pass
+
+    def _load_document(self, name: str, path: str, signature: Tuple[int, int]) -> LoadedDocument:
+        key = self.cache_key(path, signature)
+        text = self._read_cache(key)
+        if text is not None:
+            logging.info(f"Loaded planning document: {name} (cached)")
+        else:
+            parser = PARSERS[os.path.splitext(name)[1].lower()]
+            text = parser(path)
+            self.parsed += 1
+            self._write_cache(key, text)
+            logging.info(f"Loaded planning document: {name} ({len(text)} chars)")
+        return LoadedDocument(name=name, signature=signature, key=key, text=text)
+
+    def refresh(self) -> List[str]:
+        """바뀐 문서만 다시 읽고, 추가/변경/삭제된 문서 이름 목록을 반환합니다."""
+        if not os.path.exists(self.directory):
+            logging.error(f"Planning docs not found: {self.directory}")
+            return []
+
+        files = self._scan()
+        changed = []
+
+        for name in [name for name in self.failed if name not in files]:
+            del self.failed[name]
+        for name in [name for name in self.documents if name not in files]:
+            self._drop_cache(self.documents.pop(name).key)
+            changed.append(name)
+
+        for name, (path, signature) in sorted(files.items()):
+            previous = self.documents.get(name)
+            if previous is not None and previous.signature == signature or self.failed.get(name) == signature:
+                continue
+            try:
+                document = self._load_document(name, path, signature)
+            except (OSError, DocumentParseError) as e:
+                # 편집기가 저장하는 도중일 수 있으므로 이전 내용을 유지하고 파일이 바뀌면 다시 시도
+                logging.error(f"Error loading file {name}: {e}")
+                self.failed[name] = signature
+                continue
+            self.failed.pop(name, None)
+            if previous is not None:
+                self._drop_cache(previous.key)
+            self.documents[name] = document
+            changed.append(name)
+
+        if changed:
+            self.text = "\n".join(
+                f"# {name}\n\n{self.documents[name].text}\n\n" for name in sorted(self.documents)
+            )
+        return changed
+
+    def texts(self) -> Dict[str, str]:
+        """{문서 이름: 파싱된 내용} 을 반환합니다."""
+        return {name: document.text for name, document in self.documents.items()}
+
+    def load(self) -> str:
+        """모든 기획서를 읽어 하나의 텍스트로 반환합니다."""
+        self.refresh()
+        if not self.text:
+            logging.warning("No planning documents found. Please add documents to the planning_docs folder.")
+        return self.text
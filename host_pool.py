@@ -0,0 +1,147 @@
+"""
+여러 Ollama 서버 간 요청 분산
+"""
+import time
+import logging
+import threading
+from typing import List, Optional, Set
+
+import requests
+
+import config
+
+
+class ModelUnavailableError(LookupError):
+    """모델 목록을 확인한 서버 중 요청한 모델을 가진 서버가 하나도 없는 경우"""
+
+
+class HostState:
+    """서버 하나의 상태"""
+
+    def __init__(self, url: str):
+        self.url = url.rstrip("/")
+        self.outstanding = 0  # 처리 중인 요청 수
+        self.healthy = True
+        self.failures = 0  # 연속 실패 횟수
+        self.models: Optional[Set[str]] = None  # /api/tags 로 확인한 모델 목록 (확인 전에는 None)
+        self.last_probe: Optional[float] = None
+
+    def has_model(self, model: str) -> bool:
+        """모델을 가지고 있는지 확인합니다. 아직 목록을 모르면 있다고 봅니다."""
+        if self.models is None or not model:
+            return True
+        return model in self.models or f"{model}:latest" in self.models
+
+    def __repr__(self):
+        return f"HostState({self.url!r}, outstanding={self.outstanding}, healthy={self.healthy})"
+
+
+class HostPool:
+    """처리 중인 요청이 가장 적은 서버로 요청을 보내는 서버 풀
+
+    연속으로 eject_failures 번 실패한 서버는 제외하고, 백그라운드 상태 확인(/api/tags)이
+    성공하면 다시 포함합니다. 상태 확인 때 각 서버의 모델 목록도 갱신하여, 요청한 모델이
+    있는 서버로만 보냅니다. 서버가 하나뿐이면 상태 확인 스레드는 띄우지 않습니다.
+    """
+
+    def __init__(
+        self,
+        hosts: List[str],
+        session: requests.Session = None,
+        probe_interval: float = None,
+        eject_failures: int = None,
+        probe_timeout: float = None,
+    ):
+        if not hosts:
+            raise ValueError("HostPool needs at least one host")
+        self.hosts = [HostState(url) for url in dict.fromkeys(hosts)]
+        self.session = session or requests.Session()
+        self.probe_interval = config.OLLAMA_PROBE_INTERVAL if probe_interval is None else probe_interval
+        self.eject_failures = config.OLLAMA_EJECT_FAILURES if eject_failures is None else eject_failures
+        self.probe_timeout = config.OLLAMA_CONNECT_TIMEOUT if probe_timeout is None else probe_timeout
+
+        self._turn = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._prober: Optional[threading.Thread] = None
+
+        if len(self.hosts) > 1:
+            self.probe_all()
+            if self.probe_interval > 0:
+                self._prober = threading.Thread(target=self._run_prober, name="ollama-prober", daemon=True)
+                self._prober.start()
+
+    def acquire(self, model: str = None, exclude: HostState = None) -> HostState:
+        """요청을 보낼 서버를 고르고 처리 중 요청 수를 늘립니다.
+
+        모델을 가진 서버 중 정상 서버, 없으면 제외된 서버까지 포함하여 처리 중 요청이 가장 적은
+        서버를 고릅니다. 모델이 없다고 확인된 서버로는 보내지 않으며(404 로 실패하므로),
+        그런 서버만 남으면 ModelUnavailableError 를 발생시킵니다. exclude 는 방금 실패한 서버로,
+        다른 후보가 있을 때만 제외합니다.
+        """
+        with self._lock:
+            with_model = [host for host in self.hosts if host.has_model(model)]
+            if not with_model:
+                raise ModelUnavailableError(f"No Ollama host has model '{model}' ({', '.join(host.url for host in self.hosts)})")
+            candidates = [host for host in with_model if host.healthy] or with_model
+            if exclude is not None and len(candidates) > 1:
+                candidates = [host for host in candidates if host is not exclude] or candidates
+
+            # 처리 중 요청 수가 같으면 순서를 돌려 가며 골라 순차 호출도 고르게 분산
+            self._turn = (self._turn + 1) % len(candidates)
+            rotated = candidates[self._turn:] + candidates[:self._turn]
+            host = min(rotated, key=lambda h: h.outstanding)
+            host.outstanding += 1
+            return host
+
+    def release(self, host: HostState, ok: bool = True):
+        """요청이 끝난 서버의 처리 중 요청 수를 줄이고 성공/실패를 기록합니다."""
+        with self._lock:
+            host.outstanding = max(0, host.outstanding - 1)
+            if ok:
+                host.failures = 0
+                return
+
+            host.failures += 1
+            if host.healthy and len(self.hosts) > 1 and host.failures >= self.eject_failures:
+                host.healthy = False
+                logging.warning(f"Ejecting Ollama host {host.url} after {host.failures} consecutive failures")
+
+    def probe(self, host: HostState) -> bool:
+        """/api/tags 로 서버 상태와 모델 목록을 확인합니다."""
+        try:
+            response = self.session.get(f"{host.url}/api/tags", timeout=self.probe_timeout)
+            response.raise_for_status()
+            models = {entry.get("name") for entry in response.json().get("models", [])}
+        except (requests.exceptions.RequestException, ValueError) as e:
+            logging.debug(f"Health probe failed for {host.url}: {e}")
+            with self._lock:
+                host.last_probe = time.time()
+                if host.healthy and len(self.hosts) > 1:
+                    host.healthy = False
+                    logging.warning(f"Ejecting Ollama host {host.url}: health probe failed")
+            return False
+
+        with self._lock:
+            host.last_probe = time.time()
+            host.models = models
+            if not host.healthy:
+                logging.info(f"Re-admitting Ollama host {host.url}")
+            host.healthy = True
+            host.failures = 0
+        return True
+
+    def probe_all(self):
+        """모든 서버의 상태를 확인합니다."""
+        for host in self.hosts:
+            self.probe(host)
+
+    def _run_prober(self):
+        while not self._stop.wait(self.probe_interval):
+            self.probe_all()
+
+    def close(self):
+        """상태 확인 스레드를 종료합니다."""
+        self._stop.set()
+        if self._prober is not None:
+            self._prober.join(timeout=self.probe_timeout + 1)
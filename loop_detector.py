@@ -0,0 +1,136 @@
+"""
+반복 순환(같은 질문이나 코드를 되풀이하는 반복) 감지
+"""
+import re
+import zlib
+import random
+import logging
+from collections import deque
+from typing import Deque, List, Optional, Set, Tuple
+
+import config
+from utils import extract_code_snippets
+
+
+# MinHash 순열에 쓰는 메르센 소수 (2^61 - 1)
+_PRIME = (1 << 61) - 1
+
+
+def shingles(text: str, size: int = 4) -> Set[int]:
+    """정규화한 텍스트의 글자 size-gram 해시 집합을 만듭니다.
+
+    영문/숫자/한글/밑줄만 남기고 공백을 하나로 줄이므로 서식, 문장 부호, 들여쓰기
+    차이는 무시됩니다.
+    """
+    normalized = " ".join(re.findall(r"[0-9a-z가-힣_]+", text.lower()))
+    if not normalized:
+        return set()
+    if len(normalized) <= size:
+        return {zlib.crc32(normalized.encode("utf-8"))}
+    return {zlib.crc32(normalized[i:i + size].encode("utf-8")) for i in range(len(normalized) - size + 1)}
+
+
+class MinHasher:
+    """shingle 집합의 MinHash 서명을 만듭니다. 두 서명이 같은 위치의 비율이 Jaccard 유사도의 추정치입니다."""
+
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        rng = random.Random(seed)
+        self.params = [(rng.randrange(1, _PRIME), rng.randrange(0, _PRIME)) for _ in range(num_perm)]
+
+    def signature(self, hashes: Set[int]) -> Tuple[int, ...]:
+        if not hashes:
+            return ()
+        return tuple(min((a * h + b) % _PRIME for h in hashes) for a, b in self.params)
+
+    @staticmethod
+    def similarity(first: Tuple[int, ...], second: Tuple[int, ...]) -> float:
+        if not first or not second:
+            return 0.0
+        return sum(x == y for x, y in zip(first, second)) / len(first)
+
+
+class LoopDetector:
+    """최근 질문, 코드, 답변의 MinHash 서명을 비교하여 같은 내용을 되풀이하는 반복을 감지합니다.
+
+    반복이 중복으로 판단되는 경우:
+    - 질문이 최근 질문과 question_threshold 이상 비슷함
+    - 새 코드 블록의 절반 이상이 최근 코드와 code_threshold 이상 비슷함
+      (코드가 없으면 답변 본문을 최근 답변과 비교)
+
+    중복 반복이 patience 번 연속되면 단계적으로 대응합니다: 모듈 전환("switch_module"),
+    빠진 요구사항 질문("whats_missing"), 조기 종료("stop"). 새로운 반복이 recovery 번
+    연속되면 단계를 처음으로 되돌립니다.
+    """
+
+    ACTIONS = ("switch_module", "whats_missing", "stop")
+
+    def __init__(self, window: int = None, question_threshold: float = None, code_threshold: float = None,
+                 patience: int = None, recovery: int = 3, num_perm: int = 64):
+        self.window = config.LOOP_WINDOW if window is None else window
+        self.question_threshold = config.LOOP_QUESTION_THRESHOLD if question_threshold is None else question_threshold
+        self.code_threshold = config.LOOP_CODE_THRESHOLD if code_threshold is None else code_threshold
+        self.patience = config.LOOP_PATIENCE if patience is None else patience
+        self.recovery = recovery
+        self.hasher = MinHasher(num_perm)
+
+        self._questions: Deque[Tuple[int, ...]] = deque(maxlen=self.window)
+        self._answers: Deque[Tuple[int, ...]] = deque(maxlen=self.window)
+        self._snippets: Deque[List[Tuple[int, ...]]] = deque(maxlen=self.window)  # 반복별 코드 블록 서명
+
+        self.streak = 0  # 연속 중복 반복 수
+        self.productive = 0  # 연속 새로운 반복 수
+        self.level = 0  # 지금까지 취한 대응 단계 수
+        self.redundant_total = 0
+        self.last_similarity = {"question": 0.0, "code": 0.0}
+
+    def _max_similarity(self, signature: Tuple[int, ...], history) -> float:
+        return max((self.hasher.similarity(signature, other) for other in history), default=0.0)
+
+    def record(self, question: str, response: str) -> bool:
+        """반복 하나를 기록하고 중복 여부를 반환합니다."""
+        question_sig = self.hasher.signature(shingles(question, 3))
+        question_similarity = self._max_similarity(question_sig, self._questions)
+
+        recent_code = [sig for signatures in self._snippets for sig in signatures]
+        code_sigs = [self.hasher.signature(shingles(snippet["code"], 5)) for snippet in extract_code_snippets(response)]
+        code_sigs = [sig for sig in code_sigs if sig]
+        answer_sig = self.hasher.signature(shingles(response, 5))
+
+        if code_sigs:
+            similarities = [self._max_similarity(sig, recent_code) for sig in code_sigs]
+            duplicates = sum(similarity >= self.code_threshold for similarity in similarities)
+            code_similarity = max(similarities)
+            code_redundant = duplicates * 2 >= len(code_sigs)
+        else:
+            code_similarity = self._max_similarity(answer_sig, self._answers)
+            code_redundant = code_similarity >= self.code_threshold
+
+        self._questions.append(question_sig)
+        self._answers.append(answer_sig)
+        self._snippets.append(code_sigs)
+        self.last_similarity = {"question": question_similarity, "code": code_similarity}
+        return question_similarity >= self.question_threshold or code_redundant
+
+    def observe(self, question: str, response: str) -> Optional[str]:
+        """반복을 기록하고, 대응이 필요하면 "switch_module", "whats_missing", "stop" 중 하나를 반환합니다."""
+        if not self.record(question, response):
+            self.streak = 0
+            self.productive += 1
+            if self.productive >= self.recovery:
+                self.level = 0
+            return None
+
+        self.redundant_total += 1
+        self.streak += 1
+        self.productive = 0
+        logging.info(
+            f"Redundant iteration {self.streak}/{self.patience} "
+            f"(question similarity {self.last_similarity['question']:.2f}, code similarity {self.last_similarity['code']:.2f})"
+        )
+        if self.streak < self.patience:
+            return None
+
+        action = self.ACTIONS[min(self.level, len(self.ACTIONS) - 1)]
+        self.level += 1
+        self.streak = 0
+        return action
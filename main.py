@@ -11,11 +11,26 @@ import json
 import logging
 import argparse
 from datetime import datetime, timedelta
-from typing import Dict, List, Any, Optional, Tuple
+from typing import Dict, List, Any, Optional, Tuple, Iterable, Union
 
 import config
 import utils
-from models import Project, Component, Feature, CodeSnippet
+from models import Project, Component, Feature, CodeSnippet, MissingSnippetError
+from ollama_client import OllamaClient, OllamaError, OllamaResponseError, OllamaDeadlineError, OllamaCacheMissError
+from deadline import Deadline
+from chat_session import ChatSession
+from response_cache import ResponseCache
+from snippet_store import SnippetStore
+from doc_loader import PlanningDocLoader
+from retrieval import SpecIndex, EmbeddingCache
+from loop_detector import LoopDetector
+from spec_coverage import CoverageTracker
+from pacing import AdaptivePacer
+from prompt_builder import PromptBuilder, PromptPlan, ContextSizer, split_sections
+import structured_output
+import metrics
+from metrics import MetricsRecorder
+from structured_output import StructuredResponseError
 
 # 로거 설정
 logger = None
@@ -31,6 +46,21 @@ def parse_arguments():
         help=f"사용할 Ollama 모델 (기본값: {config.MODEL_NAME})"
     )
     
+    parser.add_argument(
+        "--task-model", 
+        action="append",
+        default=[],
+        metavar="TASK=MODEL",
+        help=f"작업별 모델 지정 (작업: {', '.join(config.MODEL_ROUTES)}, 여러 번 사용 가능. 예: --task-model summary=llama3.2:3b)"
+    )
+    
+    parser.add_argument(
+        "--hosts", 
+        type=str, 
+        default=",".join(config.OLLAMA_HOSTS),
+        help="요청을 분산할 Ollama 서버 주소 목록 (쉼표로 구분, 기본값: OLLAMA_HOST 하나만 사용)"
+    )
+    
     parser.add_argument(
         "--runtime", 
         type=float, 
@@ -38,6 +68,13 @@ def parse_arguments():
         help=f"최대 실행 시간 (시간 단위, 기본값: {config.MAX_RUNTIME_HOURS})"
     )
     
+    parser.add_argument(
+        "--num-ctx", 
+        type=int, 
+        default=config.MODEL_CONTEXT_TOKENS,
+        help=f"최대 컨텍스트 크기 (토큰, 기본값: {config.MODEL_CONTEXT_TOKENS})"
+    )
+    
     parser.add_argument(
         "--output", 
         type=str, 
@@ -51,6 +88,58 @@ def parse_arguments():
         help="이전 상태에서 계속 실행할지 여부"
     )
     
+    parser.add_argument(
+        "--no-stream", 
+        action="store_true",
+        help="스트리밍 모드를 끄고 응답이 완성된 후 한 번에 처리"
+    )
+    
+    parser.add_argument(
+        "--stateless", 
+        action="store_true",
+        help="채팅 세션(KV 캐시 재사용)을 끄고 매번 전체 프롬프트를 전송"
+    )
+    
+    parser.add_argument(
+        "--cache", 
+        choices=["off", "readwrite", "replay"],
+        default=config.RESPONSE_CACHE_MODE,
+        help=f"응답 캐시 모드 (replay: 캐시 조회만 수행하고 캐시에 없는 호출을 만나면 종료, 기본값: {config.RESPONSE_CACHE_MODE})"
+    )
+    
+    parser.add_argument(
+        "--structured", 
+        action="store_true",
+        help="JSON 스키마 응답으로 답변과 다음 질문을 한 번의 호출로 받음"
+    )
+    
+    parser.add_argument(
+        "--pacing", 
+        choices=["adaptive", "fixed"],
+        default=config.PACING_MODE,
+        help=f"반복 간 대기 방식 (fixed: 항상 {config.WAIT_TIME_SECONDS}초 대기, 기본값: {config.PACING_MODE})"
+    )
+    
+    parser.add_argument(
+        "--duty-cycle", 
+        type=float, 
+        default=config.PACING_DUTY_CYCLE,
+        help=f"목표 GPU 사용률 (0~1, 기본값: {config.PACING_DUTY_CYCLE})"
+    )
+    
+    parser.add_argument(
+        "--metrics-port", 
+        type=int, 
+        default=config.PROMETHEUS_PORT,
+        help="Prometheus 지표를 제공할 HTTP 포트 (0이면 사용 안 함)"
+    )
+    
+    parser.add_argument(
+        "--metrics-host", 
+        default=config.PROMETHEUS_HOST,
+        help="Prometheus 지표 HTTP 서버가 바인딩할 주소 (기본값: 127.0.0.1)"
+    )
+    
     parser.add_argument(
         "--debug", 
         action="store_true",
@@ -67,6 +156,29 @@ def setup_environment(args):
     if args.debug:
         config.DEBUG_MODE = True
     
+    # 스트리밍 모드 설정
+    if args.no_stream:
+        config.STREAM_RESPONSES = False
+    
+    # 채팅 세션 설정
+    if args.stateless:
+        config.USE_CHAT_SESSION = False
+    
+    # 응답 캐시 설정
+    config.RESPONSE_CACHE_MODE = args.cache
+    
+    # 구조화 응답 설정
+    if args.structured:
+        config.STRUCTURED_OUTPUT = True
+    
+    # 지표 설정
+    config.PROMETHEUS_PORT = args.metrics_port
+    config.PROMETHEUS_HOST = args.metrics_host
+    
+    # 대기 방식 설정
+    config.PACING_MODE = args.pacing
+    config.PACING_DUTY_CYCLE = args.duty_cycle
+    
     # 로깅 설정
     logger = utils.setup_logging()
     
@@ -78,97 +190,392 @@ def setup_environment(args):
         config.MODEL_NAME = args.model
         logger.info(f"모델 변경: {config.MODEL_NAME}")
     
+    # 작업별 모델 설정
+    for entry in args.task_model:
+        task, _, model = entry.partition("=")
+        task, model = task.strip().replace("-", "_"), model.strip()
+        if task not in config.MODEL_ROUTES or not model:
+            raise SystemExit(f"잘못된 --task-model 값: {entry} (작업: {', '.join(config.MODEL_ROUTES)})")
+        config.MODEL_ROUTES[task] = {**config.MODEL_ROUTES[task], "model": model}
+        logger.info(f"작업 '{task}' 모델: {model}")
+    
+    # 서버 목록 설정
+    hosts = [host.strip() for host in args.hosts.split(",") if host.strip()]
+    if hosts != config.OLLAMA_HOSTS:
+        config.OLLAMA_HOSTS = hosts
+        logger.info(f"Ollama 서버 {len(hosts)}개에 요청 분산: {', '.join(hosts)}")
+    
     # 실행 시간 설정
     if args.runtime != config.MAX_RUNTIME_HOURS:
         config.MAX_RUNTIME_HOURS = args.runtime
         logger.info(f"실행 시간 변경: {config.MAX_RUNTIME_HOURS}시간")
-
-def create_prompt(planning_doc: str, conversation_history: utils.ConversationHistory, question: str, project: Project = None) -> str:
-    """프롬프트를 생성합니다."""
-    # 이전 대화 요약이 있으면 포함
-    summary = ""
-    if conversation_history.summary:
-        summary = f"\n\n이전 대화 요약:\n{conversation_history.summary}\n\n"
-    
-    # 최근 대화 기록
-    history = conversation_history.get_formatted_history()
     
-    # 현재까지 개발된 코드 정보
-    current_code_info = ""
+    # 컨텍스트 크기 설정
+    if args.num_ctx != config.MODEL_CONTEXT_TOKENS:
+        config.MODEL_CONTEXT_TOKENS = args.num_ctx
+        logger.info(f"최대 컨텍스트 크기 변경: {config.MODEL_CONTEXT_TOKENS} 토큰")
+
+# 답변 작성 지침 (모든 프롬프트 끝에 붙음)
+ANSWER_INSTRUCTIONS = """자세하고 구체적인 답변을 제공해주세요. 
+기획서에 명시되지 않았거나 모호한 부분은 합리적인 가정을 세우고 그 가정을 명확히 표시해주세요.
+코드 예시와 구현 방법을 포함해주세요.
+"""
+
+def format_code_info(project: Project = None) -> List[str]:
+    """현재까지 개발된 코드 정보를 모듈 단위의 프롬프트용 텍스트 목록으로 만듭니다."""
+    parts = []
     if project and project.components:
-        current_code_info = "\n\n# 현재까지 개발된 코드 정보:\n"
         for component in project.components:
-            current_code_info += f"\n## 모듈: {component.name}\n"
-            current_code_info += f"설명: {component.description}\n"
+            component_info = f"## 모듈: {component.name}\n"
+            component_info += f"설명: {component.description}\n"
             
             for feature in component.features:
-                current_code_info += f"\n### 기능: {feature.name}\n"
-                current_code_info += f"설명: {feature.description}\n"
+                component_info += f"\n### 기능: {feature.name}\n"
+                component_info += f"설명: {feature.description}\n"
                 
                 # 코드 스니펫은 너무 길어질 수 있으므로 갯수만 표시
-                current_code_info += f"구현된 코드 스니펫 수: {len(feature.code_snippets)}\n"
+                component_info += f"구현된 코드 스니펫 수: {len(feature.code_snippets)}\n"
+            
+            parts.append(component_info)
+    
+    return parts
+
+def select_spec(planning_doc: str, index: Optional[SpecIndex], question: str,
+                current_module: str = None) -> Union[str, List[str]]:
+    """프롬프트에 넣을 기획서 내용을 고릅니다.
+    
+    색인이 있고 기획서가 RETRIEVAL_MIN_TOKENS 보다 길면 현재 질문과 모듈에 관련된 섹션만
+    관련도 순으로 반환합니다. 모듈이 정해지지 않은 첫 분석 단계는 전체 구조를 봐야 하므로
+    전체 기획서를 사용합니다.
+    """
+    if index is None or not current_module or index.total_tokens <= config.RETRIEVAL_MIN_TOKENS:
+        return planning_doc
+    
+    chunks = index.search(question, boost=current_module)
+    if not chunks:
+        return planning_doc
+    logger.info(f"관련 기획서 섹션 {len(chunks)}개 사용: {', '.join(chunk.source for chunk in chunks)}")
+    return [chunk.render() for chunk in chunks]
+
+def plan_prompt(planning_doc: Union[str, List[str]], conversation_history: utils.ConversationHistory, question: str,
+                project: Project = None, instructions: str = ANSWER_INSTRUCTIONS) -> PromptPlan:
+    """토큰 예산 안에서 프롬프트에 넣을 내용을 우선순위에 따라 결정합니다.
+    
+    우선순위: 시스템 프롬프트, 현재 질문, 기획서 섹션, 이전 대화 요약, 최근 대화, 코드 정보.
+    기획서는 앞쪽 섹션부터, 대화와 코드 정보는 최근 것부터 남깁니다.
+    planning_doc 이 섹션 목록(select_spec 의 검색 결과)이면 관련도가 낮은 뒤쪽부터 생략됩니다.
+    """
+    spec = split_sections(planning_doc) if isinstance(planning_doc, str) else planning_doc
+    builder = PromptBuilder()
+    builder.add("system", config.SYSTEM_PROMPT.strip(), priority=0, required=True)
+    builder.add("question", f"# 현재 질문\n{question}\n\n{instructions}", priority=1, required=True)
+    builder.add("spec", spec, priority=2, keep="head")
+    builder.add("summary", conversation_history.summary, priority=3)
+    builder.add("history", conversation_history.get_formatted_turns(), priority=4, keep="tail")
+    builder.add("code_info", format_code_info(project), priority=5, keep="tail", separator="\n")
+    
+    return builder.build()
+
+def create_prompt(planning_doc: Union[str, List[str]], conversation_history: utils.ConversationHistory, question: str, project: Project = None,
+                  instructions: str = ANSWER_INSTRUCTIONS) -> Tuple[str, PromptPlan]:
+    """프롬프트를 생성합니다."""
+    plan = plan_prompt(planning_doc, conversation_history, question, project, instructions)
+    
+    # 이전 대화 요약이 있으면 포함
+    summary = ""
+    if plan.text("summary"):
+        summary = f"이전 대화 요약:\n{plan.text('summary')}\n\n"
+    
+    # 현재까지 개발된 코드 정보
+    current_code_info = ""
+    if plan.text("code_info"):
+        current_code_info = f"\n\n# 현재까지 개발된 코드 정보:\n{plan.text('code_info')}"
     
     # 최종 프롬프트
-    prompt = f"""{config.SYSTEM_PROMPT}
+    prompt = f"""{plan.text('system')}
 
 # 기획서 내용
-{planning_doc}
+{plan.text('spec')}
 
 {summary}# 이전 대화 내용
-{history}{current_code_info}
+{plan.text('history')}{current_code_info}
 
-# 현재 질문
-{question}
+{plan.text('question')}"""
+    
+    return prompt, plan
 
-자세하고 구체적인 답변을 제공해주세요. 
-기획서에 명시되지 않았거나 모호한 부분은 합리적인 가정을 세우고 그 가정을 명확히 표시해주세요.
-코드 예시와 구현 방법을 포함해주세요.
-"""
+def create_chat_content(plan: PromptPlan, include_spec: bool = False) -> str:
+    """채팅 세션의 마지막 사용자 메시지를 생성합니다.
+    
+    기획서와 이전 대화는 세션 메시지로 전달되므로, 매 반복마다 바뀌는 부분만 포함합니다.
+    include_spec 이면 질문마다 바뀌는 검색된 기획서 섹션도 이 메시지에 넣습니다.
+    """
+    spec = ""
+    if include_spec and plan.text("spec"):
+        spec = f"# 관련 기획서 섹션\n{plan.text('spec')}\n\n"
     
-    return prompt
+    summary = ""
+    if plan.text("summary"):
+        summary = f"이전 대화 요약:\n{plan.text('summary')}\n\n"
+    
+    current_code_info = ""
+    if plan.text("code_info"):
+        current_code_info = f"# 현재까지 개발된 코드 정보:\n{plan.text('code_info')}\n"
+    
+    return f"{spec}{summary}{current_code_info}{plan.text('question')}"
 
-def process_response(response: str, project: Project) -> Tuple[Project, str]:
-    """AI 응답을 처리하고 프로젝트 모델을 업데이트합니다."""
-    # 현재 모듈 식별 (응답에서 추출)
-    current_module = extract_current_module(response)
+def prepare_session(session: ChatSession, plan: PromptPlan, conversation_history: utils.ConversationHistory,
+                    retrieved: bool, spec_outline: str = None) -> Tuple[List[Tuple[str, str]], str]:
+    """채팅 세션의 고정 접두부를 맞추고 (이전 대화, 마지막 사용자 메시지)를 반환합니다.
     
-    # 코드 스니펫 추출
-    if config.EXTRACT_CODE_SNIPPETS:
-        code_snippets = utils.extract_code_snippets(response)
-        
-        # 추출된 코드 스니펫 처리
-        for snippet_data in code_snippets:
-            # CodeSnippet 객체 생성
-            snippet = CodeSnippet(
-                language=snippet_data["language"],
-                code=snippet_data["code"],
-                description=f"Module: {current_module}" if current_module else None
-            )
+    검색된 기획서 섹션은 질문마다 바뀌므로 접두부에 넣으면 매 반복 KV 캐시가 무효화됩니다.
+    이 경우 접두부에는 질문과 무관한 섹션 제목 목록(spec_outline)만 두고 섹션은 사용자 메시지로 보냅니다.
+    """
+    if retrieved:
+        session.set_prefix(spec_outline or "")
+    else:
+        session.set_prefix(plan.text("spec"))
+    history = conversation_history.history[-plan.count("history"):] if plan.count("history") else []
+    with metrics.timed("prompt_build"):
+        content = create_chat_content(plan, include_spec=retrieved)
+    return history, content
+
+def generate_response(planning_doc: Union[str, List[str]], conversation_history: utils.ConversationHistory, question: str,
+                      project: Project, client: OllamaClient, session: ChatSession = None,
+                      sizer: ContextSizer = None, store: SnippetStore = None,
+                      spec_outline: str = None) -> Tuple[str, str]:
+    """모델에 질문하고 응답을 처리하여 (응답, 현재 모듈)을 반환합니다.
+    
+    채팅 세션이 활성화되어 있으면 KV 캐시를 재사용하는 세션 경로를,
+    그렇지 않으면 단일 프롬프트 경로를 사용합니다.
+    spec_outline 은 planning_doc 이 검색된 섹션 목록일 때 세션 접두부에 넣을 기획서 개요입니다.
+    """
+    with metrics.timed("prompt_build"):
+        prompt, plan = create_prompt(planning_doc, conversation_history, question)
+    
+    if plan.dropped or plan.compressed:
+        logger.info(f"프롬프트 예산({plan.budget} 토큰) 조정: {plan.report()}")
+    
+    # 모든 호출이 같은 num_ctx 를 쓰도록 클라이언트 기본 옵션에 설정 (값이 바뀌면 모델이 재로드됨)
+    if sizer is not None:
+        client.options["num_ctx"] = sizer.fit(plan.tokens)
+    
+    if session is not None and session.active:
+        history, content = prepare_session(
+            session, plan, conversation_history, not isinstance(planning_doc, str), spec_outline
+        )
+        try:
+            if config.STREAM_RESPONSES:
+                return stream_response(session.chat_stream(history, content), project, store)
             
-            # 파일로 저장
-            if config.SAVE_INTERMEDIATE_RESULTS:
-                snippet.save_to_file(config.OUTPUT_DIR)
+            response = session.chat(history, content)
+            project, current_module = process_response(response, project, store)
+            return response, current_module
+        except OllamaResponseError as e:
+            if not ChatSession.is_unsupported(e):
+                raise
+            session.disable(str(e))
+    
+    if config.STREAM_RESPONSES:
+        # 스트리밍 모드: 응답을 받는 동안 코드 블록을 바로 처리
+        return stream_response(client.generate_stream(prompt, task="answer"), project, store)
+    
+    response = utils.query_ollama(prompt, client=client, task="answer")
+    project, current_module = process_response(response, project, store)
+    return response, current_module
+
+def generate_structured_response(planning_doc: Union[str, List[str]], conversation_history: utils.ConversationHistory, question: str,
+                                 project: Project, client: OllamaClient, session: ChatSession = None,
+                                 sizer: ContextSizer = None, store: SnippetStore = None,
+                                 spec_outline: str = None) -> Tuple[str, str, Optional[str]]:
+    """JSON 스키마 응답 한 번으로 답변, 모듈, 기능, 코드, 다음 질문을 받아 (응답, 현재 모듈, 다음 질문)을 반환합니다.
+    
+    응답은 스키마로 검증하고, 형식이 깨진 경우 복구를 시도합니다. 그래도 해석할 수 없으면
+    "extraction" 작업 모델에 원문을 JSON 으로 옮기도록 한 번 더 요청하고, 그것도 실패하면
+    원문을 기존 방식(정규식 추출)으로 처리하고 다음 질문은 None 으로 반환하여,
+    호출 측이 별도의 질문 생성 호출로 대체하도록 합니다.
+    구조화 응답은 JSON 이 완성되어야 해석할 수 있으므로 스트리밍하지 않습니다.
+    """
+    instructions = f"{ANSWER_INSTRUCTIONS}\n{structured_output.STRUCTURED_INSTRUCTIONS}"
+    with metrics.timed("prompt_build"):
+        prompt, plan = create_prompt(planning_doc, conversation_history, question, instructions=instructions)
+    
+    if plan.dropped or plan.compressed:
+        logger.info(f"프롬프트 예산({plan.budget} 토큰) 조정: {plan.report()}")
+    
+    if sizer is not None:
+        client.options["num_ctx"] = sizer.fit(plan.tokens)
+    
+    schema = structured_output.RESPONSE_SCHEMA
+    raw = None
+    if session is not None and session.active:
+        history, content = prepare_session(
+            session, plan, conversation_history, not isinstance(planning_doc, str), spec_outline
+        )
+        try:
+            raw = session.chat(history, content, format=schema)
+        except OllamaResponseError as e:
+            if not ChatSession.is_unsupported(e):
+                raise
+            session.disable(str(e))
+    
+    if raw is None:
+        raw = client.generate(prompt, format=schema, task="answer")
+    
+    try:
+        with metrics.timed("parse"):
+            data = structured_output.parse_response(raw)
+    except StructuredResponseError as e:
+        logger.warning(f"구조화 응답 해석 실패, 추출 모델로 다시 시도합니다: {e}")
+        try:
+            extracted = client.generate(structured_output.build_extraction_prompt(raw), format=schema, task="extraction")
+            data = structured_output.parse_response(extracted)
+        except (StructuredResponseError, OllamaError) as e:
+            logger.warning(f"구조화 응답 추출 실패, 일반 응답으로 처리합니다: {e}")
+            project, current_module = process_response(raw, project, store)
+            return raw, current_module, None
+    
+    with metrics.timed("parse"):
+        project, current_module = apply_structured_response(data, project, store)
+    return structured_output.render_markdown(data), current_module, data["next_question"] or None
+
+def apply_structured_response(data: Dict[str, Any], project: Project, store: SnippetStore = None) -> Tuple[Project, str]:
+    """검증된 구조화 응답의 기능과 코드 블록을 프로젝트에 반영합니다."""
+    current_module = data["module"] or None
+    
+    if config.EXTRACT_CODE_SNIPPETS:
+        for feature_data in data["features"]:
+            feature = None
+            for block in feature_data["code_blocks"]:
+                feature = add_snippet(project, block, current_module, feature_data["description"], store, feature)
             
-            # 모듈에 해당하는 컴포넌트가 있는지 확인
-            component = find_or_create_component(project, current_module)
+            # 코드 없이 설명만 있는 기능도 기록
+            if feature is None:
+                component = find_or_create_component(project, current_module)
+                component.features.append(Feature(
+                    name=next_feature_name(component, current_module),
+                    description=feature_data["description"]
+                ))
+    
+    project.updated_at = datetime.now()
+    
+    return project, current_module
+
+def process_response(response: str, project: Project, store: SnippetStore = None) -> Tuple[Project, str]:
+    """AI 응답을 처리하고 프로젝트 모델을 업데이트합니다."""
+    with metrics.timed("parse"):
+        # 현재 모듈 식별 (응답에서 추출)
+        current_module = extract_current_module(response)
+        
+        # 코드 스니펫 추출
+        if config.EXTRACT_CODE_SNIPPETS:
+            code_snippets = utils.extract_code_snippets(response)
+            feature_desc = extract_feature_description(response)
             
-            # 새 기능 생성 및 코드 스니펫 추가
-            feature_name = f"{current_module}_{len(component.features) + 1}" if current_module else f"Feature_{len(component.features) + 1}"
-            feature_desc = extract_feature_description(response) or f"자동 생성된 기능 {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+            # 추출된 코드 스니펫 처리
+            for snippet_data in code_snippets:
+                add_snippet(project, snippet_data, current_module, feature_desc, store)
+        
+        # 프로젝트 updated_at 갱신
+        project.updated_at = datetime.now()
+    
+    return project, current_module
+
+def next_feature_name(component: Component, current_module: str) -> str:
+    """컴포넌트에 추가할 다음 기능 이름을 만듭니다."""
+    return f"{current_module}_{len(component.features) + 1}" if current_module else f"Feature_{len(component.features) + 1}"
+
+def add_snippet(project: Project, snippet_data: Dict[str, str], current_module: str, feature_desc: str = None,
+                store: SnippetStore = None, feature: Feature = None) -> Feature:
+    """추출된 코드 스니펫을 저장하고 해당 모듈의 새 기능으로 프로젝트에 추가합니다.
+    
+    스니펫 저장소가 주어지면 내용 해시 기반으로 중복 없이 저장하고(쓰기는 반복 단위로 묶어 처리),
+    없으면 스니펫마다 개별 파일로 바로 저장합니다.
+    feature 가 주어지면 새 기능을 만들지 않고 그 기능에 스니펫을 추가합니다.
+    """
+    # CodeSnippet 객체 생성
+    snippet = CodeSnippet(
+        language=snippet_data["language"],
+        code=snippet_data["code"],
+        description=f"Module: {current_module}" if current_module else None
+    )
+    
+    # 모듈에 해당하는 컴포넌트가 있는지 확인
+    component = find_or_create_component(project, current_module)
+    
+    # 새 기능 생성 및 코드 스니펫 추가
+    feature_name = feature.name if feature is not None else next_feature_name(component, current_module)
+    feature_desc = feature_desc or f"자동 생성된 기능 {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+    
+    # 파일로 저장
+    if config.SAVE_INTERMEDIATE_RESULTS:
+        if store is not None:
+            if not store.store(snippet, component.name, feature_name):
+                logger.debug(f"이미 저장된 코드와 동일한 스니펫: {snippet.filename}")
+        else:
+            snippet.save_to_file(config.OUTPUT_DIR)
+    
+    if feature is not None:
+        feature.code_snippets.append(snippet)
+        return feature
+    
+    feature = Feature(
+        name=feature_name,
+        description=feature_desc
+    )
+    feature.code_snippets.append(snippet)
+    
+    # 컴포넌트에 기능 추가
+    component.features.append(feature)
+    
+    return feature
+
+def stream_response(chunks: Iterable[str], project: Project, store: SnippetStore = None) -> Tuple[str, str]:
+    """스트리밍 모드로 응답을 받으면서 완성된 코드 블록을 즉시 프로젝트와 디스크에 반영합니다.
+    
+    받은 응답은 체크포인트 파일에 계속 기록되므로 생성 도중 중단되어도 보존됩니다.
+    스니펫 파일은 닫는 ``` 가 도착하는 즉시 저장소 기록 대기열에 넣습니다 (내용 해시로 저장하므로
+    같은 질문을 재시도해도 중복되지 않음). 호출이 중간에 실패해 같은 질문을 다시 묻는 경우에는
+    이번 응답에서 추가한 기능과 컴포넌트만 프로젝트에서 되돌립니다.
+    """
+    parser = utils.CodeBlockStreamParser()
+    checkpoint = utils.ResponseCheckpoint(directory=store.base_dir if store is not None else None)
+    mark = project.mark()
+    parts = []
+    current_module = None
+    feature_desc = None
+    
+    try:
+        for chunk in chunks:
+            parts.append(chunk)
+            checkpoint.write(chunk)
             
-            feature = Feature(
-                name=feature_name,
-                description=feature_desc
-            )
-            feature.code_snippets.append(snippet)
+            if not config.EXTRACT_CODE_SNIPPETS:
+                continue
             
-            # 컴포넌트에 기능 추가
-            component.features.append(feature)
+            with metrics.timed("parse"):
+                for snippet_data in parser.feed(chunk):
+                    # 모듈 이름과 기능 설명은 보통 코드 블록보다 앞에 나오므로 직전 코드 블록 이후의 텍스트에서 찾음
+                    current_module = current_module or extract_current_module(snippet_data["preface"])
+                    feature_desc = feature_desc or extract_feature_description(snippet_data["preface"])
+                    feature = add_snippet(project, snippet_data, current_module, feature_desc, store)
+                    if store is not None:
+                        store.flush()
+                    logger.info(f"코드 블록 추출됨: {feature.name} ({snippet_data['language']})")
+    except OllamaDeadlineError:
+        # 종료 시각에 끊긴 경우는 다시 묻지 않으므로 완성된 코드 블록은 그대로 둠
+        raise
+    except OllamaError:
+        project.rollback(mark)
+        raise
+    finally:
+        checkpoint.close()
     
-    # 프로젝트 updated_at 갱신
+    checkpoint.complete()
+    response = "".join(parts)
     project.updated_at = datetime.now()
     
-    return project, current_module
+    return response, extract_current_module(response)
 
 def find_or_create_component(project: Project, module_name: str) -> Component:
     """모듈 이름에 해당하는 컴포넌트를 찾거나 생성합니다."""
@@ -179,27 +586,26 @@ def find_or_create_component(project: Project, module_name: str) -> Component:
                 name="Main Component",
                 description="기획서에서 자동 생성된 메인 컴포넌트"
             )
-            project.components.append(component)
+            project.add_component(component)
         return project.components[0]
     
-    # 모듈 이름에 해당하는 컴포넌트 찾기
-    for component in project.components:
-        if component.name.lower() == module_name.lower():
-            return component
+    # 정규화된 이름 색인에서 찾기 (비슷한 이름은 별칭으로 병합)
+    component = project.find_component(module_name)
+    if component is not None:
+        return component
     
     # 없으면 새로 생성
     component = Component(
         name=module_name,
         description=f"{module_name} 모듈"
     )
-    project.components.append(component)
-    return component
+    return project.add_component(component)
 
 def extract_current_module(response: str) -> str:
     """응답에서 현재 작업 중인 모듈 이름을 추출합니다."""
     # 간단한 구현: "모듈: XXX" 패턴 찾기
     import re
-    match = re.search(r"모듈:\s*([A-Za-z가-힣0-9_\s]+)", response)
+    match = re.search(r"모듈:[ \t]*([A-Za-z가-힣0-9_ \t]+)", response)
     if match:
         return match.group(1).strip()
     return None
@@ -213,6 +619,26 @@ def extract_feature_description(response: str) -> str:
         return match.group(1).strip()
     return None
 
+def is_permanent_error(error: OllamaError) -> bool:
+    """다시 보내도 같은 결과가 나오는 요청 오류(시간 초과/과부하를 제외한 4xx)인지 확인합니다."""
+    status_code = getattr(error, "status_code", None)
+    return isinstance(error, OllamaResponseError) and status_code is not None \
+        and 400 <= status_code < 500 and status_code not in (408, 429)
+
+def build_state(iteration: int, current_question: str, current_module: str,
+                conversation_history: utils.ConversationHistory) -> Dict[str, Any]:
+    """복구에 필요한 전체 실행 상태를 만듭니다."""
+    summary, pending = conversation_history.summary_state()
+    return {
+        "iteration": iteration,
+        "current_question": current_question,
+        "current_module": current_module,
+        "conversation_history": conversation_history.history,
+        "summary": summary,
+        "summary_pending": pending,
+        "last_updated": datetime.now().isoformat()
+    }
+
 def main():
     """메인 실행 함수"""
     # 인수 파싱
@@ -221,6 +647,24 @@ def main():
     # 환경 설정
     setup_environment(args)
     
+    run(resume=args.resume, output_file=args.output)
+
+def run(docs_dir: str = None, output_dir: str = None, resume: bool = False,
+        output_file: str = "project.json") -> Dict[str, Any]:
+    """기획서 하나(폴더 또는 파일)에 대해 분석 루프를 실행하고 실행 결과 요약을 반환합니다.
+    
+    실행마다 달라지는 값(기획서 위치, 출력 폴더, 이어서 실행 여부)은 인수로 받으므로
+    batch.py 처럼 여러 기획서를 각자의 출력 폴더에서 실행할 수 있습니다.
+    모델, 실행 시간 등 나머지 설정은 config 를 따릅니다.
+    """
+    global logger
+    if logger is None:
+        logger = logging.getLogger(__name__)
+    
+    docs_dir = docs_dir or config.PLANNING_DOCS_DIR
+    output_dir = output_dir or config.OUTPUT_DIR
+    os.makedirs(output_dir, exist_ok=True)
+    
     # 시작 메시지
     logger.info("=" * 50)
     logger.info("Ollama 자동 기획서 분석 시스템 시작")
@@ -228,21 +672,52 @@ def main():
     logger.info(f"최대 실행 시간: {config.MAX_RUNTIME_HOURS}시간")
     logger.info("=" * 50)
     
-    # 기획서 로드
-    planning_doc = utils.load_planning_docs()
+    # 기획서 로드 (파싱 결과 캐시 사용, 실행 중 바뀐 문서만 다시 읽음)
+    docs = PlanningDocLoader(
+        docs_dir, os.path.join(output_dir, config.PLANNING_DOC_CACHE_DIR) if config.PLANNING_DOC_CACHE_DIR else ""
+    )
+    planning_doc = docs.load()
     if not planning_doc:
-        logger.error("기획서를 찾을 수 없습니다. planning_docs 폴더에 기획서 파일을 추가해주세요.")
-        return
+        logger.error(f"기획서를 찾을 수 없습니다. {docs_dir} 에 기획서 파일을 추가해주세요.")
+        return {"status": "no_docs", "iterations": 0}
+    
+    # 응답 캐시 (선택)
+    cache = None
+    if config.RESPONSE_CACHE_MODE != "off":
+        cache = ResponseCache(os.path.join(output_dir, config.RESPONSE_CACHE_FILE),
+                              read_only=config.RESPONSE_CACHE_MODE == "replay")
+        logger.info(f"응답 캐시 사용: {cache.path} ({config.RESPONSE_CACHE_MODE})")
+    
+    # Ollama 클라이언트 (메인 호출, 요약, 다음 질문 생성이 공유)
+    client = OllamaClient(model=config.MODEL_NAME, cache=cache)
+    
+    # 기획서 섹션 검색 색인 (긴 기획서는 관련 섹션만 프롬프트에 포함)
+    index = None
+    embedding_cache = None
+    if config.RETRIEVAL_ENABLED:
+        if config.RETRIEVAL_EMBEDDINGS:
+            embedding_cache = EmbeddingCache(os.path.join(output_dir, config.EMBEDDING_CACHE_FILE))
+        index = SpecIndex(client=client if config.RETRIEVAL_EMBEDDINGS else None, cache=embedding_cache)
+        index.update(docs.texts())
     
     # 상태 초기화 또는 복구
-    conversation_history = utils.ConversationHistory(max_history=config.MAX_CONVERSATION_HISTORY)
+    conversation_history = utils.ConversationHistory(max_history=config.MAX_CONVERSATION_HISTORY, client=client)
+    
+    # 상태 저널 (반복마다 변경분만 추가하고 주기적으로 스냅샷 저장)
+    journal = utils.StateJournal(directory=output_dir)
+    
+    # 코드 스니펫 저장소 (내용 해시 기반 중복 제거)
+    store = SnippetStore(output_dir)
+    
+    # 프로젝트 중간 저장 (바뀐 컴포넌트만 백그라운드에서 저장, 스니펫 기록이 끝난 뒤에 기록)
+    checkpointer = utils.ProjectCheckpointer(os.path.join(output_dir, "checkpoint"), store=store)
     
     # 프로젝트 초기화 또는 복구
     project = None
     state = {}
-    if args.resume:
-        # 이전 상태 복구
-        state = utils.load_state()
+    if resume:
+        # 이전 상태 복구 (마지막 스냅샷 + 저널 재적용)
+        state = journal.load(max_history=config.MAX_CONVERSATION_HISTORY)
         if state:
             logger.info("이전 상태에서 계속합니다.")
             
@@ -253,15 +728,37 @@ def main():
                 
                 if "summary" in state:
                     conversation_history.summary = state["summary"]
+                
+                # 요약되지 않은 채 밀려난 대화(중단 당시 요약 중이던 묶음 포함)는 요약 대기열로 다시 넣음
+                if state.get("summary_pending"):
+                    conversation_history.defer_summary([tuple(turn) for turn in state["summary_pending"]])
             
-            # 프로젝트 복구
-            if "project" in state and os.path.exists(os.path.join(config.OUTPUT_DIR, "project.json")):
-                project = Project.load_from_json(os.path.join(config.OUTPUT_DIR, "project.json"))
+            # 프로젝트 복구 (중간 저장본 우선, 없으면 마지막 최종 결과 파일)
+            checkpoint_broken = False
+            try:
+                project = utils.ProjectCheckpointer.load(checkpointer.directory, output_dir)
+            except MissingSnippetError as e:
+                # 중간 저장본이 없는 스니펫 파일을 가리키면 빈 코드로 복구하지 않고 최종 결과 파일을 사용
+                logger.error(f"중간 저장본이 손상되어 사용할 수 없습니다: {e}")
+                project, checkpoint_broken = None, True
+            output_path = os.path.join(output_dir, output_file)
+            if project is None and os.path.exists(output_path):
+                # 실행 루프는 모든 컴포넌트의 이름과 기능 수를 바로 쓰므로 지연 로드하지 않음
+                project = Project.load_from_json(output_path, output_dir if config.LAZY_SNIPPET_CODE else None)
+            if project:
+                # 손상된 중간 저장본은 저장된 것으로 보지 않아 다음 저장 때 모두 다시 씀
+                if not checkpoint_broken:
+                    checkpointer.mark_saved(project)
                 logger.info(f"프로젝트 '{project.name}' 로드됨")
             
             # 현재 질문 복구
             current_question = state.get("current_question", config.INITIAL_QUESTION)
             logger.info(f"이전 질문: {current_question}")
+            
+            # 생성 도중 중단된 응답이 있으면 보관
+            partial_response = utils.recover_partial_response(directory=output_dir)
+            if partial_response:
+                logger.warning(f"중단된 응답 {len(partial_response)} 글자를 보관 파일로 옮겼습니다.")
         else:
             logger.warning("이전 상태를 찾을 수 없습니다. 새로 시작합니다.")
             current_question = config.INITIAL_QUESTION
@@ -269,6 +766,16 @@ def main():
         # 새로 시작
         current_question = config.INITIAL_QUESTION
     
+    # 새 실행은 이전 실행의 상태와 결과를 보관 폴더로 옮기고 새 실행 ID 로 기록
+    # (이전 저널에 이어 쓰면 --resume 때 이전 실행이 복구될 수 있음)
+    if not state:
+        archived = utils.archive_previous_run(output_dir, [
+            journal.snapshot_name, os.path.basename(journal.journal_path), "checkpoint", "partial_response.txt", output_file
+        ])
+        if archived:
+            logger.info(f"이전 실행의 상태와 결과를 {archived} 에 보관했습니다.")
+        journal.new_run()
+    
     # 프로젝트가 없으면 새로 생성
     if not project:
         project = Project(
@@ -276,71 +783,271 @@ def main():
             description="기획서에서 자동으로 생성된 프로젝트"
         )
     
+    # 기획서를 고정 접두부로 하는 채팅 세션 (KV 캐시 재사용)
+    session = ChatSession(client) if config.USE_CHAT_SESSION else None
+    
+    # 프롬프트 크기에 맞춰 num_ctx 를 정하는 도구
+    sizer = ContextSizer()
+    
+    # 다음 질문 생성에 쓰는 프로젝트 요약 (변경된 모듈만 갱신)
+    digest = utils.ProjectDigest()
+    
+    # 반복 간 대기 시간 조절
+    pacer = AdaptivePacer(client=client)
+    
+    # 기획서 요구사항 커버리지 (복구한 프로젝트의 기능은 이미 구현된 것으로 반영)
+    coverage = None
+    if config.COVERAGE_TRACKING:
+        coverage = CoverageTracker()
+        if coverage.update_spec(docs.texts()):
+            coverage.sync(project)
+            logger.info(f"기획서 요구사항 {len(coverage.requirements)}개, 현재 커버리지 {coverage.coverage * 100:.1f}%")
+        else:
+            coverage = None
+    
+    # 같은 질문/코드를 되풀이하는 반복 감지 (복구한 대화 기록으로 초기화)
+    loop_detector = None
+    if config.LOOP_DETECTION:
+        loop_detector = LoopDetector()
+        for question, answer in conversation_history.history:
+            loop_detector.record(question, answer)
+    
+    # 반복별 성능 지표 (호출별 토큰/시간 정보와 로컬 구간 시간)
+    recorder = MetricsRecorder(
+        path=os.path.join(output_dir, config.METRICS_FILE) if config.METRICS_FILE else None,
+        prometheus_file=os.path.join(output_dir, config.PROMETHEUS_FILE) if config.PROMETHEUS_FILE else None,
+        prometheus_port=config.PROMETHEUS_PORT,
+        prometheus_host=config.PROMETHEUS_HOST,
+    )
+    metrics.set_recorder(recorder)
+    client.stats_listener = recorder.record_call
+    
     # 종료 시간 설정
     end_time = datetime.now() + timedelta(hours=config.MAX_RUNTIME_HOURS)
     
-    # 반복 카운터
-    iteration = state.get("iteration", 1)
+    # 모든 호출의 시간 제한과 생성 길이를 종료 시각에 맞춤 (최종 저장 시간은 남겨 둠)
+    deadline = Deadline(config.MAX_RUNTIME_HOURS * 3600)
+    client.deadline = deadline
+    
+    # 반복 카운터 (저장된 반복 번호는 마지막으로 완료된 반복)
+    iteration = state.get("iteration", 0) + 1
+    
+    # 저널에 요약은 바뀐 경우에만 기록
+    last_summary = conversation_history.summary
+    
+    # 실행 결과 (batch.py 의 작업 보고서에 사용)
+    status = "completed"
+    stop_reason = None
+    result: Dict[str, Any] = {}
+    consecutive_errors = 0
     
     try:
         
         # 메인 루프
-        current_module = None
+        current_module = state.get("current_module")
 
-        while datetime.now() < end_time and iteration <= config.MAX_ITERATIONS:
+        while not deadline.expired() and iteration <= config.MAX_ITERATIONS:
             logger.info(f"\n--- 반복 #{iteration} ---")
             logger.info(f"현재 질문: {current_question}")
             logger.info(f"현재 모듈: {current_module or '미정'}")
+            recorder.begin(iteration)
             
-            # 프롬프트 생성
-            prompt = create_prompt(planning_doc, conversation_history, current_question)
+            # 실행 중 수정된 기획서 반영 (바뀐 문서만 다시 파싱)
+            if config.PLANNING_DOC_WATCH:
+                changed = docs.refresh()
+                if changed and docs.text:
+                    planning_doc = docs.text
+                    if index is not None:
+                        index.update(docs.texts())
+                    if coverage is not None:
+                        coverage.update_spec(docs.texts())
+                    logger.info(f"기획서 변경 반영: {', '.join(changed)}")
+                elif changed:
+                    logger.warning("기획서가 모두 삭제되어 이전 내용을 계속 사용합니다.")
             
             # Ollama API 호출
             logger.info("Ollama API 호출 중...")
-            response = utils.query_ollama(prompt)
+            call_started = time.monotonic()
+            next_question = None
+            try:
+                with metrics.timed("prompt_build"):
+                    spec = select_spec(planning_doc, index, current_question, current_module)
+                if config.STRUCTURED_OUTPUT:
+                    response, current_module, next_question = generate_structured_response(
+                        spec, conversation_history, current_question, project, client, session, sizer, store,
+                        spec_outline=index.outline() if index is not None else None
+                    )
+                else:
+                    response, current_module = generate_response(
+                        spec, conversation_history, current_question, project, client, session, sizer, store,
+                        spec_outline=index.outline() if index is not None else None
+                    )
+            except OllamaDeadlineError as e:
+                # 종료 시각에 도달: 진행 중이던 응답은 체크포인트 파일에 남고 다음 --resume 때 복구됨
+                logger.info(f"실행 종료 시각에 도달하여 호출을 중단합니다: {e}")
+                recorder.end(error=str(e))
+                break
+            except OllamaCacheMissError as e:
+                # replay 모드에서 기록된 실행과 달라짐: 서버에 묻지 않고 종료
+                logger.error(f"캐시에 없는 호출이라 재실행을 종료합니다: {e}")
+                recorder.end(error=str(e))
+                status, stop_reason, result["error"] = "error", "cache_miss", str(e)
+                break
+            except OllamaError as e:
+                # 오류 응답은 대화 기록에 넣지 않고 같은 질문으로 다시 시도
+                logger.error(f"Ollama 호출 실패: {e}")
+                pacer.record_error(time.monotonic() - call_started)
+                recorder.end(error=str(e))
+                consecutive_errors += 1
+                if is_permanent_error(e):
+                    # 모델 없음, 잘못된 옵션 같은 4xx 오류는 다시 보내도 같은 결과이므로 종료
+                    logger.error("다시 시도해도 해결되지 않는 요청 오류입니다. 모델 이름과 설정을 확인하세요.")
+                    status, stop_reason, result["error"] = "error", "request_error", str(e)
+                    break
+                if config.MAX_CONSECUTIVE_ERRORS and consecutive_errors >= config.MAX_CONSECUTIVE_ERRORS:
+                    logger.error(f"같은 질문의 호출이 {consecutive_errors}회 연속 실패하여 실행을 종료합니다.")
+                    status, stop_reason, result["error"] = "error", "consecutive_errors", str(e)
+                    break
+                logger.info(f"잠시 후 같은 질문으로 재시도합니다. ({consecutive_errors}/{config.MAX_CONSECUTIVE_ERRORS or '∞'})")
+                pacer.wait(max_delay=deadline.remaining())
+                continue
+            consecutive_errors = 0
             logger.info(f"응답 받음: {len(response)} 글자")
             
+            # 이번 반복에서 추출된 스니펫을 한 번에 백그라운드로 저장
+            with metrics.timed("persistence"):
+                store.flush()
+            
             # 대화 기록 업데이트
             conversation_history.add(current_question, response)
             
-            # 응답 처리 및 프로젝트 업데이트
-            project, current_module = process_response(response, project)
+            # 같은 내용이 되풀이되면 모듈 전환, 빠진 부분 질문, 조기 종료 순으로 대응
+            loop_action = None
+            if loop_detector is not None:
+                with metrics.timed("loop_check"):
+                    loop_action = loop_detector.observe(current_question, response)
+            
+            # 기획서 커버리지 갱신 (새 기능이 다룬 요구사항 반영)
+            coverage_stats = None
+            steering = None
+            stop_reason = "loop" if loop_action == "stop" else None
+            if coverage is not None:
+                with metrics.timed("coverage"):
+                    coverage_stats = coverage.observe(project)
+                logger.info(
+                    f"기획서 커버리지: {coverage_stats['coverage'] * 100:.1f}% "
+                    f"({coverage_stats['covered']}/{coverage_stats['requirements']}), "
+                    f"새 기능 {coverage_stats['new_features']}개, 새 코드 {coverage_stats['new_code_lines']}줄"
+                )
+                saturated = coverage.saturated() if config.COVERAGE_TERMINATE else None
+                if saturated and not stop_reason:
+                    stop_reason = "coverage"
+                elif not loop_action:
+                    steering = coverage.steering_question()
             
-            # 다음 질문 생성
-            logger.info("다음 질문 생성 중...")
-            current_question = utils.generate_next_question(response, project, current_module)
-            logger.info(f"다음 질문 생성됨: {current_question}")
+            # 다음 질문 생성 (구조화 응답에 포함되어 있으면 추가 호출 없이 사용)
+            if stop_reason == "coverage":
+                logger.info(f"기획서 커버리지가 포화되어 실행을 종료합니다: {saturated}")
+            elif loop_action == "switch_module":
+                modules = ", ".join(component.name for component in project.components[-20:]) or "없음"
+                current_question = config.LOOP_SWITCH_QUESTION.format(module=current_module or "현재", modules=modules)
+                logger.warning(f"반복되는 내용이 감지되어 다른 모듈로 전환합니다: {current_question}")
+            elif loop_action == "whats_missing":
+                current_question = config.LOOP_MISSING_QUESTION
+                logger.warning(f"모듈 전환 후에도 반복되어 빠진 요구사항을 묻습니다: {current_question}")
+            elif loop_action == "stop":
+                logger.warning("대응 후에도 같은 내용이 계속 반복되어 실행을 일찍 종료합니다.")
+            elif steering:
+                current_question = steering
+                logger.info(f"커버리지가 늘지 않아 미구현 부분을 질문합니다: {current_question}")
+            elif next_question:
+                current_question = next_question
+                logger.info(f"다음 질문 (구조화 응답): {current_question}")
+            else:
+                logger.info("다음 질문 생성 중...")
+                try:
+                    current_question = utils.generate_next_question(
+                        response, project, current_module, client=client, digest=digest,
+                        uncovered=coverage.hint() if coverage is not None else None
+                    )
+                    logger.info(f"다음 질문 생성됨: {current_question}")
+                except OllamaCacheMissError as e:
+                    logger.error(f"캐시에 없는 호출이라 재실행을 종료합니다: {e}")
+                    status, stop_reason, result["error"] = "error", "cache_miss", str(e)
+                    break
+                except OllamaError as e:
+                    # 질문 생성에 실패하면 현재 모듈을 이어서 진행하도록 기본 질문 사용
+                    logger.error(f"다음 질문 생성 실패: {e}")
+                    current_question = config.FALLBACK_QUESTION
+            pacer.record_success(time.monotonic() - call_started)
             
-            # 현재 상태 저장
-            state = {
+            # 현재 상태 저장 (이번 반복의 변경분만 저널에 추가)
+            summary, pending = conversation_history.summary_state()
+            record = {
                 "iteration": iteration,
+                "turn": conversation_history.history[-1],
                 "current_question": current_question,
                 "current_module": current_module,
-                "conversation_history": conversation_history.history,
-                "summary": conversation_history.summary,
+                "pending_count": len(pending),
                 "last_updated": datetime.now().isoformat()
             }
-            utils.save_state(state)
+            if loop_action:
+                record["loop_action"] = loop_action
+            if coverage_stats is not None:
+                record["coverage"] = coverage_stats["coverage"]
+            if summary != last_summary:
+                record["summary"] = summary
+                last_summary = summary
+            with metrics.timed("persistence"):
+                journal.append(record)
+                
+                # 프로젝트 중간 저장
+                if config.SAVE_INTERMEDIATE_RESULTS and iteration % config.INTERMEDIATE_SAVE_INTERVAL == 0:
+                    changed = checkpointer.save(project)
+                    logger.info(f"프로젝트 중간 저장: 변경된 컴포넌트 {changed}개")
+                
+                # 주기적으로 전체 상태를 스냅샷으로 압축
+                if journal.snapshot_due():
+                    journal.snapshot(build_state(iteration, current_question, current_module, conversation_history))
+            
+            # 반복 지표 기록
+            recorder.end(module=current_module, response_chars=len(response), loop_action=loop_action,
+                         coverage=coverage_stats)
             
             # 반복 증가
             iteration += 1
             
-            # 제어를 위해 잠시 대기
-            logger.info(f"{config.WAIT_TIME_SECONDS}초 대기 중...")
-            time.sleep(config.WAIT_TIME_SECONDS)
+            if stop_reason:
+                break
+            
+            # 서버 상태에 따라 필요한 만큼만 대기
+            pacer.wait(max_delay=deadline.remaining())
     
     except KeyboardInterrupt:
         logger.info("\n사용자에 의해 중단되었습니다.")
+        status = "interrupted"
     except Exception as e:
         logger.exception(f"오류 발생: {e}")
+        status = "error"
+        result["error"] = str(e)
     finally:
         # 최종 결과 저장
         logger.info("최종 결과 저장 중...")
         
+        # 상태 스냅샷 저장
+        if journal.records_since_snapshot:
+            journal.snapshot(build_state(iteration - 1, current_question, current_module, conversation_history))
+        journal.close()
+        
+        # 프로젝트 중간 저장본을 최신으로 맞추고 저장 스레드 종료
+        checkpointer.save(project)
+        checkpointer.close()
+        store.close()
+        
         # 프로젝트 저장
-        output_file = os.path.join(config.OUTPUT_DIR, args.output)
-        project.save_to_json(output_file)
-        logger.info(f"프로젝트가 {output_file}에 저장되었습니다.")
+        output_path = os.path.join(output_dir, output_file)
+        project.save_to_json(output_path, indent=None if config.COMPACT_PROJECT_JSON else 2)
+        logger.info(f"프로젝트가 {output_path}에 저장되었습니다.")
         
         # 실행 통계
         total_runtime = datetime.now() - (end_time - timedelta(hours=config.MAX_RUNTIME_HOURS))
@@ -348,8 +1055,50 @@ def main():
         logger.info("실행 완료")
         logger.info(f"총 반복 횟수: {iteration - 1}")
         logger.info(f"총 실행 시간: {total_runtime}")
+        logger.info(f"반복 간 대기 시간 합계: {pacer.total_wait:.1f}초")
+        if coverage is not None:
+            coverage.save(os.path.join(output_dir, config.COVERAGE_FILE))
+            logger.info(f"기획서 커버리지: {coverage.coverage * 100:.1f}% (미구현 섹션 {len(coverage.uncovered_sections(limit=len(coverage.requirements)))}개)")
+        if loop_detector is not None and loop_detector.redundant_total:
+            logger.info(f"중복으로 판단된 반복: {loop_detector.redundant_total}회")
         logger.info(f"생성된 기능 수: {sum(len(comp.features) for comp in project.components)}")
+        stats = recorder.summary()
+        if stats["latency_p50"] is not None:
+            logger.info(f"답변 지연 시간: p50 {stats['latency_p50']:.2f}초, p95 {stats['latency_p95']:.2f}초")
+        if stats["tokens_per_second"] is not None:
+            logger.info(f"생성 속도: {stats['tokens_per_second']:.1f} 토큰/초 (생성 {stats['generated_tokens']} 토큰, 프롬프트 {stats['prompt_tokens']} 토큰)")
+        if stats["prefill_share"] is not None:
+            logger.info(f"prefill 비율: {stats['prefill_share'] * 100:.1f}% (모델 로드 {stats['load_seconds']:.1f}초)")
+        if stats["phases"]:
+            logger.info("로컬 처리 시간: " + ", ".join(f"{name} {seconds:.2f}초" for name, seconds in sorted(stats["phases"].items())))
+        if cache is not None:
+            cache_stats = cache.stats()
+            logger.info(f"응답 캐시: 적중 {cache_stats['hits']}회, 미스 {cache_stats['misses']}회, 저장 {cache_stats['stores']}회")
         logger.info("=" * 50)
+        
+        conversation_history.close()
+        recorder.close()
+        metrics.set_recorder(None)
+        client.close()
+        if cache is not None:
+            cache.close()
+        if embedding_cache is not None:
+            embedding_cache.close()
+        
+        if not stop_reason:
+            stop_reason = "deadline" if deadline.expired() else "max_iterations" if iteration > config.MAX_ITERATIONS else None
+        result.update({
+            "status": status,
+            "stop_reason": stop_reason,
+            "iterations": iteration - 1,
+            "runtime_seconds": total_runtime.total_seconds(),
+            "components": len(project.components),
+            "features": sum(len(comp.features) for comp in project.components),
+            "coverage": coverage.coverage if coverage is not None else None,
+            "output": output_path,
+        })
+    
+    return result
 
 if __name__ == "__main__":
     main()
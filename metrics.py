@@ -0,0 +1,247 @@
+"""
+반복 단위 성능 지표 기록
+"""
+import os
+import json
+import math
+import time
+import logging
+import threading
+from datetime import datetime
+from contextlib import contextmanager
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, Any, List, Optional
+
+
+def percentile(values: List[float], fraction: float) -> Optional[float]:
+    """정렬 기준 최근접 순위 백분위수를 반환합니다. 값이 없으면 None."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+class MetricsRecorder:
+    """반복마다 모델 호출 정보와 로컬 구간 시간을 모아 JSONL 로 기록합니다.
+
+    호출 정보는 OllamaClient.stats_listener 로 받습니다 (prompt_eval_count, eval_count,
+    각 duration, 실제 소요 시간). 로컬 구간은 timed() 로 감싼 구간(prompt_build, parse,
+    persistence)의 시간입니다. 백그라운드 요약 호출은 진행 중인 반복에 포함됩니다.
+    Prometheus 텍스트 형식 지표를 파일로 쓰거나 HTTP(/metrics)로 제공할 수 있습니다.
+    """
+
+    def __init__(self, path: str = None, prometheus_file: str = None, prometheus_port: int = None,
+                 prometheus_host: str = "127.0.0.1"):
+        self.path = path
+        self.prometheus_file = prometheus_file
+        self._lock = threading.Lock()
+        self._file = None
+        self._server: Optional[ThreadingHTTPServer] = None
+
+        self.iteration: Optional[int] = None
+        self._started: Optional[float] = None
+        self._calls: List[Dict[str, Any]] = []
+        self._phases: Dict[str, float] = {}
+
+        # 전체 실행 누적값
+        self.iterations = 0
+        self.call_count = 0
+        self.answer_latencies: List[float] = []  # 답변 호출 소요 시간 (초)
+        self.iteration_seconds: List[float] = []
+        self.totals: Dict[str, float] = {
+            "prompt_eval_count": 0,
+            "prompt_eval_duration": 0,
+            "eval_count": 0,
+            "eval_duration": 0,
+            "load_duration": 0,
+        }
+        self.phase_totals: Dict[str, float] = {}
+
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._file = open(path, "a", encoding="utf-8")
+        if prometheus_port:
+            self._start_server(prometheus_host, prometheus_port)
+
+    # 수집
+    def record_call(self, stats: Dict[str, Any]):
+        """모델 호출 한 번의 성능 정보를 기록합니다 (OllamaClient.stats_listener)."""
+        with self._lock:
+            self._calls.append(stats)
+            self.call_count += 1
+            for name in self.totals:
+                self.totals[name] += stats.get(name) or 0
+            if stats.get("task") in (None, "answer"):
+                self.answer_latencies.append(stats["wall_seconds"])
+
+    def add_phase(self, name: str, seconds: float):
+        """로컬 구간 시간을 더합니다."""
+        with self._lock:
+            self._phases[name] = self._phases.get(name, 0.0) + seconds
+            self.phase_totals[name] = self.phase_totals.get(name, 0.0) + seconds
+
+    @contextmanager
+    def phase(self, name: str):
+        """with 블록의 실행 시간을 구간 시간으로 기록합니다."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_phase(name, time.perf_counter() - started)
+
+    # 반복 경계
+    def begin(self, iteration: int):
+        """새 반복을 시작합니다."""
+        with self._lock:
+            self.iteration = iteration
+            self._started = time.monotonic()
+            self._calls = []
+            self._phases = {}
+
+    def end(self, **extra):
+        """반복을 마치고 기록을 JSONL 한 줄로 씁니다. extra 는 기록에 그대로 포함됩니다."""
+        with self._lock:
+            if self._started is None:
+                return
+            seconds = time.monotonic() - self._started
+            record = {
+                "iteration": self.iteration,
+                "timestamp": datetime.now().isoformat(),
+                "seconds": seconds,
+                "phases": self._phases,
+                "calls": self._calls,
+                **extra,
+            }
+            self.iterations += 1
+            self.iteration_seconds.append(seconds)
+            self._started = None
+
+            if self._file is not None:
+                self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+                self._file.flush()
+
+        if self.prometheus_file:
+            self.write_prometheus()
+
+    # 집계
+    def summary(self) -> Dict[str, Any]:
+        """p50/p95 지연 시간, 초당 토큰 수, prefill 비율 등 전체 통계를 반환합니다."""
+        with self._lock:
+            totals = dict(self.totals)
+            latencies = list(self.answer_latencies)
+            phases = dict(self.phase_totals)
+            calls = self.call_count
+            iterations = self.iterations
+
+        compute = totals["prompt_eval_duration"] + totals["eval_duration"]
+        return {
+            "iterations": iterations,
+            "calls": calls,
+            "latency_p50": percentile(latencies, 0.5),
+            "latency_p95": percentile(latencies, 0.95),
+            "tokens_per_second": totals["eval_count"] / (totals["eval_duration"] / 1e9) if totals["eval_duration"] else None,
+            "prompt_tokens_per_second": (
+                totals["prompt_eval_count"] / (totals["prompt_eval_duration"] / 1e9) if totals["prompt_eval_duration"] else None
+            ),
+            "prefill_share": totals["prompt_eval_duration"] / compute if compute else None,
+            "prompt_tokens": totals["prompt_eval_count"],
+            "generated_tokens": totals["eval_count"],
+            "load_seconds": totals["load_duration"] / 1e9,
+            "phases": phases,
+        }
+
+    def prometheus_text(self) -> str:
+        """Prometheus 텍스트 노출 형식으로 지표를 만듭니다."""
+        summary = self.summary()
+        lines = [
+            "# HELP planner_iterations_total Completed planning iterations.",
+            "# TYPE planner_iterations_total counter",
+            f"planner_iterations_total {summary['iterations']}",
+            "# HELP planner_ollama_calls_total Completed Ollama calls.",
+            "# TYPE planner_ollama_calls_total counter",
+            f"planner_ollama_calls_total {summary['calls']}",
+            "# HELP planner_prompt_tokens_total Prompt tokens evaluated by Ollama.",
+            "# TYPE planner_prompt_tokens_total counter",
+            f"planner_prompt_tokens_total {summary['prompt_tokens']}",
+            "# HELP planner_generated_tokens_total Tokens generated by Ollama.",
+            "# TYPE planner_generated_tokens_total counter",
+            f"planner_generated_tokens_total {summary['generated_tokens']}",
+            "# HELP planner_answer_latency_seconds Wall time of answer calls.",
+            "# TYPE planner_answer_latency_seconds summary",
+        ]
+        for quantile, key in (("0.5", "latency_p50"), ("0.95", "latency_p95")):
+            if summary[key] is not None:
+                lines.append(f'planner_answer_latency_seconds{{quantile="{quantile}"}} {summary[key]:.6f}')
+        for name, help_text in (("tokens_per_second", "Generation throughput."),
+                                ("prefill_share", "Share of model compute time spent on prompt evaluation.")):
+            if summary[name] is not None:
+                lines += [f"# HELP planner_{name} {help_text}", f"# TYPE planner_{name} gauge",
+                          f"planner_{name} {summary[name]:.6f}"]
+        lines += ["# HELP planner_phase_seconds_total Local time spent per phase.",
+                  "# TYPE planner_phase_seconds_total counter"]
+        for name, seconds in sorted(summary["phases"].items()):
+            lines.append(f'planner_phase_seconds_total{{phase="{name}"}} {seconds:.6f}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self):
+        """Prometheus 텍스트 파일을 원자적으로 갱신합니다 (node_exporter textfile collector 용)."""
+        tmp_path = f"{self.prometheus_file}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp_path, self.prometheus_file)
+
+    def _start_server(self, host: str, port: int):
+        recorder = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                body = recorder.prometheus_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+        logging.info(f"Serving Prometheus metrics on http://{host}:{port}/metrics")
+
+    def close(self):
+        """파일과 HTTP 서버를 정리합니다."""
+        if self.prometheus_file:
+            self.write_prometheus()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+# 모듈 기본 기록기 (main 에서 설정, 없으면 측정하지 않음)
+_recorder: Optional[MetricsRecorder] = None
+
+
+def set_recorder(recorder: Optional[MetricsRecorder]):
+    """timed() 가 기록할 기본 기록기를 설정합니다."""
+    global _recorder
+    _recorder = recorder
+
+
+@contextmanager
+def timed(name: str):
+    """기본 기록기가 있으면 with 블록의 시간을 구간 시간으로 기록합니다."""
+    if _recorder is None:
+        yield
+        return
+    with _recorder.phase(name):
+        yield
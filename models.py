@@ -1,45 +1,199 @@
 """
 데이터 모델 정의
 """
+import os
+import re
+import difflib
+import sys
+from enum import Enum
 from dataclasses import dataclass, field
 from datetime import datetime
-from typing import List, Dict, Optional, Any
+from collections.abc import MutableSequence
+from typing import List, Dict, Optional, Any, Tuple
+
+import config
+
+try:
+    import orjson  # 선택 의존성: 설치되어 있으면 JSON 직렬화에 사용
+except ImportError:
+    orjson = None
+
+
+# 언어별 파일 확장자
+LANGUAGE_EXTENSIONS = {
+    "python": "py",
+    "javascript": "js",
+    "typescript": "ts",
+    "java": "java",
+    "cpp": "cpp",
+    "c": "c",
+    "csharp": "cs",
+    "go": "go",
+    "rust": "rs",
+    "ruby": "rb",
+    "php": "php",
+    "swift": "swift",
+    "kotlin": "kt",
+    "text": "txt",
+    "": "txt"
+}
+
+
+def extension_for(language: str) -> str:
+    """언어 이름에 해당하는 파일 확장자를 반환합니다. 없으면 txt."""
+    return LANGUAGE_EXTENSIONS.get((language or "").lower(), "txt")
+
+
+class MissingSnippetError(ValueError):
+    """스니펫 데이터에 코드도 없고, 참조하는 저장소 파일도 찾을 수 없는 경우"""
+
+
+class Level(str, Enum):
+    """우선순위/복잡도 단계"""
+    HIGH = "high"
+    MEDIUM = "medium"
+    LOW = "low"
+
+
+class Status(str, Enum):
+    """기능 진행 상태"""
+    PROPOSED = "proposed"
+    IN_PROGRESS = "in_progress"
+    COMPLETED = "completed"
+
+
+def _to_enum(enum_cls, value, default):
+    """문자열을 열거형 멤버로 바꿉니다. 알 수 없는 값은 그대로 둡니다."""
+    if value is None:
+        return default
+    try:
+        return enum_cls(value)
+    except ValueError:
+        return value
+
+
+# 모듈 이름 비교 시 무시하는 일반 단어
+GENERIC_MODULE_WORDS = {"module", "모듈", "component", "컴포넌트"}
+
+
+def module_tokens(name: str) -> List[str]:
+    """모듈 이름을 비교용 토큰 목록으로 나눕니다."""
+    lines = (name or "").strip().splitlines()
+    name = lines[0] if lines else ""
+    name = re.sub(r"([a-z0-9])([A-Z])", r"\1 \2", name)
+    tokens = re.findall(r"[a-z0-9]+|[가-힣]+", name.lower())
+    meaningful = [token for token in tokens if token not in GENERIC_MODULE_WORDS]
+    return meaningful or tokens
+
+
+def normalize_module_name(name: str) -> str:
+    """모듈 이름을 색인 키로 정규화합니다. 예: "User Auth", "user_auth", "UserAuth 모듈" -> "userauth" """
+    return "".join(module_tokens(name))
+
+
+def _enum_value(value):
+    """열거형 멤버는 저장용 문자열 값으로 바꿉니다."""
+    return value.value if isinstance(value, Enum) else value
 
 
-@dataclass
 class CodeSnippet:
-    """코드 스니펫 모델"""
-    language: str
-    code: str
-    description: Optional[str] = None
-    filename: Optional[str] = None
+    """코드 스니펫 모델
+    
+    스니펫이 디스크(스니펫 저장소)에 기록된 뒤 release() 를 호출하면 메모리의 코드를 버리고,
+    이후 code 에 접근할 때마다 파일에서 읽어옵니다. 장시간 실행에서도 생성된 코드 전체가
+    메모리에 쌓이지 않습니다.
+    """
+    __slots__ = ("language", "_code", "description", "filename", "digest", "_base_dir")
+    
+    def __init__(self, language: str, code: str, description: Optional[str] = None,
+                 filename: Optional[str] = None, digest: Optional[str] = None):
+        self.language = sys.intern(language or "")
+        self._code = code
+        self.description = description
+        self.filename = filename
+        self.digest = digest  # 스니펫 저장소에 저장된 경우 코드 내용의 해시
+        self._base_dir = None
+    
+    @property
+    def code(self) -> str:
+        """코드 내용 (메모리에 없으면 파일에서 읽음)"""
+        code = self._code
+        if code is not None:
+            return code
+        with open(os.path.join(self._base_dir, self.filename), 'r', encoding='utf-8') as f:
+            return f.read()
+    
+    @code.setter
+    def code(self, value: str):
+        self._code = value
+        self._base_dir = None
+    
+    @property
+    def is_loaded(self) -> bool:
+        """코드가 메모리에 있는지 여부"""
+        return self._code is not None
+    
+    def release(self, base_dir: str) -> bool:
+        """파일로 저장된 코드를 메모리에서 내립니다. 파일이 없으면 유지하고 False 반환."""
+        if not self.filename or not os.path.exists(os.path.join(base_dir, self.filename)):
+            return False
+        self._base_dir = base_dir
+        self._code = None
+        return True
+    
+    def __repr__(self) -> str:
+        return f"CodeSnippet(language={self.language!r}, filename={self.filename!r}, digest={self.digest!r})"
+    
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, CodeSnippet):
+            return NotImplemented
+        return (self.language, self.code, self.description, self.filename) == \
+            (other.language, other.code, other.description, other.filename)
+    
+    def to_dict(self, inline_code: bool = True) -> Dict[str, Any]:
+        """객체를 사전 형태로 변환합니다.
+        
+        inline_code=False 이면 메모리에서 내린 코드는 파일에서 읽지 않고 저장소 참조(digest, filename)만 남깁니다.
+        """
+        return {
+            "language": self.language,
+            "code": self.code if inline_code or self.is_loaded else None,
+            "description": self.description,
+            "filename": self.filename,
+            "digest": self.digest
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], base_dir: str = None) -> 'CodeSnippet':
+        """사전 형태의 데이터에서 객체를 생성합니다.
+        
+        base_dir 가 주어지고 저장소 파일이 남아 있으면 코드를 메모리에 올리지 않습니다.
+        코드 없이 저장소 참조만 있는 데이터는 base_dir 에 참조한 파일이 있어야 하며,
+        없으면 빈 스니펫으로 만들지 않고 MissingSnippetError 를 발생시킵니다.
+        """
+        code = data.get("code")
+        snippet = cls(
+            language=data.get("language", ""),
+            code=code if code is not None else "",
+            description=data.get("description"),
+            filename=data.get("filename"),
+            digest=data.get("digest")
+        )
+        released = bool(base_dir and snippet.digest) and snippet.release(base_dir)
+        if code is None and not released:
+            raise MissingSnippetError(
+                f"Snippet has no inline code and its stored file is missing: {snippet.filename or snippet.digest}"
+            )
+        return snippet
     
     def save_to_file(self, base_dir: str) -> str:
         """코드 스니펫을 파일로 저장합니다."""
-        import os
+        import hashlib
         
         if not self.filename:
-            lang_ext = {
-                "python": "py",
-                "javascript": "js",
-                "typescript": "ts",
-                "java": "java",
-                "cpp": "cpp",
-                "c": "c",
-                "csharp": "cs",
-                "go": "go",
-                "rust": "rs",
-                "ruby": "rb",
-                "php": "php",
-                "swift": "swift",
-                "kotlin": "kt",
-                "text": "txt",
-                "": "txt"
-            }
-            
-            # 언어 확장자 찾기, 없으면 기본값 txt 사용
-            ext = lang_ext.get(self.language.lower(), "txt")
-            self.filename = f"snippet_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{ext}"
+            # 같은 초에 저장된 스니펫끼리 덮어쓰지 않도록 내용 해시를 붙임
+            content_hash = hashlib.sha256(self.code.encode("utf-8")).hexdigest()[:8]
+            self.filename = f"snippet_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{content_hash}.{extension_for(self.language)}"
         
         file_path = os.path.join(base_dir, self.filename)
         
@@ -52,49 +206,45 @@ class CodeSnippet:
         return file_path
 
 
-@dataclass
 class Feature:
     """기능 모델"""
-    name: str
-    description: str
-    priority: str = "medium"  # 우선순위: high, medium, low
-    complexity: str = "medium"  # 복잡도: high, medium, low
-    status: str = "proposed"  # 상태: proposed, in_progress, completed
-    code_snippets: List[CodeSnippet] = field(default_factory=list)
-    dependencies: List[str] = field(default_factory=list)
+    __slots__ = ("name", "description", "priority", "complexity", "status", "code_snippets", "dependencies")
     
-    def to_dict(self) -> Dict[str, Any]:
+    def __init__(self, name: str, description: str, priority: str = Level.MEDIUM, complexity: str = Level.MEDIUM,
+                 status: str = Status.PROPOSED, code_snippets: List[CodeSnippet] = None,
+                 dependencies: List[str] = None):
+        self.name = name
+        self.description = description
+        self.priority = _to_enum(Level, priority, Level.MEDIUM)  # 우선순위: high, medium, low
+        self.complexity = _to_enum(Level, complexity, Level.MEDIUM)  # 복잡도: high, medium, low
+        self.status = _to_enum(Status, status, Status.PROPOSED)  # 상태: proposed, in_progress, completed
+        self.code_snippets = code_snippets if code_snippets is not None else []
+        self.dependencies = dependencies if dependencies is not None else []
+    
+    def __repr__(self) -> str:
+        return f"Feature(name={self.name!r}, status={self.status!r}, code_snippets={len(self.code_snippets)})"
+    
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Feature):
+            return NotImplemented
+        return all(getattr(self, slot) == getattr(other, slot) for slot in self.__slots__)
+    
+    def to_dict(self, inline_code: bool = True) -> Dict[str, Any]:
         """객체를 사전 형태로 변환합니다."""
         return {
             "name": self.name,
             "description": self.description,
-            "priority": self.priority,
-            "complexity": self.complexity,
-            "status": self.status,
-            "code_snippets": [
-                {
-                    "language": snippet.language,
-                    "code": snippet.code,
-                    "description": snippet.description,
-                    "filename": snippet.filename
-                }
-                for snippet in self.code_snippets
-            ],
+            "priority": _enum_value(self.priority),
+            "complexity": _enum_value(self.complexity),
+            "status": _enum_value(self.status),
+            "code_snippets": [snippet.to_dict(inline_code) for snippet in self.code_snippets],
             "dependencies": self.dependencies
         }
     
     @classmethod
-    def from_dict(cls, data: Dict[str, Any]) -> 'Feature':
+    def from_dict(cls, data: Dict[str, Any], base_dir: str = None) -> 'Feature':
         """사전 형태의 데이터에서 객체를 생성합니다."""
-        code_snippets = [
-            CodeSnippet(
-                language=snippet.get("language", ""),
-                code=snippet.get("code", ""),
-                description=snippet.get("description"),
-                filename=snippet.get("filename")
-            )
-            for snippet in data.get("code_snippets", [])
-        ]
+        code_snippets = [CodeSnippet.from_dict(snippet, base_dir) for snippet in data.get("code_snippets", [])]
         
         return cls(
             name=data.get("name", ""),
@@ -113,24 +263,27 @@ class Component:
     name: str
     description: str
     features: List[Feature] = field(default_factory=list)
+    aliases: List[str] = field(default_factory=list)  # 같은 컴포넌트로 병합된 다른 모듈 이름들
     
-    def to_dict(self) -> Dict[str, Any]:
+    def to_dict(self, inline_code: bool = True) -> Dict[str, Any]:
         """객체를 사전 형태로 변환합니다."""
         return {
             "name": self.name,
             "description": self.description,
-            "features": [feature.to_dict() for feature in self.features]
+            "features": [feature.to_dict(inline_code) for feature in self.features],
+            "aliases": self.aliases
         }
     
     @classmethod
-    def from_dict(cls, data: Dict[str, Any]) -> 'Component':
+    def from_dict(cls, data: Dict[str, Any], base_dir: str = None) -> 'Component':
         """사전 형태의 데이터에서 객체를 생성합니다."""
-        features = [Feature.from_dict(feature_data) for feature_data in data.get("features", [])]
+        features = [Feature.from_dict(feature_data, base_dir) for feature_data in data.get("features", [])]
         
         return cls(
             name=data.get("name", ""),
             description=data.get("description", ""),
-            features=features
+            features=features,
+            aliases=data.get("aliases", [])
         )
 
 
@@ -143,6 +296,88 @@ class Project:
     created_at: datetime = field(default_factory=datetime.now)
     updated_at: datetime = field(default_factory=datetime.now)
     
+    # 정규화된 모듈 키 -> 컴포넌트 위치 색인 (별칭 포함)
+    _index: Dict[str, int] = field(default_factory=dict, init=False, repr=False, compare=False)
+    _tokens: Dict[int, frozenset] = field(default_factory=dict, init=False, repr=False, compare=False)
+    _indexed_count: int = field(default=0, init=False, repr=False, compare=False)
+    
+    def _sync_index(self):
+        """색인 이후 추가된 컴포넌트를 색인에 반영합니다."""
+        for position in range(self._indexed_count, len(self.components)):
+            component = self.components[position]
+            for name in [component.name] + list(component.aliases):
+                key = normalize_module_name(name)
+                self._index.setdefault(key, position)
+            self._tokens[position] = frozenset(module_tokens(component.name))
+        self._indexed_count = len(self.components)
+    
+    def find_component(self, module_name: str, fuzzy: bool = None) -> Optional[Component]:
+        """모듈 이름에 해당하는 컴포넌트를 찾습니다.
+        
+        대소문자, 공백, 밑줄, camelCase, '모듈'/'module' 같은 접미어 차이는 정규화된 키로
+        바로 찾습니다. 없으면 fuzzy 설정에 따라 편집 거리와 토큰 겹침으로 가장 비슷한
+        컴포넌트를 찾고, 찾은 이름을 별칭으로 등록하여 다음부터는 바로 찾습니다.
+        """
+        self._sync_index()
+        key = normalize_module_name(module_name)
+        position = self._index.get(key)
+        if position is not None:
+            return self.components[position]
+        
+        if fuzzy is None:
+            fuzzy = config.COMPONENT_FUZZY_MERGE
+        if not fuzzy or not key:
+            return None
+        
+        tokens = frozenset(module_tokens(module_name))
+        best_position, best_score = None, config.COMPONENT_MERGE_THRESHOLD
+        for position, component in enumerate(self.components):
+            existing_key = normalize_module_name(component.name)
+            existing_tokens = self._tokens.get(position, frozenset())
+            overlap = len(tokens & existing_tokens) / len(tokens | existing_tokens) if tokens and existing_tokens else 0.0
+            score = max(difflib.SequenceMatcher(None, key, existing_key).ratio(), overlap)
+            if score >= best_score:
+                best_position, best_score = position, score
+        
+        if best_position is None:
+            return None
+        
+        component = self.components[best_position]
+        self.add_alias(component, module_name, best_position)
+        return component
+    
+    def add_component(self, component: Component) -> Component:
+        """컴포넌트를 추가하고 색인에 등록합니다."""
+        self._sync_index()
+        self.components.append(component)
+        self._sync_index()
+        return component
+    
+    def add_alias(self, component: Component, alias: str, position: int = None):
+        """컴포넌트에 별칭을 등록합니다."""
+        if position is None:
+            self._sync_index()
+            position = self._index[normalize_module_name(component.name)]
+        if alias != component.name and alias not in component.aliases:
+            component.aliases.append(alias)
+        self._index[normalize_module_name(alias)] = position
+    
+    def mark(self) -> Tuple[int, List[Tuple[int, int]]]:
+        """rollback 으로 되돌릴 수 있도록 현재 컴포넌트, 기능, 별칭 개수를 기록합니다."""
+        return len(self.components), [(len(component.features), len(component.aliases)) for component in self.components]
+    
+    def rollback(self, mark: Tuple[int, List[Tuple[int, int]]]):
+        """mark 이후 추가된 컴포넌트, 기능, 별칭을 제거합니다."""
+        count, sizes = mark
+        del self.components[count:]
+        for component, (features, aliases) in zip(self.components, sizes):
+            del component.features[features:]
+            del component.aliases[aliases:]
+        # 제거된 이름이 남지 않도록 색인은 다음 조회 때 처음부터 다시 만듦
+        self._index.clear()
+        self._tokens.clear()
+        self._indexed_count = 0
+    
     def to_dict(self) -> Dict[str, Any]:
         """객체를 사전 형태로 변환합니다."""
         return {
@@ -154,9 +389,12 @@ class Project:
         }
     
     @classmethod
-    def from_dict(cls, data: Dict[str, Any]) -> 'Project':
-        """사전 형태의 데이터에서 객체를 생성합니다."""
-        components = [Component.from_dict(component_data) for component_data in data.get("components", [])]
+    def from_dict(cls, data: Dict[str, Any], base_dir: str = None) -> 'Project':
+        """사전 형태의 데이터에서 객체를 생성합니다.
+        
+        base_dir 가 주어지면 스니펫 저장소에 있는 코드는 필요할 때 파일에서 읽습니다.
+        """
+        components = [Component.from_dict(component_data, base_dir) for component_data in data.get("components", [])]
         
         created_at = datetime.fromisoformat(data.get("created_at")) if data.get("created_at") else datetime.now()
         updated_at = datetime.fromisoformat(data.get("updated_at")) if data.get("updated_at") else datetime.now()
@@ -169,23 +407,169 @@ class Project:
             updated_at=updated_at
         )
     
-    def save_to_json(self, file_path: str) -> None:
-        """프로젝트를 JSON 파일로 저장합니다."""
-        import json
-        import os
+    def save_to_json(self, file_path: str, indent: Optional[int] = 2) -> None:
+        """프로젝트를 JSON 파일로 저장합니다.
         
+        전체 사전을 한 번에 만들지 않고 컴포넌트를 하나씩 직렬화하여 기록합니다.
+        indent=None 이면 들여쓰기 없는 압축 형식으로 저장하며, 이 형식은 컴포넌트가
+        한 줄에 하나씩 기록되어 load_from_json(lazy=True) 로 지연 로드할 수 있습니다.
+        orjson 이 설치되어 있으면 더 빠른 orjson 으로 직렬화합니다.
+        """
         # 디렉토리가 없으면 생성
         os.makedirs(os.path.dirname(file_path), exist_ok=True)
         
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+        header = {
+            "name": self.name,
+            "description": self.description,
+            "created_at": self.created_at.isoformat(),
+            "updated_at": self.updated_at.isoformat()
+        }
+        
+        # 쓰는 도중 중단되어도 기존 파일이 손상되지 않도록 임시 파일에 쓴 뒤 이름 변경
+        tmp_path = f"{file_path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            if indent is None:
+                f.write(b"{")
+                for key, value in header.items():
+                    f.write(_dumps(key) + b":" + _dumps(value) + b",")
+                f.write(b'"components":[\n')
+                for index, component in enumerate(self.components):
+                    if index:
+                        f.write(b",\n")
+                    f.write(_dumps(component.to_dict()))
+                f.write(b"\n]}\n")
+            else:
+                pad = b" " * indent
+                f.write(b"{\n")
+                for key, value in header.items():
+                    f.write(pad + _dumps(key) + b": " + _dumps(value) + b",\n")
+                f.write(pad + b'"components": [')
+                for index, component in enumerate(self.components):
+                    f.write(b",\n" if index else b"\n")
+                    encoded = _dumps(component.to_dict(), indent)
+                    f.write(b"\n".join(pad * 2 + line for line in encoded.split(b"\n")))
+                f.write(b"\n" + pad + b"]\n}\n" if self.components else b"]\n}\n")
+        
+        os.replace(tmp_path, file_path)
     
     @classmethod
-    def load_from_json(cls, file_path: str) -> 'Project':
-        """JSON 파일에서 프로젝트를 로드합니다."""
+    def load_from_json(cls, file_path: str, base_dir: str = None, lazy: bool = False) -> 'Project':
+        """JSON 파일에서 프로젝트를 로드합니다.
+        
+        lazy=True 이고 파일이 압축 형식이면 컴포넌트 위치만 색인해 두고,
+        각 컴포넌트는 처음 접근할 때 읽어서 만듭니다. 일부 컴포넌트만 읽는 도구용이며,
+        컴포넌트 전체를 순회하거나 find_component 로 찾으면 결국 모두 메모리에 올라옵니다.
+        """
         import json
         
+        if lazy:
+            project = cls._load_lazy(file_path, base_dir)
+            if project is not None:
+                return project
+        
         with open(file_path, 'r', encoding='utf-8') as f:
             data = json.load(f)
         
-        return cls.from_dict(data)
+        return cls.from_dict(data, base_dir)
+    
+    @classmethod
+    def _load_lazy(cls, file_path: str, base_dir: str = None) -> Optional['Project']:
+        """압축 형식 파일을 지연 로드합니다. 형식이 맞지 않으면 None."""
+        import json
+        
+        marker = b'"components":[\n'
+        with open(file_path, 'rb') as f:
+            first_line = f.readline()
+            if not first_line.startswith(b"{") or not first_line.endswith(marker):
+                return None
+            
+            header = json.loads(first_line[:-len(marker)].rstrip(b",") + b"}")
+            
+            # 파싱 없이 각 컴포넌트 줄의 시작 위치만 기록
+            offsets = []
+            while True:
+                offset = f.tell()
+                line = f.readline()
+                if not line or line.startswith(b"]"):
+                    break
+                if line.strip():
+                    offsets.append(offset)
+        
+        return cls(
+            name=header.get("name", ""),
+            description=header.get("description", ""),
+            components=LazyComponentList(file_path, offsets, base_dir),
+            created_at=datetime.fromisoformat(header["created_at"]) if header.get("created_at") else datetime.now(),
+            updated_at=datetime.fromisoformat(header["updated_at"]) if header.get("updated_at") else datetime.now()
+        )
+
+
+class LazyComponentList(MutableSequence):
+    """처음 접근할 때 파일에서 읽어 만드는 컴포넌트 목록
+    
+    한 번 만든 컴포넌트는 목록에 보관되며, 추가된 컴포넌트는 일반 목록처럼 다룹니다.
+    """
+    
+    def __init__(self, file_path: str, offsets: List[int], base_dir: str = None):
+        self._file_path = file_path
+        self._offsets: List[Optional[int]] = list(offsets)
+        self._items: List[Optional[Component]] = [None] * len(offsets)
+        self._base_dir = base_dir
+    
+    def _materialize(self, index: int) -> Component:
+        import json
+        
+        item = self._items[index]
+        if item is None:
+            with open(self._file_path, 'rb') as f:
+                f.seek(self._offsets[index])
+                line = f.readline().rstrip(b",\r\n")
+            item = Component.from_dict(json.loads(line), self._base_dir)
+            self._items[index] = item
+            self._offsets[index] = None
+        return item
+    
+    @property
+    def loaded_count(self) -> int:
+        """메모리에 올라온 컴포넌트 수"""
+        return sum(1 for item in self._items if item is not None)
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._materialize(i) for i in range(len(self._items))[index]]
+        if index < 0:
+            index += len(self._items)
+        return self._materialize(index)
+    
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            raise TypeError("slice assignment is not supported")
+        self._items[index] = value
+        self._offsets[index] = None
+    
+    def __delitem__(self, index):
+        del self._items[index]
+        del self._offsets[index]
+    
+    def __len__(self) -> int:
+        return len(self._items)
+    
+    def insert(self, index: int, value: Component):
+        self._items.insert(index, value)
+        self._offsets.insert(index, None)
+    
+    def __eq__(self, other) -> bool:
+        return list(self) == list(other)
+    
+    def __repr__(self) -> str:
+        return f"LazyComponentList(loaded={self.loaded_count}/{len(self)})"
+
+
+def _dumps(value: Any, indent: Optional[int] = None) -> bytes:
+    """값을 UTF-8 JSON 바이트로 직렬화합니다. 가능하면 orjson 을 사용합니다."""
+    if orjson is not None and indent in (None, 2):
+        return orjson.dumps(value, option=orjson.OPT_INDENT_2 if indent else 0)
+    
+    import json
+    separators = (",", ":") if indent is None else None
+    return json.dumps(value, ensure_ascii=False, indent=indent, separators=separators).encode("utf-8")
@@ -0,0 +1,444 @@
+"""
+Ollama API 클라이언트
+"""
+import json
+import time
+import random
+import logging
+from typing import Dict, Any, List, Optional, Iterator, Callable
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import config
+from response_cache import ResponseCache
+from host_pool import HostPool, HostState, ModelUnavailableError
+from deadline import Deadline
+from prompt_builder import estimate_tokens
+
+
+# 예외 정의
+class OllamaError(Exception):
+    """Ollama 호출 실패를 나타내는 기본 예외"""
+
+
+class OllamaConnectionError(OllamaError):
+    """서버에 연결할 수 없거나 연결이 끊어진 경우"""
+
+
+class OllamaTimeoutError(OllamaError):
+    """응답 대기 시간이 초과된 경우"""
+
+
+class OllamaDeadlineError(OllamaTimeoutError):
+    """실행 종료 시각에 도달하여 호출을 시작하지 않았거나 생성 도중 중단한 경우"""
+
+
+class OllamaCacheMissError(OllamaError):
+    """replay 캐시 모드에서 캐시에 없는 요청을 만난 경우 (서버로 보내지 않음)"""
+
+
+class OllamaResponseError(OllamaError):
+    """서버가 오류 상태 코드나 오류 본문을 반환한 경우"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+# 호출 완료 시 Ollama가 함께 반환하는 성능 정보 (durations 는 나노초)
+STATS_FIELDS = (
+    "prompt_eval_count",
+    "prompt_eval_duration",
+    "eval_count",
+    "eval_duration",
+    "load_duration",
+    "total_duration",
+)
+
+
+class OllamaClient:
+    """연결 풀과 재시도를 갖춘 Ollama API 클라이언트
+
+    하나의 인스턴스를 메인 루프, 대화 요약, 다음 질문 생성이 공유하여
+    TCP 연결을 재사용합니다. 서버를 여러 개 지정하면 HostPool 이 요청마다
+    처리 중 요청이 가장 적은 서버를 고르고, 실패한 서버는 제외했다가 복구되면 다시 씁니다.
+    """
+
+    def __init__(
+        self,
+        host: str = None,
+        model: str = None,
+        connect_timeout: float = None,
+        read_timeout: float = None,
+        max_retries: int = None,
+        backoff_base: float = None,
+        backoff_max: float = None,
+        pool_size: int = None,
+        keep_alive: str = None,
+        options: Dict[str, Any] = None,
+        cache: ResponseCache = None,
+        hosts: List[str] = None,
+        routes: Dict[str, Dict[str, Any]] = None,
+    ):
+        hosts = hosts or config.OLLAMA_HOSTS or [host or config.OLLAMA_HOST]
+        self.host = hosts[0].rstrip("/")
+        self.model = model
+        self.connect_timeout = config.OLLAMA_CONNECT_TIMEOUT if connect_timeout is None else connect_timeout
+        self.read_timeout = config.OLLAMA_READ_TIMEOUT if read_timeout is None else read_timeout
+        self.max_retries = config.OLLAMA_MAX_RETRIES if max_retries is None else max_retries
+        self.backoff_base = config.OLLAMA_BACKOFF_BASE if backoff_base is None else backoff_base
+        self.backoff_max = config.OLLAMA_BACKOFF_MAX if backoff_max is None else backoff_max
+        self.keep_alive = config.OLLAMA_KEEP_ALIVE if keep_alive is None else keep_alive
+        # 모든 요청에 기본으로 적용할 생성 옵션 (num_ctx 등)
+        self.options: Dict[str, Any] = dict(options or {})
+        self.cache = cache
+        # 호출이 끝날 때마다 성능 정보(STATS_FIELDS, 모델, 작업, 실제 소요 시간)를 받는 함수
+        self.stats_listener: Optional[Callable[[Dict[str, Any]], None]] = None
+        # 설정하면 모든 호출의 시간 제한과 생성 길이를 실행 종료 시각에 맞춤
+        self.deadline: Optional[Deadline] = None
+        # 작업 종류별 모델과 생성 옵션 ("answer", "next_question", "summary", "extraction")
+        self.routes: Dict[str, Dict[str, Any]] = config.MODEL_ROUTES if routes is None else routes
+        pool_size = config.OLLAMA_POOL_SIZE if pool_size is None else pool_size
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max(pool_size, len(hosts)), pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.pool = HostPool(hosts, session=self.session)
+
+    def close(self):
+        """연결 풀을 정리합니다."""
+        self.pool.close()
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _backoff(self, attempt: int) -> float:
+        """지수 백오프 대기 시간을 계산합니다 (full jitter)."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _post(self, path: str, payload: Dict[str, Any], stream: bool = False) -> requests.Response:
+        """재시도 정책을 적용하여 POST 요청을 보냅니다.
+
+        스트리밍 응답은 서버 풀의 처리 중 요청 수를 _iter_stream 이 끝날 때 반환합니다.
+        """
+        last_error: Optional[OllamaError] = None
+        host: Optional[HostState] = None
+
+        for attempt in range(self.max_retries + 1):
+            if attempt > 0:
+                delay = self._backoff(attempt - 1)
+                if self.deadline is not None:
+                    delay = min(delay, max(0.0, self.deadline.remaining()))
+                logging.warning(f"Retrying Ollama request in {delay:.1f}s ({attempt}/{self.max_retries}): {last_error}")
+                time.sleep(delay)
+
+            read_timeout = self.read_timeout
+            if self.deadline is not None:
+                if self.deadline.expired():
+                    raise OllamaDeadlineError(f"Run deadline reached before calling {path}")
+                read_timeout = self.deadline.timeout(self.read_timeout)
+            timeout = (self.connect_timeout, read_timeout)
+
+            # 재시도할 때는 다른 서버가 있으면 방금 실패한 서버를 피함
+            try:
+                host = self.pool.acquire(payload.get("model"), exclude=host)
+            except ModelUnavailableError as e:
+                # 모델을 가진 서버가 없으면 재시도해도 같으므로 바로 실패 처리
+                raise OllamaConnectionError(str(e)) from e
+            url = f"{host.url}{path}"
+            try:
+                response = self.session.post(url, json=payload, timeout=timeout, stream=stream)
+            except requests.exceptions.ConnectTimeout as e:
+                self.pool.release(host, ok=False)
+                last_error = OllamaTimeoutError(f"Connection to {url} timed out: {e}")
+                continue
+            except requests.exceptions.ReadTimeout as e:
+                # 생성 도중의 읽기 시간 초과는 재시도해도 같은 비용이 드므로 바로 실패 처리
+                if read_timeout < self.read_timeout:
+                    # 종료 시각에 맞춘 시간 제한으로 끊은 것은 서버 실패가 아님
+                    self.pool.release(host)
+                    raise OllamaDeadlineError(f"Run deadline reached while waiting for {url}") from e
+                self.pool.release(host, ok=False)
+                raise OllamaTimeoutError(f"Read from {url} timed out after {self.read_timeout}s") from e
+            except requests.exceptions.ConnectionError as e:
+                self.pool.release(host, ok=False)
+                last_error = OllamaConnectionError(f"Cannot reach Ollama at {url}: {e}")
+                continue
+
+            if response.status_code >= 500:
+                self.pool.release(host, ok=False)
+                last_error = OllamaResponseError(
+                    f"Server error {response.status_code}: {response.text[:200]}",
+                    status_code=response.status_code,
+                )
+                response.close()
+                continue
+
+            if response.status_code != 200:
+                self.pool.release(host)
+                message = f"API error {response.status_code}: {response.text[:200]}"
+                response.close()
+                raise OllamaResponseError(message, status_code=response.status_code)
+
+            if stream:
+                response.ollama_host = host
+            else:
+                self.pool.release(host)
+            return response
+
+        raise last_error
+
+    def _get(self, path: str, host: str = None) -> Dict[str, Any]:
+        """재시도 없이 짧은 시간 제한으로 GET 요청을 보냅니다 (상태 조회용)."""
+        url = f"{(host or self.host).rstrip('/')}{path}"
+        try:
+            response = self.session.get(url, timeout=(self.connect_timeout, self.connect_timeout))
+        except requests.exceptions.Timeout as e:
+            raise OllamaTimeoutError(f"Request to {url} timed out: {e}") from e
+        except requests.exceptions.ConnectionError as e:
+            raise OllamaConnectionError(f"Cannot reach Ollama at {url}: {e}") from e
+
+        if response.status_code != 200:
+            message = f"API error {response.status_code}: {response.text[:200]}"
+            response.close()
+            raise OllamaResponseError(message, status_code=response.status_code)
+        return self._read_json(response)
+
+    def route(self, task: str = None) -> Dict[str, Any]:
+        """작업 종류에 해당하는 경로 설정(model, options)을 반환합니다."""
+        return (self.routes.get(task) or {}) if task else {}
+
+    def model_for(self, task: str = None) -> str:
+        """작업에 사용할 모델 이름을 반환합니다."""
+        return self.route(task).get("model") or self.model or config.MODEL_NAME
+
+    def models_in_use(self) -> List[str]:
+        """이 클라이언트가 사용하는 모든 모델 이름을 반환합니다."""
+        return list(dict.fromkeys([self.model_for()] + [self.model_for(task) for task in self.routes]))
+
+    def _payload(self, model: str, options: Dict[str, Any], stream: bool, task: str = None, **fields) -> Dict[str, Any]:
+        """요청 본문을 구성합니다.
+
+        모델과 옵션은 직접 지정한 값, 작업별 경로 설정, 클라이언트 기본값 순으로 적용됩니다.
+        """
+        route = self.route(task)
+        payload = {
+            "model": model or self.model_for(task),
+            **fields,
+            "stream": stream,
+        }
+        merged_options = {**self.options, **(route.get("options") or {}), **(options or {})}
+        if self.deadline is not None:
+            merged_options = self._limit_to_deadline(merged_options, fields)
+        if merged_options:
+            payload["options"] = merged_options
+        if self.keep_alive:
+            payload["keep_alive"] = self.keep_alive
+        return payload
+
+    def _limit_to_deadline(self, options: Dict[str, Any], fields: Dict[str, Any]) -> Dict[str, Any]:
+        """남은 시간에 맞게 num_predict 를 제한합니다. 시간이 부족하면 OllamaDeadlineError."""
+        prompt_tokens = 0
+        if self.deadline.prompt_tokens_per_second:
+            if "prompt" in fields:
+                prompt_tokens = estimate_tokens(fields["prompt"])
+            else:
+                prompt_tokens = sum(estimate_tokens(message.get("content", "")) for message in fields.get("messages", []))
+
+        limited = self.deadline.limit(options, prompt_tokens)
+        if limited is None:
+            raise OllamaDeadlineError(f"Not enough time left before the run deadline ({self.deadline.remaining():.0f}s)")
+        if limited.get("num_predict") != options.get("num_predict"):
+            logging.info(f"Limiting generation to {limited['num_predict']} tokens to finish before the run deadline")
+        return limited
+
+    def _read_json(self, response: requests.Response) -> Dict[str, Any]:
+        """비스트리밍 응답 본문을 파싱합니다."""
+        try:
+            data = response.json()
+        except ValueError as e:
+            raise OllamaResponseError(f"Invalid JSON from Ollama: {response.text[:200]}") from e
+
+        if "error" in data:
+            raise OllamaResponseError(f"Ollama error: {data['error']}")
+        return data
+
+    def _report(self, task: Optional[str], payload: Dict[str, Any], data: Dict[str, Any], started: float):
+        """완료된 호출의 성능 정보를 종료 시각 예산과 stats_listener 에 전달합니다."""
+        if self.stats_listener is None and self.deadline is None:
+            return
+        stats = {
+            "task": task,
+            "model": payload.get("model"),
+            "wall_seconds": time.monotonic() - started,
+        }
+        stats.update({name: data[name] for name in STATS_FIELDS if name in data})
+        if self.deadline is not None:
+            self.deadline.observe(stats)
+        if self.stats_listener is not None:
+            self.stats_listener(stats)
+
+    def _iter_stream(self, response: requests.Response, extract, on_done: Callable = None) -> Iterator[str]:
+        """NDJSON 스트림을 읽어 각 조각의 텍스트를 반환합니다. 마지막 조각(done)은 on_done 에 전달합니다."""
+        ok = False
+        try:
+            for line in response.iter_lines():
+                if not line:
+                    continue
+
+                try:
+                    data = json.loads(line)
+                except ValueError as e:
+                    raise OllamaResponseError(f"Invalid stream chunk from Ollama: {line[:200]!r}") from e
+
+                if "error" in data:
+                    raise OllamaResponseError(f"Ollama error: {data['error']}")
+
+                if data.get("done") and on_done is not None:
+                    on_done(data)
+
+                text = extract(data)
+                if text:
+                    yield text
+
+                if self.deadline is not None and self.deadline.expired() and not data.get("done"):
+                    # 연결을 닫으면 Ollama도 생성을 멈춤. 서버 실패가 아니므로 ok 로 처리
+                    ok = True
+                    raise OllamaDeadlineError("Run deadline reached during generation; response truncated")
+            ok = True
+        except GeneratorExit:
+            # 호출 측이 중간에 읽기를 멈춘 경우는 서버 실패가 아님
+            ok = True
+            raise
+        except (requests.exceptions.ReadTimeout, requests.exceptions.ConnectionError,
+                requests.exceptions.ChunkedEncodingError) as e:
+            if self.deadline is not None and self.deadline.expired():
+                ok = True
+                raise OllamaDeadlineError("Run deadline reached during generation; response truncated") from e
+            if isinstance(e, requests.exceptions.ReadTimeout):
+                raise OllamaTimeoutError(f"Stream stalled for more than {self.read_timeout}s") from e
+            raise OllamaConnectionError(f"Stream interrupted: {e}") from e
+        finally:
+            response.close()
+            host = getattr(response, "ollama_host", None)
+            if host is not None:
+                self.pool.release(host, ok=ok)
+
+    def _cached(self, endpoint: str, payload: Dict[str, Any]):
+        """캐시 키와 캐시된 응답을 반환합니다. 캐시를 쓰지 않으면 (None, None).
+
+        읽기 전용(replay) 캐시에 없는 요청은 서버로 보내지 않고 OllamaCacheMissError 를 발생시킵니다.
+        """
+        if self.cache is None:
+            return None, None
+        key = ResponseCache.make_key(endpoint, payload)
+        cached = self.cache.get(key)
+        if cached is None and self.cache.read_only:
+            raise OllamaCacheMissError(f"No cached response for {endpoint} request ({payload.get('model')}, key {key[:12]}) in replay mode")
+        return key, cached
+
+    def _cached_stream(self, endpoint: str, payload: Dict[str, Any], extract, task: str = None) -> Iterator[str]:
+        """캐시를 거쳐 스트리밍 요청을 수행합니다. 캐시 적중 시 전체 응답을 한 조각으로 반환합니다."""
+        key, cached = self._cached(endpoint, payload)
+        if cached is not None:
+            yield cached
+            return
+
+        started = time.monotonic()
+        response = self._post(endpoint, payload, stream=True)
+        parts = []
+
+        def on_done(data):
+            self._report(task, payload, data, started)
+
+        for text in self._iter_stream(response, extract, on_done):
+            parts.append(text)
+            yield text
+
+        if key is not None:
+            self.cache.put(key, "".join(parts))
+
+    def generate(self, prompt: str, model: str = None, options: Dict[str, Any] = None, format: Any = None,
+                 task: str = None) -> str:
+        """/api/generate 를 호출하여 완성된 응답 텍스트를 반환합니다.
+
+        format 에 "json" 이나 JSON 스키마를 주면 Ollama가 그 형식에 맞는 출력만 생성합니다.
+        """
+        fields = {"format": format} if format is not None else {}
+        payload = self._payload(model, options, stream=False, task=task, prompt=prompt, **fields)
+        key, cached = self._cached("/api/generate", payload)
+        if cached is not None:
+            return cached
+
+        started = time.monotonic()
+        data = self._read_json(self._post("/api/generate", payload))
+        self._report(task, payload, data, started)
+
+        if "response" not in data:
+            raise OllamaResponseError(f"Missing 'response' field: {json.dumps(data)[:200]}")
+
+        if key is not None:
+            self.cache.put(key, data["response"])
+        return data["response"]
+
+    def generate_stream(self, prompt: str, model: str = None, options: Dict[str, Any] = None,
+                        task: str = None) -> Iterator[str]:
+        """/api/generate 를 스트리밍 모드로 호출하여 응답 조각을 순서대로 반환합니다.
+
+        연결 수립까지는 재시도하지만, 스트림 도중 끊어진 경우에는 중복 출력을 피하기 위해
+        재시도하지 않고 예외를 발생시킵니다.
+        """
+        payload = self._payload(model, options, stream=True, task=task, prompt=prompt)
+        yield from self._cached_stream("/api/generate", payload, lambda data: data.get("response"), task)
+
+    def chat(self, messages: List[Dict[str, str]], model: str = None, options: Dict[str, Any] = None,
+             format: Any = None, task: str = None) -> str:
+        """/api/chat 을 호출하여 어시스턴트 응답 텍스트를 반환합니다."""
+        fields = {"format": format} if format is not None else {}
+        payload = self._payload(model, options, stream=False, task=task, messages=messages, **fields)
+        key, cached = self._cached("/api/chat", payload)
+        if cached is not None:
+            return cached
+
+        started = time.monotonic()
+        data = self._read_json(self._post("/api/chat", payload))
+        self._report(task, payload, data, started)
+
+        message = data.get("message")
+        if not message or "content" not in message:
+            raise OllamaResponseError(f"Missing 'message' field: {json.dumps(data)[:200]}")
+
+        if key is not None:
+            self.cache.put(key, message["content"])
+        return message["content"]
+
+    def chat_stream(self, messages: List[Dict[str, str]], model: str = None, options: Dict[str, Any] = None,
+                    task: str = None) -> Iterator[str]:
+        """/api/chat 을 스트리밍 모드로 호출하여 응답 조각을 순서대로 반환합니다."""
+        payload = self._payload(model, options, stream=True, task=task, messages=messages)
+        yield from self._cached_stream("/api/chat", payload, lambda data: (data.get("message") or {}).get("content"), task)
+
+    def embeddings(self, prompt: str, model: str = None, task: str = "embedding") -> List[float]:
+        """/api/embeddings 를 호출하여 텍스트의 임베딩 벡터를 반환합니다."""
+        payload = {"model": model or self.model_for(task), "prompt": prompt}
+        if self.keep_alive:
+            payload["keep_alive"] = self.keep_alive
+
+        started = time.monotonic()
+        data = self._read_json(self._post("/api/embeddings", payload))
+        self._report(task, payload, data, started)
+
+        embedding = data.get("embedding")
+        if not embedding:
+            raise OllamaResponseError(f"Missing 'embedding' field: {json.dumps(data)[:200]}")
+        return embedding
+
+    def ps(self, host: str = None) -> List[Dict[str, Any]]:
+        """/api/ps 를 호출하여 현재 메모리에 올라와 있는 모델 목록을 반환합니다."""
+        return self._get("/api/ps", host).get("models", [])
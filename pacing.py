@@ -0,0 +1,113 @@
+"""
+반복 간 대기 시간 조절
+"""
+import time
+import logging
+from typing import Optional
+
+import config
+from ollama_client import OllamaClient, OllamaError
+
+
+class AdaptivePacer:
+    """관측한 호출 시간과 오류에 따라 반복 사이의 대기 시간을 정합니다.
+
+    서버가 여유 있으면 대기 없이 바로 다음 반복을 시작하고, 다음 경우에만 기다립니다.
+    - 연속 오류: 오류 횟수에 따라 지수적으로 늘어나는 대기
+    - 지연 증가: 최근 호출 시간이 평소(지수 이동 평균)보다 크게 늘어난 만큼 대기
+    - GPU 사용률 목표: 호출 시간 / (호출 시간 + 대기 시간) 이 duty_cycle 을 넘지 않도록 대기
+    - (선택) /api/ps 에 다른 모델이 올라와 있으면 GPU를 함께 쓰는 작업이 있다고 보고 대기
+    fixed 모드에서는 기존처럼 매번 WAIT_TIME_SECONDS 만큼 기다립니다.
+    """
+
+    def __init__(
+        self,
+        mode: str = None,
+        duty_cycle: float = None,
+        min_wait: float = None,
+        max_wait: float = None,
+        latency_factor: float = None,
+        client: OllamaClient = None,
+        use_ps: bool = None,
+        smoothing: float = 0.2,
+    ):
+        self.mode = mode or config.PACING_MODE
+        self.duty_cycle = config.PACING_DUTY_CYCLE if duty_cycle is None else duty_cycle
+        self.min_wait = config.PACING_MIN_WAIT if min_wait is None else min_wait
+        self.max_wait = config.PACING_MAX_WAIT if max_wait is None else max_wait
+        self.latency_factor = config.PACING_LATENCY_FACTOR if latency_factor is None else latency_factor
+        self.client = client
+        self.use_ps = config.PACING_USE_PS if use_ps is None else use_ps
+        self.smoothing = smoothing
+
+        self.baseline: Optional[float] = None  # 정상 호출 시간의 지수 이동 평균 (초)
+        self.last_duration: Optional[float] = None
+        self.consecutive_errors = 0
+        self.total_wait = 0.0
+
+    def record_success(self, duration: float):
+        """성공한 반복의 호출 시간(초)을 기록합니다."""
+        self.consecutive_errors = 0
+        self.last_duration = duration
+        if self.baseline is None:
+            self.baseline = duration
+        else:
+            self.baseline += self.smoothing * (duration - self.baseline)
+
+    def record_error(self, duration: float = None):
+        """실패한 반복을 기록합니다."""
+        self.consecutive_errors += 1
+        self.last_duration = duration
+
+    def _shared_gpu(self) -> bool:
+        """/api/ps 에 이 실행에서 쓰는 모델 외의 모델이 올라와 있는지 확인합니다."""
+        if not self.use_ps or self.client is None:
+            return False
+        ours = set()
+        for model in self.client.models_in_use():
+            ours.update((model, f"{model}:latest"))
+        try:
+            loaded = self.client.ps()
+        except OllamaError as e:
+            logging.debug(f"Could not query loaded models: {e}")
+            return False
+        others = [entry.get("name") for entry in loaded if entry.get("name") not in ours]
+        if others:
+            logging.debug(f"Other models resident on the server: {', '.join(map(str, others))}")
+        return bool(others)
+
+    def next_delay(self) -> float:
+        """다음 반복 전에 기다릴 시간(초)을 계산합니다."""
+        if self.mode == "fixed":
+            return config.WAIT_TIME_SECONDS
+
+        if self.consecutive_errors:
+            delay = config.OLLAMA_BACKOFF_BASE * (2 ** self.consecutive_errors)
+            return min(self.max_wait, max(self.min_wait, delay))
+
+        delay = self.min_wait
+        busy = self.last_duration or 0.0
+
+        # 평소보다 느려진 만큼 쉬어 서버가 밀린 작업을 처리하도록 함
+        if self.baseline and busy > self.baseline * self.latency_factor:
+            delay = max(delay, busy - self.baseline)
+
+        # 사용률 목표: busy / (busy + idle) <= duty_cycle
+        if 0 < self.duty_cycle < 1:
+            delay = max(delay, busy * (1 - self.duty_cycle) / self.duty_cycle)
+
+        if self._shared_gpu():
+            delay = max(delay, busy * 0.5)
+
+        return min(self.max_wait, delay)
+
+    def wait(self, max_delay: float = None) -> float:
+        """계산한 시간만큼 기다리고 실제 대기 시간을 반환합니다. max_delay 로 상한을 줄 수 있습니다."""
+        delay = self.next_delay()
+        if max_delay is not None:
+            delay = max(0.0, min(delay, max_delay))
+        if delay > 0:
+            logging.info(f"Pacing: waiting {delay:.2f}s before next iteration")
+            time.sleep(delay)
+            self.total_wait += delay
+        return delay
@@ -0,0 +1,152 @@
+"""
+토큰 예산 기반 프롬프트 구성
+"""
+import re
+from dataclasses import dataclass, field
+from typing import List, Dict, Union
+
+import config
+
+
+def estimate_tokens(text: str) -> int:
+    """텍스트의 토큰 수를 추정합니다.
+
+    토크나이저 없이 쓰는 보수적 근사치입니다. ASCII 문자는 약 4글자당 1토큰,
+    한글 등 비ASCII 문자는 글자당 1토큰으로 계산합니다.
+    """
+    if not text:
+        return 0
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return (ascii_chars + 3) // 4 + (len(text) - ascii_chars)
+
+
+def split_sections(document: str) -> List[str]:
+    """마크다운 제목(#)을 기준으로 문서를 섹션 단위로 나눕니다."""
+    sections = re.split(r"\n(?=#{1,6}\s)", document)
+    return [section.strip("\n") for section in sections if section.strip()]
+
+
+@dataclass
+class PromptSection:
+    """프롬프트 구성 요소
+
+    parts 는 잘라낼 수 있는 최소 단위입니다. 예산이 부족하면 keep 방향("head" 또는 "tail")
+    으로 들어가는 만큼의 parts 만 남기고, 하나도 들어가지 않으면 섹션 전체를 생략합니다.
+    required 섹션은 예산과 관계없이 항상 포함됩니다.
+    """
+    name: str
+    parts: List[str]
+    priority: int
+    required: bool = False
+    keep: str = "head"
+    separator: str = "\n\n"
+
+
+@dataclass
+class PromptPlan:
+    """예산 배분 결과"""
+    budget: int
+    parts: Dict[str, List[str]] = field(default_factory=dict)
+    tokens: int = 0
+    dropped: List[str] = field(default_factory=list)
+    compressed: Dict[str, str] = field(default_factory=dict)
+    separators: Dict[str, str] = field(default_factory=dict)
+
+    def text(self, name: str) -> str:
+        """포함된 섹션 텍스트를 반환합니다. 생략된 섹션은 빈 문자열입니다."""
+        return self.separators.get(name, "\n\n").join(self.parts.get(name, []))
+
+    def count(self, name: str) -> int:
+        """포함된 섹션의 part 수를 반환합니다."""
+        return len(self.parts.get(name, []))
+
+    def report(self) -> str:
+        """생략/축약된 섹션을 요약한 문자열을 반환합니다."""
+        items = []
+        if self.compressed:
+            items.append("compressed: " + ", ".join(f"{name} ({detail})" for name, detail in self.compressed.items()))
+        if self.dropped:
+            items.append("dropped: " + ", ".join(self.dropped))
+        return "; ".join(items)
+
+
+class PromptBuilder:
+    """우선순위에 따라 토큰 예산을 채우는 프롬프트 구성기"""
+
+    def __init__(self, budget: int = None):
+        if budget is None:
+            budget = config.MODEL_CONTEXT_TOKENS - config.RESPONSE_TOKEN_RESERVE
+        self.budget = budget
+        self.sections: List[PromptSection] = []
+
+    def add(self, name: str, content: Union[str, List[str]], priority: int,
+            required: bool = False, keep: str = "head", separator: str = "\n\n") -> 'PromptBuilder':
+        """섹션을 추가합니다. 우선순위 숫자가 작을수록 먼저 예산을 배정받습니다."""
+        parts = [content] if isinstance(content, str) else list(content)
+        parts = [part for part in parts if part]
+        self.sections.append(PromptSection(name, parts, priority, required, keep, separator))
+        return self
+
+    def build(self) -> PromptPlan:
+        """예산 안에서 포함할 섹션과 part 를 결정합니다."""
+        plan = PromptPlan(budget=self.budget)
+        remaining = self.budget
+
+        for section in sorted(self.sections, key=lambda s: s.priority):
+            plan.separators[section.name] = section.separator
+            if not section.parts:
+                continue
+
+            costs = [estimate_tokens(part) for part in section.parts]
+
+            if section.required or sum(costs) <= remaining:
+                plan.parts[section.name] = section.parts
+                remaining -= sum(costs)
+                continue
+
+            # 들어가는 만큼만 keep 방향에서부터 채움
+            order = range(len(costs)) if section.keep == "head" else range(len(costs) - 1, -1, -1)
+            kept = []
+            for index in order:
+                if costs[index] > remaining:
+                    break
+                kept.append(index)
+                remaining -= costs[index]
+
+            if not kept:
+                plan.dropped.append(section.name)
+                continue
+
+            kept.sort()
+            plan.parts[section.name] = [section.parts[index] for index in kept]
+            plan.compressed[section.name] = f"{len(kept)}/{len(costs)}"
+
+        plan.tokens = self.budget - remaining
+        return plan
+
+
+class ContextSizer:
+    """요청의 num_ctx 값을 결정합니다.
+
+    Ollama는 num_ctx 가 바뀌면 모델을 다시 로드하므로, 2의 거듭제곱 단위로만 늘리고
+    실행 중에는 줄이지 않습니다. 작은 프롬프트에 불필요하게 큰 컨텍스트를 잡지 않으면서
+    재로드 횟수를 몇 번으로 제한합니다.
+    """
+
+    def __init__(self, max_ctx: int = None, reserve: int = None, min_ctx: int = 2048):
+        self.max_ctx = max_ctx if max_ctx is not None else config.MODEL_CONTEXT_TOKENS
+        self.reserve = reserve if reserve is not None else config.RESPONSE_TOKEN_RESERVE
+        self.min_ctx = min(min_ctx, self.max_ctx)
+        self.num_ctx = None
+
+    def fit(self, prompt_tokens: int) -> int:
+        """프롬프트와 응답 예약분이 들어가는 num_ctx 를 반환합니다."""
+        needed = prompt_tokens + self.reserve
+        size = self.min_ctx
+        while size < needed and size < self.max_ctx:
+            size *= 2
+        size = min(size, self.max_ctx)
+
+        if self.num_ctx is None or size > self.num_ctx:
+            self.num_ctx = size
+        return self.num_ctx
@@ -0,0 +1,118 @@
+"""
+Ollama 응답 디스크 캐시
+"""
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Dict, Any, Optional
+
+import config
+
+
+class ResponseCache:
+    """모델, 옵션, 프롬프트의 해시를 키로 하는 SQLite 응답 캐시
+
+    --resume 이나 같은 기획서로 다시 실행할 때 이미 받은 응답을 GPU 연산 없이 재사용합니다.
+    전체 크기가 max_bytes 를 넘으면 가장 오래 사용되지 않은 항목부터 삭제합니다 (LRU).
+    read_only 모드에서는 조회만 하고 저장이나 접근 시간 갱신은 하지 않으므로,
+    캐시 파일을 그대로 유지한 채 결정적으로 재실행(replay)할 수 있습니다.
+    """
+
+    def __init__(self, path: str = None, max_bytes: int = None, read_only: bool = False):
+        self.path = path or os.path.join(config.OUTPUT_DIR, config.RESPONSE_CACHE_FILE)
+        self.max_bytes = config.RESPONSE_CACHE_MAX_MB * 1024 * 1024 if max_bytes is None else max_bytes
+        self.read_only = read_only
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self._conn.commit()
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    @staticmethod
+    def make_key(endpoint: str, payload: Dict[str, Any]) -> str:
+        """요청 본문에서 응답 내용에 영향을 주는 필드만으로 키를 만듭니다."""
+        relevant = {k: v for k, v in payload.items() if k not in ("stream", "keep_alive")}
+        relevant["endpoint"] = endpoint
+        encoded = json.dumps(relevant, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """캐시된 응답을 반환합니다. 없으면 None."""
+        with self._lock:
+            row = self._conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            if not self.read_only:
+                self._conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (time.time(), key))
+                self._conn.commit()
+            return row[0]
+
+    def put(self, key: str, response: str):
+        """응답을 저장하고 크기 제한을 넘으면 오래된 항목을 삭제합니다."""
+        if self.read_only:
+            return
+
+        size = len(response.encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            previous = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, response, size, now, now),
+            )
+            self._total_bytes += size - (previous[0] if previous else 0)
+            self.stores += 1
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """전체 크기가 제한 이하가 될 때까지 LRU 순서로 삭제합니다."""
+        if self._total_bytes <= self.max_bytes:
+            return
+
+        victims = []
+        freed = 0
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed"):
+            if self._total_bytes - freed <= self.max_bytes:
+                break
+            victims.append((key,))
+            freed += size
+
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", victims)
+        self._total_bytes -= freed
+        self.evictions += len(victims)
+        logging.debug(f"Evicted {len(victims)} cached responses ({freed} bytes)")
+
+    def stats(self) -> Dict[str, int]:
+        """적중/미스 등 캐시 통계를 반환합니다."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "bytes": self._total_bytes,
+        }
+
+    def close(self):
+        """데이터베이스 연결을 닫습니다."""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,339 @@
+"""
+기획서 섹션 검색 (BM25, 선택적으로 Ollama 임베딩)
+"""
+import os
+import re
+import math
+import array
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import config
+from ollama_client import OllamaClient, OllamaError
+from prompt_builder import estimate_tokens, split_sections
+
+try:
+    import numpy as np  # 선택 의존성: 설치되어 있으면 점수 계산을 벡터 연산으로 처리
+except ImportError:
+    np = None
+
+
+_WORD_RE = re.compile(r"[a-z0-9]+|[가-힣]+")
+_HEADING_RE = re.compile(r"^(#{1,6})\s+(.*)")
+
+
+def tokenize(text: str) -> List[str]:
+    """검색용 토큰으로 나눕니다.
+
+    영문/숫자는 단어 단위(camelCase 분리), 한글은 두 글자 단위로 나누어
+    조사가 붙은 형태("전투를", "전투 시스템은")도 같은 토큰으로 일치하게 합니다.
+    """
+    text = re.sub(r"([a-z0-9])([A-Z])", r"\1 \2", text).lower()
+    tokens = []
+    for word in _WORD_RE.findall(text):
+        if "가" <= word[0] <= "힣" and len(word) > 1:
+            tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+        else:
+            tokens.append(word)
+    return tokens
+
+
+@dataclass
+class SpecChunk:
+    """검색 단위인 기획서 섹션"""
+    document: str
+    path: List[str]  # 상위 제목부터 이 섹션 제목까지
+    text: str
+    tokens: int = 0
+    terms: Counter = field(default_factory=Counter, repr=False)
+
+    @property
+    def source(self) -> str:
+        return " > ".join([self.document] + self.path)
+
+    def render(self) -> str:
+        """프롬프트에 넣을 텍스트 (출처 표시 포함)"""
+        return f"[{self.source}]\n{self.text}"
+
+
+def _split_line(line: str, max_tokens: int) -> List[str]:
+    """max_tokens 를 넘는 한 줄을 문장 경계에서, 그래도 길면 글자 수로 나눕니다."""
+    if estimate_tokens(line) <= max_tokens:
+        return [line]
+    parts = []
+    for sentence in re.split(r"(?<=[.!?。])\s+", line):
+        # 글자당 1토큰(한글 기준)으로 잡아 보수적으로 자름
+        parts.extend(sentence[start:start + max_tokens] for start in range(0, len(sentence), max_tokens))
+    return parts
+
+
+def _split_long(text: str, max_tokens: int) -> List[str]:
+    """긴 섹션을 줄 경계에서 max_tokens 이하 조각으로 나눕니다. 빈 줄(문단 경계)에서 우선 나눕니다."""
+    pieces: List[str] = []
+    current: List[str] = []
+    size = 0
+    for line in (part for raw in text.split("\n") for part in _split_line(raw, max_tokens)):
+        tokens = estimate_tokens(line) + 1
+        if current and size + tokens > max_tokens:
+            # 조각 후반부에 빈 줄이 있으면 그 위치에서 자름
+            cut = max((i for i, value in enumerate(current) if not value.strip()), default=0)
+            if cut < len(current) // 2:
+                cut = len(current)
+            pieces.append("\n".join(current[:cut]).strip("\n"))
+            current = current[cut:]
+            size = sum(estimate_tokens(value) + 1 for value in current)
+        current.append(line)
+        size += tokens
+    if current:
+        pieces.append("\n".join(current).strip("\n"))
+    return [piece for piece in pieces if piece.strip()]
+
+
+def chunk_document(name: str, text: str, max_tokens: int = None) -> List[SpecChunk]:
+    """문서를 제목 단위로 나누고, max_tokens 를 넘는 섹션은 문단 경계에서 더 나눕니다."""
+    max_tokens = config.RETRIEVAL_CHUNK_TOKENS if max_tokens is None else max_tokens
+    chunks = []
+    headings: List[Tuple[int, str]] = []
+
+    for section in split_sections(text):
+        match = _HEADING_RE.match(section)
+        if match:
+            level = len(match.group(1))
+            headings = [h for h in headings if h[0] < level] + [(level, match.group(2).strip())]
+        path = [title for _, title in headings]
+
+        pieces = _split_long(section, max_tokens) if estimate_tokens(section) > max_tokens else [section]
+        for index, piece in enumerate(pieces):
+            if index > 0 and match:
+                # 이어지는 조각에도 제목을 붙여 맥락 유지
+                piece = f"{match.group(0).strip()} (계속)\n{piece}"
+            chunk = SpecChunk(document=name, path=path, text=piece, tokens=estimate_tokens(piece))
+            # 제목 단어는 두 번 세어 본문보다 가중
+            chunk.terms = Counter(tokenize(piece) + tokenize(" ".join(path)))
+            chunks.append(chunk)
+    return chunks
+
+
+class EmbeddingCache:
+    """모델과 텍스트의 해시를 키로 임베딩 벡터를 저장하는 SQLite 캐시"""
+
+    def __init__(self, path: str = None):
+        self.path = path or os.path.join(config.OUTPUT_DIR, config.EMBEDDING_CACHE_FILE)
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(model: str, text: str) -> str:
+        return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            row = self._conn.execute("SELECT vector FROM embeddings WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        return array.array("f", row[0]).tolist()
+
+    def put(self, key: str, vector: List[float]):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                (key, array.array("f", vector).tobytes()),
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class SpecIndex:
+    """기획서 섹션의 BM25 색인
+
+    update() 는 내용이 바뀐 문서만 다시 나누고, 전체 문서의 용어별 BM25 가중치
+    (postings)를 다시 계산합니다. search() 는 질문과 모듈 이름에 포함된 용어의
+    postings 만 더하므로 검색 비용이 기획서 전체 크기에 거의 비례하지 않습니다.
+    numpy 가 있으면 postings 합산을 bincount 로 처리합니다.
+
+    client 를 주면 Ollama 임베딩(/api/embeddings)의 코사인 유사도를 BM25 점수와
+    embedding_weight 비율로 섞습니다. 섹션 임베딩은 EmbeddingCache 에 저장되어
+    다시 실행하거나 문서 일부만 바뀌어도 바뀐 섹션만 새로 계산합니다.
+    """
+
+    def __init__(self, client: OllamaClient = None, k1: float = 1.2, b: float = 0.75,
+                 chunk_tokens: int = None, embedding_weight: float = None, cache: EmbeddingCache = None):
+        self.k1 = k1
+        self.b = b
+        self.chunk_tokens = config.RETRIEVAL_CHUNK_TOKENS if chunk_tokens is None else chunk_tokens
+        self.client = client
+        self.embedding_weight = config.RETRIEVAL_EMBEDDING_WEIGHT if embedding_weight is None else embedding_weight
+        self.cache = cache
+
+        self._documents: Dict[str, Tuple[str, List[SpecChunk]]] = {}  # 이름 -> (내용 해시, 섹션)
+        self.chunks: List[SpecChunk] = []
+        self.total_tokens = 0
+        self._postings: Dict[str, Tuple[list, list]] = {}  # 용어 -> (섹션 번호, BM25 가중치)
+        self._vectors: Optional[list] = None  # 섹션별 정규화된 임베딩
+        self._outline: Optional[str] = None
+
+    # 색인
+    def update(self, documents: Dict[str, str]) -> bool:
+        """{문서 이름: 내용} 으로 색인을 갱신합니다. 바뀐 것이 있으면 True."""
+        changed = False
+        for name in [name for name in self._documents if name not in documents]:
+            del self._documents[name]
+            changed = True
+
+        for name, text in documents.items():
+            digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+            if name in self._documents and self._documents[name][0] == digest:
+                continue
+            self._documents[name] = (digest, chunk_document(name, text, self.chunk_tokens))
+            changed = True
+
+        if changed:
+            self.chunks = [chunk for name in sorted(self._documents) for chunk in self._documents[name][1]]
+            self.total_tokens = sum(chunk.tokens for chunk in self.chunks)
+            self._build_postings()
+            self._outline = None
+            if self.client is not None:
+                self._embed_chunks()
+            logging.info(f"Indexed {len(self.chunks)} spec sections ({self.total_tokens} tokens)")
+        return changed
+
+    def _build_postings(self):
+        count = len(self.chunks)
+        average = sum(sum(chunk.terms.values()) for chunk in self.chunks) / count if count else 0.0
+        postings: Dict[str, Tuple[list, list]] = {}
+
+        for index, chunk in enumerate(self.chunks):
+            length = sum(chunk.terms.values())
+            norm = self.k1 * (1 - self.b + self.b * length / average) if average else self.k1
+            for term, tf in chunk.terms.items():
+                ids, weights = postings.setdefault(term, ([], []))
+                ids.append(index)
+                weights.append(tf * (self.k1 + 1) / (tf + norm))
+
+        for term, (ids, weights) in postings.items():
+            idf = math.log(1 + (count - len(ids) + 0.5) / (len(ids) + 0.5))
+            if np is not None:
+                postings[term] = (np.asarray(ids, dtype=np.int32), np.asarray(weights, dtype=np.float32) * idf)
+            else:
+                postings[term] = (ids, [weight * idf for weight in weights])
+        self._postings = postings
+
+    def outline(self, max_tokens: int = None) -> str:
+        """섹션 제목 경로 목록을 반환합니다.
+
+        질문과 무관하게 기획서가 바뀔 때만 달라지므로, 검색 결과를 쓸 때 채팅 세션의
+        고정 접두부에 넣어 KV 캐시를 유지하면서 기획서 전체 구조를 보여 줍니다.
+        max_tokens 를 넘는 뒤쪽 제목은 생략합니다.
+        """
+        max_tokens = config.RETRIEVAL_OUTLINE_TOKENS if max_tokens is None else max_tokens
+        if self._outline is None:
+            lines, used = [], 0
+            for source in dict.fromkeys(chunk.source for chunk in self.chunks):
+                line = f"- {source}"
+                used += estimate_tokens(line) + 1
+                if used > max_tokens:
+                    lines.append("- ...")
+                    break
+                lines.append(line)
+            self._outline = "\n".join(lines)
+        return self._outline
+
+    # 임베딩
+    def _embed(self, text: str) -> List[float]:
+        model = self.client.model_for("embedding")
+        key = EmbeddingCache.make_key(model, text)
+        if self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+        vector = self.client.embeddings(text, task="embedding")
+        if self.cache is not None:
+            self.cache.put(key, vector)
+        return vector
+
+    @staticmethod
+    def _normalize(vector: List[float]) -> List[float]:
+        norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+        return [value / norm for value in vector]
+
+    def _embed_chunks(self):
+        """모든 섹션의 임베딩을 준비합니다. 실패하면 이번 실행에서는 BM25 만 사용합니다."""
+        try:
+            vectors = [self._normalize(self._embed(chunk.render())) for chunk in self.chunks]
+        except OllamaError as e:
+            logging.warning(f"Embeddings unavailable, using BM25 only: {e}")
+            self.client = None
+            self._vectors = None
+            return
+        self._vectors = np.asarray(vectors, dtype=np.float32) if np is not None and vectors else vectors
+
+    # 검색
+    def scores(self, query: str, boost: str = None, boost_weight: float = 2.0) -> List[float]:
+        """섹션별 BM25 점수를 반환합니다. boost(예: 현재 모듈 이름)의 용어는 boost_weight 배로 셉니다."""
+        weights = Counter(tokenize(query))
+        for term in tokenize(boost or ""):
+            weights[term] += boost_weight
+        terms = [(term, weight) for term, weight in weights.items() if term in self._postings]
+
+        count = len(self.chunks)
+        if np is not None:
+            if not terms:
+                return np.zeros(count, dtype=np.float32)
+            ids = np.concatenate([self._postings[term][0] for term, _ in terms])
+            values = np.concatenate([self._postings[term][1] * weight for term, weight in terms])
+            return np.bincount(ids, weights=values, minlength=count)
+
+        scores = [0.0] * count
+        for term, weight in terms:
+            for index, value in zip(*self._postings[term]):
+                scores[index] += value * weight
+        return scores
+
+    def _similarities(self, query: str) -> Optional[list]:
+        """질문 임베딩과 각 섹션의 코사인 유사도. 임베딩을 쓰지 않거나 실패하면 None."""
+        if self.client is None or self._vectors is None:
+            return None
+        try:
+            vector = self._normalize(self._embed(query))
+        except OllamaError as e:
+            logging.warning(f"Query embedding failed, using BM25 only: {e}")
+            return None
+        if np is not None:
+            return self._vectors @ np.asarray(vector, dtype=np.float32)
+        return [sum(a * b for a, b in zip(row, vector)) for row in self._vectors]
+
+    def search(self, query: str, k: int = None, boost: str = None) -> List[SpecChunk]:
+        """질문과 관련도가 높은 순서로 최대 k 개 섹션을 반환합니다."""
+        k = config.RETRIEVAL_TOP_K if k is None else k
+        if not self.chunks:
+            return []
+
+        scores = self.scores(query, boost)
+        similarities = self._similarities(f"{boost}\n{query}" if boost else query)
+
+        if np is not None:
+            scores = np.asarray(scores, dtype=np.float64)
+            if similarities is not None:
+                scores = ((1 - self.embedding_weight) * scores / (scores.max() or 1.0)
+                          + self.embedding_weight * np.clip(similarities, 0.0, None))
+            ranked = np.argsort(-scores, kind="stable")[:k].tolist()
+        else:
+            if similarities is not None:
+                top = max(scores) or 1.0
+                scores = [
+                    (1 - self.embedding_weight) * score / top + self.embedding_weight * max(0.0, similarity)
+                    for score, similarity in zip(scores, similarities)
+                ]
+            ranked = sorted(range(len(scores)), key=lambda index: (-scores[index], index))[:k]
+        return [self.chunks[index] for index in ranked if scores[index] > 0]
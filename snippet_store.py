@@ -0,0 +1,157 @@
+"""
+내용 주소 기반 코드 스니펫 저장소
+"""
+import os
+import json
+import queue
+import hashlib
+import logging
+import threading
+from datetime import datetime
+from typing import List, Dict, Tuple, Optional
+
+import config
+from models import CodeSnippet, extension_for
+
+
+class SnippetStore:
+    """코드 내용의 해시를 키로 스니펫을 저장합니다.
+
+    같은 코드는 한 번만 snippets/<해시 앞 2자리>/<해시>.<확장자> 로 저장하고,
+    어떤 모듈/기능이 어떤 파일을 참조하는지는 manifest.jsonl 에 추가 기록합니다.
+    store() 는 해시 계산과 색인 갱신만 하며, 실제 파일 쓰기는 flush() 때 반복 단위로 묶어
+    백그라운드 스레드에서 처리합니다. 기록이 끝난 스니펫은 코드를 메모리에서 내리고
+    필요할 때 파일에서 읽습니다.
+    """
+
+    MANIFEST_FILE = "manifest.jsonl"
+
+    def __init__(self, base_dir: str = None, subdir: str = "snippets"):
+        self.base_dir = base_dir or config.OUTPUT_DIR
+        self.subdir = subdir
+        self.directory = os.path.join(self.base_dir, subdir)
+        self.index: Dict[str, str] = {}  # 해시 -> base_dir 기준 상대 경로
+        self.duplicates = 0
+
+        self._pending_blobs: List[Tuple[str, str]] = []
+        self._pending_manifest: List[str] = []
+        self._pending_snippets: List[CodeSnippet] = []
+        self._jobs: "queue.Queue" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+
+        self._load_index()
+
+    def _load_index(self):
+        """기존 매니페스트에서 저장된 해시 목록을 읽어 재실행 시에도 중복을 제거합니다."""
+        manifest_path = os.path.join(self.directory, self.MANIFEST_FILE)
+        if not os.path.exists(manifest_path):
+            return
+
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                self.index[entry["digest"]] = entry["path"]
+
+    @staticmethod
+    def digest(code: str) -> str:
+        """코드 내용의 해시"""
+        return hashlib.sha256(code.encode("utf-8")).hexdigest()
+
+    def path_for(self, relative_path: str) -> str:
+        """상대 경로를 실제 파일 경로로 바꿉니다."""
+        return os.path.join(self.base_dir, relative_path)
+
+    def store(self, snippet: CodeSnippet, component: str = None, feature: str = None) -> bool:
+        """스니펫을 저장소에 등록하고 filename/digest 를 채웁니다. 새 내용이면 True."""
+        digest = self.digest(snippet.code)
+        relative_path = self.index.get(digest)
+        is_new = relative_path is None
+
+        if is_new:
+            relative_path = os.path.join(self.subdir, digest[:2], f"{digest}.{extension_for(snippet.language)}")
+            self.index[digest] = relative_path
+            self._pending_blobs.append((relative_path, snippet.code))
+        else:
+            self.duplicates += 1
+
+        snippet.filename = relative_path
+        snippet.digest = digest
+        self._pending_snippets.append(snippet)
+
+        self._pending_manifest.append(json.dumps({
+            "digest": digest,
+            "path": relative_path,
+            "language": snippet.language,
+            "component": component,
+            "feature": feature,
+            "timestamp": datetime.now().isoformat()
+        }, ensure_ascii=False))
+
+        return is_new
+
+    def flush(self):
+        """이번 반복에서 등록된 스니펫을 하나의 묶음으로 백그라운드 저장 대기열에 넣습니다."""
+        if not self._pending_blobs and not self._pending_manifest:
+            return
+
+        batch = (self._pending_blobs, self._pending_manifest, self._pending_snippets)
+        self._pending_blobs, self._pending_manifest, self._pending_snippets = [], [], []
+
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run_worker, name="snippet-writer", daemon=True)
+            self._worker.start()
+        self._jobs.put(batch)
+
+    def _run_worker(self):
+        while True:
+            batch = self._jobs.get()
+            try:
+                if batch is None:
+                    break
+                self._write_batch(*batch)
+            except Exception as e:
+                logging.error(f"Snippet batch write failed: {e}")
+            finally:
+                self._jobs.task_done()
+
+    def _write_batch(self, blobs: List[Tuple[str, str]], manifest_lines: List[str], snippets: List[CodeSnippet]):
+        """스니펫 파일들과 매니페스트 항목을 기록하고, 기록된 스니펫의 코드를 메모리에서 내립니다."""
+        created_dirs = set()
+        for relative_path, code in blobs:
+            file_path = self.path_for(relative_path)
+            directory = os.path.dirname(file_path)
+            if directory not in created_dirs:
+                os.makedirs(directory, exist_ok=True)
+                created_dirs.add(directory)
+
+            # 중간에 끊긴 파일이 올바른 이름으로 남지 않도록 임시 파일에 쓴 뒤 이름 변경
+            tmp_path = f"{file_path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(code)
+            os.replace(tmp_path, file_path)
+
+        if manifest_lines:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(os.path.join(self.directory, self.MANIFEST_FILE), 'a', encoding='utf-8') as f:
+                f.write("\n".join(manifest_lines) + "\n")
+
+        # 이전 묶음에서 이미 기록된 중복 스니펫도 여기서 함께 내림 (묶음은 순서대로 처리됨)
+        if config.LAZY_SNIPPET_CODE:
+            for snippet in snippets:
+                snippet.release(self.base_dir)
+
+    def wait(self):
+        """flush 로 넘긴 묶음이 모두 기록될 때까지 기다립니다 (다른 스레드에서 호출 가능)."""
+        if self._worker is not None and self._worker.is_alive():
+            self._jobs.join()
+
+    def close(self):
+        """남은 스니펫을 모두 기록하고 작업 스레드를 종료합니다."""
+        self.flush()
+        if self._worker is not None and self._worker.is_alive():
+            self._jobs.join()
+            self._jobs.put(None)
+            self._worker.join()
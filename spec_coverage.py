@@ -0,0 +1,249 @@
+"""
+기획서 요구사항 커버리지와 진행 정체 감지
+"""
+import re
+import math
+import logging
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, FrozenSet, List, Optional, Tuple
+
+import config
+from models import Project
+from retrieval import chunk_document, tokenize
+from utils import atomic_write_json
+
+
+_ITEM_RE = re.compile(r"^\s*(?:[-*+]|\d+[.)])\s+(\S.*)$")
+_TABLE_RULE_RE = re.compile(r"^\|?[\s:|-]+\|?$")
+
+
+@dataclass
+class Requirement:
+    """기획서의 요구사항 하나 (목록 항목, 표 행, 또는 목록이 없는 섹션 본문)"""
+    section: str
+    text: str
+    terms: FrozenSet[str]
+    weight: float = 0.0  # 용어 IDF 합
+    covered_by: Optional[Tuple[str, str]] = None  # (컴포넌트, 기능)
+
+    @property
+    def key(self) -> Tuple[str, str]:
+        return self.section, self.text
+
+
+def extract_requirements(name: str, text: str, ignore: str = None) -> List[Requirement]:
+    """문서를 섹션으로 나누고 각 섹션의 목록 항목과 표 행을 요구사항으로 추출합니다.
+
+    목록이 없는 섹션은 본문 전체를 하나의 요구사항으로 봅니다. 제목이나 상위 제목이 ignore
+    정규식과 일치하는 섹션(개요, 개발 일정 등 구현 대상이 아닌 부분)은 제외합니다.
+    최상위 제목은 보통 문서 제목이므로 하위 섹션이 있으면 비교하지 않습니다.
+    """
+    ignore = config.COVERAGE_IGNORE_SECTIONS if ignore is None else ignore
+    requirements = []
+    for chunk in chunk_document(name, text):
+        titles = chunk.path[1:] if len(chunk.path) > 1 else chunk.path
+        if ignore and any(re.search(ignore, title, re.IGNORECASE) for title in titles):
+            continue
+        section = " > ".join(chunk.path) or name
+
+        lines = chunk.text.split("\n")
+        if lines and lines[0].startswith("#"):
+            lines = lines[1:]
+        items = []
+        for line in lines:
+            match = _ITEM_RE.match(line)
+            if match:
+                items.append(match.group(1).strip())
+            elif line.startswith("|") and not _TABLE_RULE_RE.match(line):
+                items.append(line.strip("| ").replace(" | ", " "))
+        if not items:
+            body = " ".join(line.strip() for line in lines if line.strip())
+            items = [body] if body else []
+
+        for item in items:
+            terms = frozenset(tokenize(item))
+            if len(terms) >= 2:
+                requirements.append(Requirement(section=section, text=item, terms=terms))
+    return requirements
+
+
+class CoverageTracker:
+    """기획서 요구사항이 프로젝트의 컴포넌트/기능으로 구현되었는지 추적합니다.
+
+    반복마다 새 기능이 추가된 컴포넌트에 대해 컴포넌트 이름, 기능 설명, 그 반복의 답변을
+    근거로 모으고, 아직 다루지 않은 요구사항과 비교합니다. 요구사항 용어의 IDF 가중치 중
+    근거에 포함된 비율이 threshold 이상이면 그 컴포넌트/기능이 요구사항을 다룬 것으로 봅니다.
+    기능을 추가하지 않은 반복(계획만 세운 답변 등)은 근거로 쓰지 않습니다.
+
+    커버리지가 target 에 도달하거나, patience 번의 반복 동안 커버리지가 늘지 않고 반복당
+    새 기능 수(novelty)가 min_novelty 미만이면 포화로 판단합니다.
+    """
+
+    def __init__(self, threshold: float = None, target: float = None, patience: int = None,
+                 min_novelty: float = None, steer_after: int = None):
+        self.threshold = config.COVERAGE_MATCH_THRESHOLD if threshold is None else threshold
+        self.target = config.COVERAGE_TARGET if target is None else target
+        self.patience = config.COVERAGE_PATIENCE if patience is None else patience
+        self.min_novelty = config.COVERAGE_MIN_NOVELTY if min_novelty is None else min_novelty
+        self.steer_after = config.COVERAGE_STEER_AFTER if steer_after is None else steer_after
+
+        self.requirements: List[Requirement] = []
+        self._idf: Dict[str, float] = {}
+        self._evidence: List[Tuple[str, str, FrozenSet[str]]] = []  # (컴포넌트, 기능, 용어)
+        self._seen: Dict[str, int] = {}  # 컴포넌트 이름 -> 반영한 기능 수
+        self._steered: Deque[str] = deque(maxlen=3)  # 최근에 유도한 섹션
+
+        self.history: List[Dict[str, Any]] = []  # 반복별 커버리지와 새 기능/코드 수
+        self.since_gain = 0  # 커버리지가 늘지 않은 연속 반복 수
+
+    # 요구사항
+    def update_spec(self, documents: Dict[str, str]) -> int:
+        """기획서에서 요구사항을 다시 추출합니다. 내용이 같은 요구사항은 기존 판정을 유지합니다."""
+        previous = {requirement.key: requirement.covered_by for requirement in self.requirements}
+        requirements = [req for name in sorted(documents) for req in extract_requirements(name, documents[name])]
+
+        count = len(requirements)
+        frequency: Dict[str, int] = {}
+        for requirement in requirements:
+            for term in requirement.terms:
+                frequency[term] = frequency.get(term, 0) + 1
+        self._idf = {term: math.log(1 + count / df) for term, df in frequency.items()}
+        for requirement in requirements:
+            requirement.weight = sum(self._idf[term] for term in requirement.terms)
+            requirement.covered_by = previous.get(requirement.key)
+
+        self.requirements = requirements
+        for component, feature, terms in self._evidence:
+            self._match(component, feature, terms)
+        logging.info(f"Tracking coverage of {count} spec requirements")
+        return count
+
+    def _match(self, component: str, feature: str, terms: FrozenSet[str]) -> int:
+        """근거 하나로 새로 다뤄진 요구사항 수를 반환합니다."""
+        covered = 0
+        for requirement in self.requirements:
+            if requirement.covered_by is not None or not requirement.weight:
+                continue
+            shared = sum(self._idf[term] for term in requirement.terms & terms)
+            if shared / requirement.weight >= self.threshold:
+                requirement.covered_by = (component, feature)
+                covered += 1
+        return covered
+
+    # 진행 상황
+    @property
+    def coverage(self) -> float:
+        if not self.requirements:
+            return 0.0
+        return sum(requirement.covered_by is not None for requirement in self.requirements) / len(self.requirements)
+
+    def sync(self, project: Project) -> Tuple[int, int, int]:
+        """새 기능이 추가된 컴포넌트를 근거로 반영하고 (새 기능 수, 새로 다뤄진 요구사항 수, 새 코드 줄 수)를 반환합니다.
+
+        근거는 컴포넌트 이름과 별칭, 새 기능의 이름과 설명, 실제로 추출된 코드뿐입니다.
+        답변 본문은 기획서를 다시 옮겨 적기만 해도 요구사항과 겹치므로 쓰지 않습니다.
+        """
+        new_features = 0
+        newly_covered = 0
+        new_lines = 0
+        for component in project.components:
+            seen = self._seen.get(component.name, 0)
+            if len(component.features) <= seen:
+                continue
+            added = component.features[seen:]
+            self._seen[component.name] = len(component.features)
+            new_features += len(added)
+
+            code = [snippet.code for feature in added for snippet in feature.code_snippets]
+            new_lines += sum(block.count("\n") + 1 for block in code)
+            text = " ".join([component.name, *component.aliases, *(f"{f.name} {f.description}" for f in added), *code])
+            terms = frozenset(tokenize(text))
+            self._evidence.append((component.name, added[-1].name, terms))
+            newly_covered += self._match(component.name, added[-1].name, terms)
+        return new_features, newly_covered, new_lines
+
+    def observe(self, project: Project) -> Dict[str, Any]:
+        """반복 하나의 결과를 반영하고 이번 반복의 커버리지 통계를 반환합니다."""
+        new_features, newly_covered, new_lines = self.sync(project)
+
+        self.since_gain = 0 if newly_covered else self.since_gain + 1
+        self.history.append({
+            "coverage": self.coverage,
+            "newly_covered": newly_covered,
+            "new_features": new_features,
+            "new_code_lines": new_lines,
+        })
+        return {
+            **self.history[-1],
+            "covered": sum(requirement.covered_by is not None for requirement in self.requirements),
+            "requirements": len(self.requirements),
+            "novelty": self.novelty(),
+        }
+
+    def novelty(self, window: int = None) -> float:
+        """최근 window 번 반복의 반복당 평균 새 기능 수"""
+        window = window or self.patience
+        recent = self.history[-window:]
+        return sum(entry["new_features"] for entry in recent) / len(recent) if recent else 0.0
+
+    def saturated(self) -> Optional[str]:
+        """커버리지가 포화되었으면 이유를, 아니면 None 을 반환합니다."""
+        if not self.requirements:
+            return None
+        if self.coverage >= self.target:
+            return f"coverage {self.coverage:.0%} reached the target {self.target:.0%}"
+        if self.since_gain >= self.patience and self.novelty() < self.min_novelty:
+            return (f"no coverage gain in {self.since_gain} iterations "
+                    f"and {self.novelty():.2f} new features per iteration")
+        return None
+
+    # 질문 유도
+    def uncovered_sections(self, limit: int = 3, per_section: int = 5) -> List[Tuple[str, List[str]]]:
+        """아직 다루지 않은 요구사항을 섹션별로 문서 순서대로 반환합니다."""
+        sections: Dict[str, List[str]] = {}
+        for requirement in self.requirements:
+            if requirement.covered_by is None:
+                sections.setdefault(requirement.section, []).append(requirement.text)
+        return [(section, items[:per_section]) for section, items in list(sections.items())[:limit]]
+
+    def hint(self) -> str:
+        """다음 질문 생성 프롬프트에 넣을 미구현 요구사항 요약"""
+        lines = []
+        for section, items in self.uncovered_sections():
+            lines.append(f"- {section}: " + "; ".join(items))
+        return "\n".join(lines)
+
+    def steering_question(self) -> Optional[str]:
+        """커버리지가 steer_after 번 이상 늘지 않았으면 미구현 섹션을 다루는 질문을 반환합니다.
+
+        같은 섹션만 계속 요구하지 않도록 최근에 유도한 섹션은 건너뜁니다.
+        """
+        if not self.requirements or self.since_gain < self.steer_after or self.since_gain % self.steer_after:
+            return None
+        sections = self.uncovered_sections(limit=len(self.requirements))
+        candidates = [entry for entry in sections if entry[0] not in self._steered] or sections
+        if not candidates:
+            return None
+        section, items = candidates[0]
+        self._steered.append(section)
+        return config.COVERAGE_QUESTION.format(section=section, requirements="\n".join(f"- {item}" for item in items))
+
+    def report(self) -> Dict[str, Any]:
+        """요구사항별 판정을 포함한 커버리지 보고서"""
+        return {
+            "coverage": self.coverage,
+            "requirements": [
+                {
+                    "section": requirement.section,
+                    "text": requirement.text,
+                    "component": requirement.covered_by[0] if requirement.covered_by else None,
+                    "feature": requirement.covered_by[1] if requirement.covered_by else None,
+                }
+                for requirement in self.requirements
+            ],
+            "history": self.history,
+        }
+
+    def save(self, file_path: str):
+        atomic_write_json(file_path, self.report(), indent=2, fsync=False)
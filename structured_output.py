@@ -0,0 +1,201 @@
+"""
+JSON 스키마 기반 구조화 응답
+"""
+import re
+import json
+import logging
+from typing import Dict, Any, List, Optional
+
+
+# 응답 스키마 (Ollama 의 format 필드에 그대로 전달)
+RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "module": {"type": "string"},
+        "answer": {"type": "string"},
+        "features": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "description": {"type": "string"},
+                    "code_blocks": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "language": {"type": "string"},
+                                "code": {"type": "string"},
+                            },
+                            "required": ["language", "code"],
+                        },
+                    },
+                },
+                "required": ["description", "code_blocks"],
+            },
+        },
+        "next_question": {"type": "string"},
+    },
+    "required": ["module", "answer", "features", "next_question"],
+}
+
+# 구조화 모드에서 답변 지침 뒤에 붙는 출력 형식 설명
+STRUCTURED_INSTRUCTIONS = """다음 형식의 JSON 객체 하나로만 답변해주세요.
+- module: 이번 답변에서 다루는 모듈 이름
+- answer: 설계 설명과 가정 등 답변 본문 (마크다운)
+- features: 구현한 기능 목록. 각 항목은 description(기능 설명)과 code_blocks(language, code 목록)
+- next_question: 기획서와 현재 개발 상태를 고려하여 다음으로 개발하거나 명확히 해야 할 부분에 관한 구체적인 질문
+"""
+
+
+# 형식이 깨진 응답을 스키마에 맞게 다시 추출할 때 쓰는 프롬프트
+EXTRACTION_PROMPT = """다음은 기획 분석 답변입니다. 내용을 바꾸지 말고 아래 JSON 형식으로 옮겨 적어주세요.
+{instructions}
+# 답변
+{response}
+"""
+
+
+class StructuredResponseError(ValueError):
+    """구조화 응답을 해석하거나 검증할 수 없는 경우"""
+
+
+def _extract_object(text: str) -> Optional[str]:
+    """텍스트에서 처음 나오는 균형 잡힌 {...} 구간을 찾습니다."""
+    start = text.find("{")
+    if start < 0:
+        return None
+
+    depth = 0
+    in_string = False
+    escaped = False
+    for index in range(start, len(text)):
+        ch = text[index]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == "{":
+            depth += 1
+        elif ch == "}":
+            depth -= 1
+            if depth == 0:
+                return text[start:index + 1]
+    return None
+
+
+def repair_json(text: str) -> Dict[str, Any]:
+    """흔한 형식 오류를 고쳐 JSON 객체를 읽습니다.
+
+    코드 펜스로 감싼 경우, 앞뒤에 설명이 붙은 경우, 마지막 쉼표가 남은 경우,
+    문자열 안에 이스케이프되지 않은 줄바꿈이 있는 경우를 처리합니다.
+    """
+    candidate = re.sub(r"^\s*```(?:json)?\s*|\s*```\s*$", "", text.strip())
+    candidate = _extract_object(candidate) or candidate
+    attempts = [
+        candidate,
+        re.sub(r",\s*([}\]])", r"\1", candidate),
+    ]
+
+    for attempt in attempts:
+        try:
+            data = json.loads(attempt, strict=False)
+        except ValueError:
+            continue
+        if isinstance(data, dict):
+            return data
+
+    raise StructuredResponseError(f"Could not parse structured response: {text[:200]!r}")
+
+
+def _text(value: Any) -> str:
+    """문자열 필드 값을 정리합니다."""
+    if value is None:
+        return ""
+    if not isinstance(value, str):
+        value = json.dumps(value, ensure_ascii=False) if isinstance(value, (dict, list)) else str(value)
+    return value.strip()
+
+
+def validate_response(data: Dict[str, Any]) -> Dict[str, Any]:
+    """스키마에 맞게 값을 검증하고 정규화한 사본을 반환합니다.
+
+    빠진 선택 필드는 빈 값으로 채우고, 코드가 비어 있는 블록은 버립니다.
+    답변 본문과 기능이 모두 없으면 쓸 수 있는 내용이 없으므로 예외를 발생시킵니다.
+    """
+    if not isinstance(data, dict):
+        raise StructuredResponseError(f"Expected a JSON object, got {type(data).__name__}")
+
+    features: List[Dict[str, Any]] = []
+    raw_features = data.get("features") or []
+    if isinstance(raw_features, dict):
+        raw_features = [raw_features]
+    if not isinstance(raw_features, list):
+        raise StructuredResponseError("'features' must be a list")
+
+    for raw in raw_features:
+        if isinstance(raw, str):
+            raw = {"description": raw}
+        if not isinstance(raw, dict):
+            continue
+
+        blocks = []
+        for block in raw.get("code_blocks") or []:
+            if not isinstance(block, dict) or not _text(block.get("code")):
+                continue
+            blocks.append({
+                "language": _text(block.get("language")).lower() or "text",
+                "code": block["code"].strip("\n") if isinstance(block["code"], str) else _text(block["code"]),
+            })
+
+        description = _text(raw.get("description"))
+        if description or blocks:
+            features.append({"description": description, "code_blocks": blocks})
+
+    result = {
+        "module": _text(data.get("module")).splitlines()[0] if _text(data.get("module")) else "",
+        "answer": _text(data.get("answer")),
+        "features": features,
+        "next_question": _text(data.get("next_question")),
+    }
+
+    if not result["answer"] and not result["features"]:
+        raise StructuredResponseError("Structured response has neither an answer nor features")
+    return result
+
+
+def parse_response(text: str) -> Dict[str, Any]:
+    """모델 출력을 읽고 검증합니다. 바로 읽을 수 없으면 repair_json 으로 복구를 시도합니다."""
+    try:
+        data = json.loads(text)
+    except ValueError:
+        logging.warning("Structured response is not valid JSON; attempting repair")
+        data = repair_json(text)
+    return validate_response(data)
+
+
+def build_extraction_prompt(response: str) -> str:
+    """응답 원문을 스키마에 맞는 JSON 으로 옮기도록 요청하는 프롬프트를 만듭니다."""
+    return EXTRACTION_PROMPT.format(instructions=STRUCTURED_INSTRUCTIONS, response=response)
+
+
+def render_markdown(data: Dict[str, Any]) -> str:
+    """검증된 구조화 응답을 대화 기록과 로그에 쓰는 마크다운 답변으로 변환합니다."""
+    lines = []
+    if data["module"]:
+        lines.append(f"모듈: {data['module']}")
+    if data["answer"]:
+        lines.append(data["answer"])
+
+    for feature in data["features"]:
+        if feature["description"]:
+            lines.append(f"기능 설명: {feature['description']}")
+        for block in feature["code_blocks"]:
+            lines.append(f"```{block['language']}\n{block['code']}\n```")
+
+    return "\n\n".join(lines)
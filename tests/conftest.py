@@ -0,0 +1,160 @@
+"""
+테스트 공용 설정: 저장소 루트를 import 경로에 추가하고 가짜 Ollama HTTP 서버를 제공합니다.
+"""
+import os
+import sys
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class StubReply:
+    """가짜 서버가 요청 하나에 돌려줄 응답
+
+    body 가 목록이면 NDJSON 스트림으로 한 줄씩 보내고, delay 만큼 기다린 뒤 응답합니다.
+    cut_after 를 주면 그만큼의 줄만 보내고 연결을 끊습니다 (스트림 도중 끊김 재현).
+    """
+
+    def __init__(self, status: int = 200, body: Any = None, delay: float = 0.0, raw: bytes = None,
+                 cut_after: int = None):
+        self.status = status
+        self.body = body
+        self.delay = delay
+        self.raw = raw
+        self.cut_after = cut_after
+
+    def encode(self) -> List[bytes]:
+        if self.raw is not None:
+            return [self.raw]
+        if isinstance(self.body, list):
+            return [json.dumps(item).encode("utf-8") + b"\n" for item in self.body]
+        return [json.dumps(self.body if self.body is not None else {}).encode("utf-8")]
+
+
+class StubOllamaServer:
+    """경로별로 미리 정한 응답을 차례대로 돌려주는 가짜 Ollama 서버
+
+    응답 목록이 바닥나면 마지막 응답을 계속 사용합니다. 받은 요청은 requests 에 기록됩니다.
+    """
+
+    def __init__(self):
+        self.replies: Dict[str, List[StubReply]] = {}
+        self.requests: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _reply(self, body: Optional[Dict[str, Any]]):
+                reply = server.next_reply(self.path, body)
+                if reply.delay:
+                    time.sleep(reply.delay)
+                chunks = reply.encode()
+                self.send_response(reply.status)
+                self.send_header("Content-Type", "application/x-ndjson" if isinstance(reply.body, list) else "application/json")
+                self.send_header("Content-Length", str(sum(len(chunk) for chunk in chunks)))
+                self.end_headers()
+                for index, chunk in enumerate(chunks):
+                    if reply.cut_after is not None and index >= reply.cut_after:
+                        self.close_connection = True
+                        return
+                    self.wfile.write(chunk)
+                    self.wfile.flush()
+
+            def do_GET(self):
+                self._reply(None)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                self._reply(json.loads(self.rfile.read(length) or b"{}"))
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def on(self, path: str, *replies: StubReply):
+        """path 로 오는 요청에 차례대로 돌려줄 응답을 지정합니다."""
+        self.replies[path] = list(replies)
+
+    def next_reply(self, path: str, body: Optional[Dict[str, Any]]) -> StubReply:
+        with self._lock:
+            self.requests.append({"path": path, "body": body})
+            queue = self.replies.get(path)
+            if not queue:
+                return StubReply(404, {"error": f"no stub for {path}"})
+            return queue.pop(0) if len(queue) > 1 else queue[0]
+
+    def hits(self, path: str) -> int:
+        return sum(1 for request in self.requests if request["path"] == path)
+
+    def start(self) -> "StubOllamaServer":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture
+def stub_server():
+    server = StubOllamaServer().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def stub_servers():
+    """가짜 서버 여러 개를 만드는 함수 (서버 풀 테스트용)"""
+    servers: List[StubOllamaServer] = []
+
+    def factory(count: int) -> List[StubOllamaServer]:
+        created = [StubOllamaServer().start() for _ in range(count)]
+        servers.extend(created)
+        return created
+
+    yield factory
+    for server in servers:
+        server.stop()
+
+
+@pytest.fixture
+def make_client(stub_server, monkeypatch):
+    """가짜 서버를 가리키는 OllamaClient 를 만드는 함수
+
+    재시도 대기 시간은 실제로 기다리지 않고 make_client.sleeps 에 기록합니다.
+    """
+    import ollama_client
+
+    sleeps: List[float] = []
+    monkeypatch.setattr(ollama_client, "time", SimpleNamespace(sleep=sleeps.append, monotonic=time.monotonic, time=time.time))
+    clients = []
+
+    def factory(**kwargs) -> "ollama_client.OllamaClient":
+        settings = dict(hosts=[stub_server.url], model="stub-model", max_retries=2, backoff_base=0.5,
+                        backoff_max=4.0, connect_timeout=1.0, read_timeout=2.0, routes={})
+        settings.update(kwargs)
+        client = ollama_client.OllamaClient(**settings)
+        clients.append(client)
+        return client
+
+    factory.sleeps = sleeps
+    yield factory
+    for client in clients:
+        client.close()
@@ -0,0 +1,187 @@
+"""
+HostPool 요청 분산, 서버 제외/복귀, 모델 확인 테스트 (가짜 HTTP 서버 여러 개 사용)
+"""
+import time
+
+import pytest
+
+import config
+from conftest import StubReply
+from host_pool import HostPool, ModelUnavailableError
+from ollama_client import OllamaConnectionError, OllamaResponseError
+
+
+def tags_reply(*models: str) -> StubReply:
+    return StubReply(body={"models": [{"name": name} for name in models]})
+
+
+def generate_reply(text: str) -> StubReply:
+    return StubReply(body={"response": text, "done": True})
+
+
+def serving(servers, *models: str):
+    for server in servers:
+        server.on("/api/tags", tags_reply(*models))
+    return servers
+
+
+@pytest.fixture
+def pools():
+    created = []
+
+    def factory(urls, **kwargs) -> HostPool:
+        settings = dict(probe_interval=0, eject_failures=2, probe_timeout=1.0)
+        settings.update(kwargs)
+        pool = HostPool(urls, **settings)
+        created.append(pool)
+        return pool
+
+    yield factory
+    for pool in created:
+        pool.close()
+
+
+# 요청 분산
+
+def test_acquire_prefers_least_outstanding_host(stub_servers, pools):
+    servers = serving(stub_servers(3), "stub-model:latest")
+    pool = pools([server.url for server in servers])
+
+    first = [pool.acquire("stub-model") for _ in range(3)]
+    assert {host.url for host in first} == {server.url for server in servers}
+
+    pool.release(first[1])
+    assert pool.acquire("stub-model") is first[1]
+
+
+def test_acquire_rotates_between_idle_hosts(stub_servers, pools):
+    servers = serving(stub_servers(3), "stub-model:latest")
+    pool = pools([server.url for server in servers])
+
+    chosen = []
+    for _ in range(6):
+        host = pool.acquire("stub-model")
+        chosen.append(host.url)
+        pool.release(host)
+
+    assert set(chosen[:3]) == {server.url for server in servers}
+    assert chosen[3:] == chosen[:3]
+
+
+# 제외와 복귀
+
+def test_host_is_ejected_after_consecutive_failures(stub_servers, pools):
+    servers = serving(stub_servers(2), "stub-model:latest")
+    pool = pools([server.url for server in servers], eject_failures=2)
+    bad = pool.hosts[0]
+
+    for _ in range(2):
+        pool.acquire("stub-model")
+        pool.release(bad, ok=False)
+
+    assert not bad.healthy
+    for _ in range(4):
+        host = pool.acquire("stub-model")
+        assert host is pool.hosts[1]
+        pool.release(host)
+
+
+def test_success_resets_failure_count(stub_servers, pools):
+    servers = serving(stub_servers(2), "stub-model:latest")
+    pool = pools([server.url for server in servers], eject_failures=2)
+    host = pool.hosts[0]
+
+    pool.release(host, ok=False)
+    pool.release(host, ok=True)
+    pool.release(host, ok=False)
+
+    assert host.healthy
+
+
+def test_client_retries_on_another_host_and_ejects_failing_one(stub_servers, make_client, monkeypatch):
+    monkeypatch.setattr(config, "OLLAMA_EJECT_FAILURES", 2)
+    monkeypatch.setattr(config, "OLLAMA_PROBE_INTERVAL", 0)
+    bad, good = serving(stub_servers(2), "stub-model:latest")
+    bad.on("/api/generate", StubReply(500, {"error": "gpu fault"}))
+    good.on("/api/generate", generate_reply("ok"))
+    client = make_client(hosts=[bad.url, good.url], max_retries=1)
+
+    for _ in range(6):
+        assert client.generate("hi") == "ok"
+
+    # 실패한 서버는 eject_failures 번 시도된 뒤 제외되고, 매번 재시도는 다른 서버로 감
+    assert bad.hits("/api/generate") == 2
+    assert good.hits("/api/generate") == 6
+    assert not client.pool.hosts[0].healthy
+
+
+def test_retry_after_failure_goes_to_different_host(stub_servers, make_client, monkeypatch):
+    monkeypatch.setattr(config, "OLLAMA_PROBE_INTERVAL", 0)
+    servers = serving(stub_servers(2), "stub-model:latest")
+    for server in servers:
+        server.on("/api/generate", StubReply(503, {"error": "busy"}))
+    client = make_client(hosts=[server.url for server in servers], max_retries=1)
+
+    with pytest.raises(OllamaResponseError):
+        client.generate("hi")
+
+    assert [server.hits("/api/generate") for server in servers] == [1, 1]
+
+
+def test_ejected_host_is_readmitted_after_successful_probe(stub_servers, pools):
+    down, up = stub_servers(2)
+    down.on("/api/tags", StubReply(503, {"error": "loading"}))
+    up.on("/api/tags", tags_reply("stub-model:latest"))
+    pool = pools([down.url, up.url], probe_interval=0.05)
+    assert not pool.hosts[0].healthy
+
+    down.on("/api/tags", tags_reply("stub-model:latest"))
+    deadline = time.monotonic() + 3
+    while not pool.hosts[0].healthy and time.monotonic() < deadline:
+        time.sleep(0.02)
+
+    assert pool.hosts[0].healthy
+    assert pool.hosts[0].failures == 0
+    assert pool.hosts[0].models == {"stub-model:latest"}
+
+
+# 모델 확인
+
+def test_requests_go_only_to_hosts_with_the_model(stub_servers, pools):
+    llama, mistral = stub_servers(2)
+    llama.on("/api/tags", tags_reply("llama3:latest"))
+    mistral.on("/api/tags", tags_reply("mistral:latest", "nomic-embed-text:latest"))
+    pool = pools([llama.url, mistral.url])
+
+    for _ in range(4):
+        for model, server in (("llama3", llama), ("mistral", mistral), ("nomic-embed-text:latest", mistral)):
+            host = pool.acquire(model)
+            assert host.url == server.url
+            pool.release(host)
+
+
+def test_ejected_host_with_model_is_preferred_over_host_without_it(stub_servers, pools):
+    llama, mistral = stub_servers(2)
+    llama.on("/api/tags", tags_reply("llama3:latest"))
+    mistral.on("/api/tags", tags_reply("mistral:latest"))
+    pool = pools([llama.url, mistral.url], eject_failures=1)
+
+    pool.release(pool.acquire("llama3"), ok=False)
+    assert not pool.hosts[0].healthy
+
+    assert pool.acquire("llama3") is pool.hosts[0]
+
+
+def test_missing_model_raises_instead_of_routing_blindly(stub_servers, pools, make_client, monkeypatch):
+    monkeypatch.setattr(config, "OLLAMA_PROBE_INTERVAL", 0)
+    servers = serving(stub_servers(2), "llama3:latest")
+    pool = pools([server.url for server in servers])
+
+    with pytest.raises(ModelUnavailableError, match="phi3"):
+        pool.acquire("phi3")
+
+    client = make_client(hosts=[server.url for server in servers], model="phi3", max_retries=2)
+    with pytest.raises(OllamaConnectionError, match="phi3"):
+        client.generate("hi")
+    assert [server.hits("/api/generate") for server in servers] == [0, 0]
+    assert make_client.sleeps == []
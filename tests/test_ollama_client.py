@@ -0,0 +1,219 @@
+"""
+OllamaClient 재시도, 오류 분류, NDJSON 스트리밍 테스트 (가짜 HTTP 서버 사용)
+"""
+import socket
+
+import pytest
+
+from conftest import StubReply
+from ollama_client import (
+    OllamaCacheMissError,
+    OllamaConnectionError,
+    OllamaError,
+    OllamaResponseError,
+    OllamaTimeoutError,
+)
+from response_cache import ResponseCache
+
+
+def generate_reply(text: str, **stats) -> StubReply:
+    return StubReply(body={"model": "stub-model", "response": text, "done": True, **stats})
+
+
+def stream_reply(*parts: str, **kwargs) -> StubReply:
+    lines = [{"response": part, "done": False} for part in parts]
+    lines.append({"response": "", "done": True, "eval_count": len(parts), "prompt_eval_count": 7})
+    return StubReply(body=lines, **kwargs)
+
+
+def unused_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+# 재시도와 백오프
+
+def test_retries_server_errors_then_succeeds(stub_server, make_client):
+    stub_server.on("/api/generate", StubReply(503, {"error": "busy"}), StubReply(500, {"error": "boom"}), generate_reply("ok"))
+    client = make_client(max_retries=2)
+
+    assert client.generate("hi") == "ok"
+    assert stub_server.hits("/api/generate") == 3
+    assert len(make_client.sleeps) == 2
+
+
+def test_backoff_delays_stay_within_exponential_cap(stub_server, make_client):
+    stub_server.on("/api/generate", StubReply(500, {"error": "boom"}))
+    client = make_client(max_retries=4, backoff_base=0.5, backoff_max=2.0)
+
+    with pytest.raises(OllamaResponseError) as excinfo:
+        client.generate("hi")
+
+    assert excinfo.value.status_code == 500
+    assert stub_server.hits("/api/generate") == 5
+    caps = [min(2.0, 0.5 * 2 ** attempt) for attempt in range(4)]
+    assert len(make_client.sleeps) == 4
+    assert all(0 <= delay <= cap for delay, cap in zip(make_client.sleeps, caps))
+
+
+def test_client_errors_are_not_retried(stub_server, make_client):
+    stub_server.on("/api/generate", StubReply(404, {"error": "model 'missing' not found"}))
+    client = make_client(max_retries=3)
+
+    with pytest.raises(OllamaResponseError) as excinfo:
+        client.generate("hi")
+
+    assert excinfo.value.status_code == 404
+    assert stub_server.hits("/api/generate") == 1
+    assert make_client.sleeps == []
+
+
+def test_request_payload_uses_model_and_defaults(stub_server, make_client):
+    stub_server.on("/api/generate", generate_reply("ok"))
+    client = make_client(options={"num_ctx": 4096}, keep_alive="5m")
+
+    client.generate("hello", options={"temperature": 0.2})
+
+    body = stub_server.requests[-1]["body"]
+    assert body["model"] == "stub-model"
+    assert body["prompt"] == "hello"
+    assert body["stream"] is False
+    assert body["options"] == {"num_ctx": 4096, "temperature": 0.2}
+    assert body["keep_alive"] == "5m"
+
+
+# 오류 종류
+
+def test_unreachable_server_raises_connection_error(make_client):
+    client = make_client(hosts=[f"http://127.0.0.1:{unused_port()}"], max_retries=1)
+
+    with pytest.raises(OllamaConnectionError):
+        client.generate("hi")
+    assert len(make_client.sleeps) == 1
+
+
+def test_slow_response_raises_timeout_without_retry(stub_server, make_client):
+    stub_server.on("/api/generate", StubReply(body={"response": "late", "done": True}, delay=1.0))
+    client = make_client(read_timeout=0.2, max_retries=3)
+
+    with pytest.raises(OllamaTimeoutError):
+        client.generate("hi")
+    assert stub_server.hits("/api/generate") == 1
+
+
+def test_invalid_json_raises_response_error(stub_server, make_client):
+    stub_server.on("/api/generate", StubReply(raw=b"<html>not json</html>"))
+    client = make_client()
+
+    with pytest.raises(OllamaResponseError, match="Invalid JSON"):
+        client.generate("hi")
+
+
+def test_error_body_and_missing_field_raise_response_error(stub_server, make_client):
+    stub_server.on("/api/generate", StubReply(body={"error": "out of memory"}), StubReply(body={"done": True}))
+    client = make_client()
+
+    with pytest.raises(OllamaResponseError, match="out of memory"):
+        client.generate("hi")
+    with pytest.raises(OllamaResponseError, match="Missing 'response'"):
+        client.generate("hi")
+
+
+def test_typed_errors_share_base_class():
+    for error in (OllamaConnectionError, OllamaTimeoutError, OllamaResponseError, OllamaCacheMissError):
+        assert issubclass(error, OllamaError)
+
+
+# NDJSON 스트리밍
+
+def test_generate_stream_yields_chunks_and_reports_stats(stub_server, make_client):
+    stub_server.on("/api/generate", stream_reply("Hel", "lo", " world"))
+    client = make_client()
+    stats = []
+    client.stats_listener = stats.append
+
+    assert list(client.generate_stream("hi")) == ["Hel", "lo", " world"]
+    assert stub_server.requests[-1]["body"]["stream"] is True
+    assert len(stats) == 1
+    assert stats[0]["eval_count"] == 3
+    assert stats[0]["prompt_eval_count"] == 7
+    assert client.pool.hosts[0].outstanding == 0
+
+
+def test_chat_stream_extracts_message_content(stub_server, make_client):
+    lines = [{"message": {"role": "assistant", "content": part}, "done": False} for part in ("a", "b")]
+    stub_server.on("/api/chat", StubReply(body=lines + [{"message": {"role": "assistant", "content": ""}, "done": True}]))
+    client = make_client()
+
+    assert "".join(client.chat_stream([{"role": "user", "content": "hi"}])) == "ab"
+
+
+def test_stream_error_chunk_raises_response_error(stub_server, make_client):
+    stub_server.on("/api/generate", StubReply(body=[{"response": "par", "done": False}, {"error": "model crashed"}]))
+    client = make_client()
+
+    received = []
+    with pytest.raises(OllamaResponseError, match="model crashed"):
+        for chunk in client.generate_stream("hi"):
+            received.append(chunk)
+    assert received == ["par"]
+
+
+def test_invalid_stream_chunk_raises_response_error(stub_server, make_client):
+    stub_server.on("/api/generate", StubReply(raw=b'{"response": "ok", "done": false}\nnot-json\n'))
+    client = make_client()
+
+    with pytest.raises(OllamaResponseError, match="Invalid stream chunk"):
+        list(client.generate_stream("hi"))
+
+
+def test_interrupted_stream_raises_connection_error_without_retry(stub_server, make_client):
+    stub_server.on("/api/generate", stream_reply("one", "two", "three", cut_after=1))
+    client = make_client(max_retries=3)
+
+    with pytest.raises(OllamaConnectionError, match="Stream interrupted"):
+        list(client.generate_stream("hi"))
+    assert stub_server.hits("/api/generate") == 1
+    assert client.pool.hosts[0].outstanding == 0
+
+
+def test_stream_connect_is_retried_before_first_chunk(stub_server, make_client):
+    stub_server.on("/api/generate", StubReply(502, {"error": "bad gateway"}), stream_reply("ok"))
+    client = make_client(max_retries=1)
+
+    assert list(client.generate_stream("hi")) == ["ok"]
+    assert stub_server.hits("/api/generate") == 2
+
+
+# 응답 캐시
+
+def test_readwrite_cache_serves_repeated_request_without_server(stub_server, make_client, tmp_path):
+    stub_server.on("/api/generate", generate_reply("cached"))
+    cache = ResponseCache(str(tmp_path / "cache.db"))
+    client = make_client(cache=cache)
+
+    assert client.generate("hi") == "cached"
+    assert client.generate("hi") == "cached"
+    assert stub_server.hits("/api/generate") == 1
+    cache.close()
+
+
+def test_replay_cache_miss_raises_without_contacting_server(stub_server, make_client, tmp_path):
+    stub_server.on("/api/generate", generate_reply("live"))
+    path = str(tmp_path / "cache.db")
+    recorder = ResponseCache(path)
+    make_client(cache=recorder).generate("recorded")
+    recorder.close()
+
+    replay = ResponseCache(path, read_only=True)
+    client = make_client(cache=replay)
+    assert client.generate("recorded") == "live"
+    with pytest.raises(OllamaCacheMissError):
+        client.generate("new prompt")
+    with pytest.raises(OllamaCacheMissError):
+        list(client.generate_stream("new prompt"))
+
+    assert stub_server.hits("/api/generate") == 1
+    assert replay.stats()["stores"] == 0
+    replay.close()
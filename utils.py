@@ -4,23 +4,30 @@
 import os
 import re
 import json
+import queue
 import logging
-import requests
+import threading
 import time
+import uuid
+import shutil
 from datetime import datetime
 from pathlib import Path
 from typing import List, Dict, Tuple, Optional, Any
-from models import Project
+from models import Project, Component
+from ollama_client import OllamaClient, OllamaError
+from prompt_builder import estimate_tokens
+from doc_loader import PlanningDocLoader
 
 import config
 
 # 로깅 설정
-def setup_logging():
+def setup_logging(log_dir: str = None):
     """로깅 설정을 초기화합니다."""
-    if not os.path.exists(config.LOG_DIR):
-        os.makedirs(config.LOG_DIR)
+    log_dir = log_dir or config.LOG_DIR
+    if not os.path.exists(log_dir):
+        os.makedirs(log_dir)
     
-    log_file = os.path.join(config.LOG_DIR, f"app_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log")
+    log_file = os.path.join(log_dir, f"app_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log")
     
     logging.basicConfig(
         level=logging.DEBUG if config.DEBUG_MODE else logging.INFO,
@@ -49,75 +56,191 @@ def init_folders():
 
 # 기획서 로드
 def load_planning_docs() -> str:
-    """planning_docs 폴더에서 기획서 파일들을 로드합니다."""
-    if not os.path.exists(config.PLANNING_DOCS_DIR):
-        logging.error(f"Planning docs directory not found: {config.PLANNING_DOCS_DIR}")
-        return ""
-    
-    all_content = []
-    
-    for file_name in os.listdir(config.PLANNING_DOCS_DIR):
-        file_path = os.path.join(config.PLANNING_DOCS_DIR, file_name)
-        
-        if os.path.isfile(file_path) and file_name.endswith(('.txt', '.md', '.docx')):
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    all_content.append(f"# {file_name}\n\n{content}\n\n")
-                    logging.info(f"Loaded planning document: {file_name}")
-            except Exception as e:
-                logging.error(f"Error loading file {file_name}: {e}")
-    
-    if not all_content:
-        logging.warning("No planning documents found. Please add documents to the planning_docs folder.")
-        return ""
-    
-    return "\n".join(all_content)
+    """planning_docs 폴더에서 기획서 파일들을 로드합니다.
+
+    실행 중 변경을 반영하려면 doc_loader.PlanningDocLoader 를 직접 사용하세요.
+    """
+    return PlanningDocLoader().load()
 
 # Ollama API 호출
-def query_ollama(prompt: str, model: str = None) -> str:
-    """Ollama API를 호출하여 응답을 받습니다."""
-    if model is None:
-        model = config.MODEL_NAME
-    
-    payload = {
-        "model": model,
-        "prompt": prompt,
-        "stream": False
-    }
+_default_client: Optional[OllamaClient] = None
+
+def get_client() -> OllamaClient:
+    """모듈 공용 Ollama 클라이언트를 반환합니다."""
+    global _default_client
+    if _default_client is None:
+        _default_client = OllamaClient()
+    return _default_client
+
+def query_ollama(prompt: str, model: str = None, client: OllamaClient = None, task: str = None) -> str:
+    """Ollama API를 호출하여 응답을 받습니다.
+
+    task 를 지정하면 config.MODEL_ROUTES 에서 그 작업에 설정된 모델과 옵션을 사용합니다.
+    실패 시 오류 문자열을 반환하지 않고 OllamaError 계열 예외를 발생시킵니다.
+    """
+    if client is None:
+        client = get_client()
     
-    try:
-        response = requests.post(config.OLLAMA_API_URL, json=payload)
-        
-        if response.status_code == 200:
-            return response.json().get("response", "응답을 받지 못했습니다.")
-        else:
-            error_msg = f"API 오류 (코드: {response.status_code}): {response.text}"
-            logging.error(error_msg)
-            return error_msg
-    except Exception as e:
-        error_msg = f"API 호출 중 예외 발생: {str(e)}"
-        logging.error(error_msg)
-        return error_msg
+    return client.generate(prompt, model=model, task=task)
 
 # 대화 기록 관리
 class ConversationHistory:
-    def __init__(self, max_history: int = config.MAX_CONVERSATION_HISTORY):
+    """최근 대화 기록과 오래된 대화의 계층적 요약을 관리합니다.
+    
+    최대 기록 수를 넘어 밀려난 대화는 버리지 않고 모아 두었다가, summarize_interval 개가
+    쌓이면 백그라운드 스레드에서 구간 요약으로 만듭니다. 구간 요약이 SUMMARY_MAX_SEGMENTS 개를
+    넘으면 오래된 것부터 장기 요약(요약의 요약)으로 합칩니다. 요약은 메인 모델 호출과
+    동시에 진행되며, 메인 루프는 요약 완료를 기다리지 않습니다.
+    요약 중인 묶음은 구간 요약에 합쳐질 때까지 pending_turns 에 남아 있으므로,
+    그 사이에 상태를 저장하거나 중단되어도 해당 대화는 다음 실행에서 다시 요약됩니다.
+    """
+    
+    def __init__(self, max_history: int = config.MAX_CONVERSATION_HISTORY, client: OllamaClient = None,
+                 summarize_interval: int = None):
         self.history = []
         self.max_history = max_history
-        self.summary = ""
+        self.client = client
+        self.summarize_interval = config.SUMMARIZE_INTERVAL if summarize_interval is None else summarize_interval
+        
+        self._long_term_summary = ""
+        self._segments: List[str] = []
+        self._pending: List[Tuple[str, str]] = []
+        self._in_flight: List[List[Tuple[str, str]]] = []  # 작업 스레드에 넘겨졌지만 아직 합쳐지지 않은 묶음
+        self._lock = threading.Lock()
+        self._jobs: "queue.Queue" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+    
+    @property
+    def summary(self) -> str:
+        """장기 요약과 최근 구간 요약을 합친 텍스트"""
+        with self._lock:
+            parts = [self._long_term_summary] + self._segments
+        return "\n\n".join(part for part in parts if part)
+    
+    @summary.setter
+    def summary(self, value: str):
+        with self._lock:
+            self._long_term_summary = value or ""
+            self._segments = []
+    
+    @property
+    def pending_turns(self) -> List[Tuple[str, str]]:
+        """기록에서 밀려났지만 아직 요약에 반영되지 않은 대화 (요약 중인 묶음 포함, 오래된 순)"""
+        with self._lock:
+            return self._unsummarized()
+    
+    def summary_state(self) -> Tuple[str, List[Tuple[str, str]]]:
+        """요약과 아직 요약되지 않은 대화를 같은 시점 기준으로 함께 반환합니다."""
+        with self._lock:
+            parts = [self._long_term_summary] + self._segments
+            return "\n\n".join(part for part in parts if part), self._unsummarized()
+    
+    def _unsummarized(self) -> List[Tuple[str, str]]:
+        return [turn for batch in self._in_flight for turn in batch] + self._pending
     
     def add(self, question: str, answer: str):
         """대화 기록에 질문과 답변을 추가합니다."""
         self.history.append((question, answer))
         
-        # 최대 기록 수를 넘으면 가장 오래된 기록 제거
+        # 최대 기록 수를 넘으면 가장 오래된 기록을 요약 대기열로 이동
         if len(self.history) > self.max_history:
-            self.history.pop(0)
+            evicted = self.history.pop(0)
+            if self.summarize_interval > 0:
+                self.defer_summary([evicted])
+    
+    def defer_summary(self, turns: List[Tuple[str, str]]):
+        """요약 대기열에 대화를 추가하고, 충분히 쌓이면 백그라운드 요약을 시작합니다."""
+        with self._lock:
+            self._pending.extend(turns)
+            if len(self._pending) < self.summarize_interval:
+                return
+            batch, self._pending = self._pending, []
+            self._in_flight.append(batch)
+        
+        self._ensure_worker()
+        self._jobs.put(batch)
+    
+    def _ensure_worker(self):
+        """요약 작업 스레드를 시작합니다. 종료 시 대기하지 않도록 데몬 스레드로 실행합니다."""
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run_worker, name="summarizer", daemon=True)
+            self._worker.start()
+    
+    def _run_worker(self):
+        while True:
+            batch = self._jobs.get()
+            if batch is None:
+                break
+            self._summarize_batch(batch)
+    
+    def _summarize_batch(self, batch: List[Tuple[str, str]]):
+        """밀려난 대화 묶음을 구간 요약으로 만들고, 필요하면 장기 요약으로 합칩니다."""
+        history_text = "\n\n".join(f"질문: {q}\n답변: {a}" for q, a in batch)
+        prompt = f"""다음은 기획서에 관한 대화 기록입니다. 이 대화 내용을 간결하게 요약해주세요:
+
+{history_text}
+
+요약:"""
+        
+        try:
+            segment = query_ollama(prompt, client=self.client, task="summary").strip()
+        except OllamaError as e:
+            # 실패한 묶음은 다음 요약 때 다시 시도
+            logging.error(f"Background summarization failed, will retry with next batch: {e}")
+            with self._lock:
+                self._finish(batch)
+                self._pending = batch + self._pending
+            return
+        
+        with self._lock:
+            self._finish(batch)
+            self._segments.append(segment)
+            overflow = len(self._segments) - config.SUMMARY_MAX_SEGMENTS
+            if overflow <= 0:
+                return
+            folded = self._segments[:overflow + 1]
+            long_term = self._long_term_summary
+        
+        self._fold_segments(long_term, folded)
+    
+    def _finish(self, batch: List[Tuple[str, str]]):
+        """요약이 끝난 묶음을 진행 중 목록에서 뺍니다. 호출 측에서 잠금을 잡고 있어야 합니다."""
+        for index, item in enumerate(self._in_flight):
+            if item is batch:
+                del self._in_flight[index]
+                break
+    
+    def _fold_segments(self, long_term: str, folded: List[str]):
+        """오래된 구간 요약들을 장기 요약에 합칩니다 (요약의 요약)."""
+        sections = ([f"기존 장기 요약:\n{long_term}"] if long_term else []) + [f"구간 요약:\n{segment}" for segment in folded]
+        prompt = f"""다음은 긴 개발 대화의 요약들입니다. 중요한 결정 사항, 구현된 모듈, 남은 작업이 빠지지 않도록 하나의 간결한 요약으로 합쳐주세요:
+
+{chr(10).join(sections)}
+
+통합 요약:"""
+        
+        try:
+            merged = query_ollama(prompt, client=self.client, task="summary").strip()
+        except OllamaError as e:
+            logging.error(f"Summary consolidation failed, keeping segments: {e}")
+            return
+        
+        with self._lock:
+            self._long_term_summary = merged
+            self._segments = self._segments[len(folded):]
+    
+    def close(self):
+        """요약 스레드를 종료합니다. 진행 중인 요약은 기다리지 않습니다."""
+        if self._worker is not None:
+            self._jobs.put(None)
+    
+    def get_formatted_turns(self) -> List[str]:
+        """대화 기록을 질문/답변 쌍 단위로 형식화하여 반환합니다."""
+        return [f"질문: {q}\n답변: {a}" for q, a in self.history]
     
     def get_formatted_history(self) -> str:
         """형식화된 대화 기록을 반환합니다."""
-        return "\n\n".join([f"질문: {q}\n답변: {a}" for q, a in self.history])
+        return "\n\n".join(self.get_formatted_turns())
     
     def summarize(self) -> str:
         """현재 대화 기록을 요약합니다."""
@@ -131,31 +254,124 @@ class ConversationHistory:
 
 요약:"""
         
-        self.summary = query_ollama(prompt)
+        try:
+            self.summary = query_ollama(prompt, client=self.client, task="summary")
+        except OllamaError as e:
+            # 요약 실패는 치명적이지 않으므로 이전 요약을 유지
+            logging.error(f"Summarization failed, keeping previous summary: {e}")
         return self.summary
     
     def clear(self):
         """대화 기록을 초기화합니다."""
         self.history = []
         self.summary = ""
+        with self._lock:
+            self._pending = []
+            self._in_flight = []
+
+# 프로젝트 요약 (다음 질문 생성용)
+class ProjectDigest:
+    """프로젝트 코드 현황을 크기 제한이 있는 요약으로 유지합니다.
+    
+    전체 코드 대신 모듈별 기능 목록, 코드 스니펫의 시그니처와 줄 수만 담습니다.
+    모듈 요약은 캐시되며, 마지막 갱신 이후 기능이 추가된 모듈만 새 기능 부분을 덧붙여 갱신합니다.
+    """
+    
+    _SIGNATURE_PATTERN = re.compile(
+        r"^\s*(?:export\s+|public\s+|private\s+|protected\s+|static\s+|async\s+)*"
+        r"(?:def|class|function|func|fn|interface|struct|enum|type)\s+[A-Za-z_][\w]*[^\n]*$",
+        re.MULTILINE
+    )
+    
+    def __init__(self, max_signatures: int = None, max_features: int = None):
+        self.max_signatures = config.DIGEST_MAX_SIGNATURES if max_signatures is None else max_signatures
+        self.max_features = config.DIGEST_MAX_FEATURES if max_features is None else max_features
+        self._features: Dict[str, List[str]] = {}  # 모듈 이름 -> 기능별 요약 줄
+        self._headers: Dict[str, str] = {}
+        self._order: List[str] = []  # 최근에 갱신된 모듈이 앞쪽
+    
+    @classmethod
+    def summarize_snippet(cls, snippet, max_signatures: int) -> str:
+        """코드 스니펫을 언어, 줄 수, 주요 시그니처로 요약합니다."""
+        line_count = snippet.code.count("\n") + 1 if snippet.code else 0
+        signatures = [match.group(0).strip().rstrip("{:").strip() for match in cls._SIGNATURE_PATTERN.finditer(snippet.code)]
+        
+        summary = f"- {snippet.language} {line_count}줄"
+        if signatures:
+            shown = signatures[:max_signatures]
+            summary += ": " + "; ".join(shown)
+            if len(signatures) > len(shown):
+                summary += f" 외 {len(signatures) - len(shown)}개"
+        return summary
+    
+    def refresh(self, project: Project) -> List[str]:
+        """새 기능이 추가된 모듈만 갱신하고, 갱신된 모듈 이름 목록을 반환합니다."""
+        touched = []
+        for component in project.components:
+            cached = self._features.setdefault(component.name, [])
+            if len(cached) == len(component.features) and component.name in self._headers:
+                continue
+            
+            self._headers[component.name] = f"## 모듈: {component.name}\n설명: {component.description}\n"
+            for feature in component.features[len(cached):]:
+                lines = [f"### 기능: {feature.name}", f"설명: {feature.description}"]
+                lines.extend(self.summarize_snippet(snippet, self.max_signatures) for snippet in feature.code_snippets)
+                cached.append("\n".join(lines))
+            
+            if component.name in self._order:
+                self._order.remove(component.name)
+            self._order.insert(0, component.name)
+            touched.append(component.name)
+        
+        return touched
+    
+    def render(self, max_tokens: int = None) -> str:
+        """최근 갱신된 모듈부터 토큰 예산 안에서 요약 텍스트를 만듭니다."""
+        if max_tokens is None:
+            max_tokens = config.DIGEST_MAX_TOKENS
+        
+        blocks = []
+        remaining = max_tokens
+        for index, name in enumerate(self._order):
+            features = self._features[name]
+            block = self._headers[name]
+            if len(features) > self.max_features:
+                block += f"(이전 기능 {len(features) - self.max_features}개 생략)\n"
+            block += "\n".join(features[-self.max_features:]) + "\n"
+            
+            cost = estimate_tokens(block)
+            if cost > remaining:
+                omitted = self._order[index:]
+                blocks.append(f"(요약 생략된 모듈 {len(omitted)}개: {', '.join(omitted)})")
+                break
+            
+            blocks.append(block)
+            remaining -= cost
+        
+        return "\n".join(blocks)
 
 # 다음 질문 생성
-def generate_next_question(response: str, project: Project, current_module: str = None) -> str:
-    """AI 응답을 분석하여 다음 질문을 생성합니다."""
+def generate_next_question(response: str, project: Project, current_module: str = None, client: OllamaClient = None,
+                           digest: ProjectDigest = None, uncovered: str = None) -> str:
+    """AI 응답을 분석하여 다음 질문을 생성합니다.
     
-    # 현재 프로젝트의 코드 정보 수집 (이전과 동일)
+    uncovered 에 아직 구현되지 않은 기획서 요구사항 요약을 주면 그 부분을 다루도록 유도합니다.
+    """
+    
+    # 현재 프로젝트의 코드 현황 요약 (전달된 digest 가 있으면 변경된 모듈만 갱신)
+    if digest is None:
+        digest = ProjectDigest()
     current_code_info = ""
     if project and project.components:
-        for component in project.components:
-            current_code_info += f"\n## 모듈: {component.name}\n"
-            current_code_info += f"설명: {component.description}\n"
-            
-            for feature in component.features:
-                current_code_info += f"\n### 기능: {feature.name}\n"
-                current_code_info += f"설명: {feature.description}\n"
-                
-                for snippet in feature.code_snippets:
-                    current_code_info += f"\n```{snippet.language}\n{snippet.code}\n```\n"
+        digest.refresh(project)
+        current_code_info = digest.render()
+    
+    focus = ""
+    if uncovered:
+        focus = f"""
+# 아직 구현되지 않은 기획서 요구사항:
+{uncovered}
+"""
     
     if current_module is None:
         prompt = f"""
@@ -166,7 +382,7 @@ def generate_next_question(response: str, project: Project, current_module: str
 
 # 마지막 응답:
 {response}
-
+{focus}
 기획서와 현재 개발 상태를 고려하여, 다음으로 개발해야 할 모듈이나 기능에 관한 구체적인 질문을 생성해주세요.
 기획서에 부족하거나 모호한 부분이 있다면, 그 부분을 명확히 하거나 필요한 세부 사항을 추가하는 질문도 좋습니다.
 
@@ -181,13 +397,13 @@ def generate_next_question(response: str, project: Project, current_module: str
 
 # 마지막 응답:
 {response}
-
+{focus}
 기획서와 현재 개발 상태를 고려하여, '{current_module}' 모듈을 더 발전시키거나 다른 필요한 모듈로 넘어가기 위한 구체적인 질문을 생성해주세요.
 기획서에 명시되지 않았거나 모호한 부분에 대해서는 적절한 가정을 제안하거나 명확히 하는 질문도 포함해주세요.
 
 질문:"""
     
-    return query_ollama(prompt)
+    return query_ollama(prompt, client=client, task="next_question")
 
 # 결과 저장
 def save_result(content: str, file_name: str = None):
@@ -221,6 +437,101 @@ def extract_code_snippets(text: str) -> List[Dict[str, str]]:
     
     return snippets
 
+class CodeBlockStreamParser:
+    """스트리밍 응답에서 코드 블록을 점진적으로 추출합니다.
+
+    extract_code_snippets 와 같은 규칙(```언어\n ... ```)을 따르며,
+    닫는 ``` 가 도착하는 즉시 완성된 스니펫을 반환합니다.
+    각 스니펫의 "preface" 에는 직전 코드 블록 이후부터 이 코드 블록 앞까지의 텍스트가 담기며,
+    그보다 앞의 텍스트는 보관하지 않으므로 메모리 사용량이 응답 길이에 비례하지 않습니다.
+    """
+    
+    _OPEN_PATTERN = re.compile(r"```([a-zA-Z0-9_]*)\n")
+    _PARTIAL_OPEN_PATTERN = re.compile(r"(?:```[a-zA-Z0-9_]*|``?)\Z")
+    
+    def __init__(self):
+        self._buffer = ""
+        self._language = None  # None 이면 코드 블록 밖
+        self._preface = ""  # 직전 코드 블록 이후의 블록 밖 텍스트
+    
+    def feed(self, text: str) -> List[Dict[str, str]]:
+        """새 텍스트 조각을 입력하고, 완성된 코드 스니펫 목록을 반환합니다."""
+        self._buffer += text
+        snippets = []
+        
+        while True:
+            if self._language is None:
+                match = self._OPEN_PATTERN.search(self._buffer)
+                if not match:
+                    # 여는 펜스의 일부일 수 있는 끝부분만 남김
+                    partial = self._PARTIAL_OPEN_PATTERN.search(self._buffer)
+                    keep = partial.start() if partial else len(self._buffer)
+                    self._preface += self._buffer[:keep]
+                    self._buffer = self._buffer[keep:]
+                    break
+                
+                self._preface += self._buffer[:match.start()]
+                self._language = match.group(1)
+                self._buffer = self._buffer[match.end():]
+            else:
+                end = self._buffer.find("```")
+                if end == -1:
+                    break
+                
+                snippets.append({
+                    "language": self._language.strip() or "text",
+                    "code": self._buffer[:end].strip(),
+                    "preface": self._preface
+                })
+                self._buffer = self._buffer[end + 3:]
+                self._language = None
+                self._preface = ""
+        
+        return snippets
+
+class ResponseCheckpoint:
+    """스트리밍 중인 응답을 디스크에 기록하여 생성 도중 중단되어도 내용을 잃지 않도록 합니다."""
+    
+    def __init__(self, file_name: str = "partial_response.txt", directory: str = None):
+        self.file_path = os.path.join(directory or config.OUTPUT_DIR, file_name)
+        self._file = None
+    
+    def write(self, text: str):
+        """응답 조각을 체크포인트 파일에 추가합니다."""
+        if self._file is None:
+            self._file = open(self.file_path, 'w', encoding='utf-8')
+        
+        self._file.write(text)
+        self._file.flush()
+    
+    def complete(self):
+        """응답이 완성되면 체크포인트 파일을 삭제합니다."""
+        self.close()
+        if os.path.exists(self.file_path):
+            os.remove(self.file_path)
+    
+    def close(self):
+        """파일을 닫습니다. 체크포인트 내용은 보존됩니다."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+def recover_partial_response(file_name: str = "partial_response.txt", directory: str = None) -> Optional[str]:
+    """이전 실행에서 중단된 응답 체크포인트를 보관 파일로 옮기고 내용을 반환합니다."""
+    directory = directory or config.OUTPUT_DIR
+    file_path = os.path.join(directory, file_name)
+    
+    if not os.path.exists(file_path):
+        return None
+    
+    with open(file_path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    
+    archive_path = os.path.join(directory, f"partial_response_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt")
+    os.replace(file_path, archive_path)
+    logging.info(f"Recovered partial response ({len(content)} chars) to {archive_path}")
+    return content
+
 # 아키텍처 다이어그램 추출 및 생성
 def extract_architecture_diagrams(text: str) -> List[Dict[str, str]]:
     """텍스트에서 아키텍처 다이어그램 설명을 추출하고 다이어그램을 생성합니다."""
@@ -239,18 +550,32 @@ def extract_architecture_diagrams(text: str) -> List[Dict[str, str]]:
     return diagrams
 
 # 상태 저장 및 복구
-def save_state(state: Dict[str, Any], file_name: str = "state.json"):
+def atomic_write_json(file_path: str, data: Any, indent: int = None, fsync: bool = True):
+    """임시 파일에 쓴 뒤 이름을 바꾸어, 쓰는 도중 중단되어도 기존 파일이 손상되지 않게 저장합니다."""
+    directory = os.path.dirname(file_path)
+    os.makedirs(directory, exist_ok=True)
+    
+    tmp_path = f"{file_path}.tmp"
+    separators = None if indent else (",", ":")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=indent, separators=separators)
+        f.flush()
+        if fsync:
+            os.fsync(f.fileno())
+    
+    os.replace(tmp_path, file_path)
+
+def save_state(state: Dict[str, Any], file_name: str = "state.json", directory: str = None):
     """현재 실행 상태를 저장합니다."""
-    file_path = os.path.join(config.OUTPUT_DIR, file_name)
+    file_path = os.path.join(directory or config.OUTPUT_DIR, file_name)
     
-    with open(file_path, 'w', encoding='utf-8') as f:
-        json.dump(state, f, ensure_ascii=False, indent=2)
+    atomic_write_json(file_path, state)
     
     logging.info(f"State saved to {file_path}")
 
-def load_state(file_name: str = "state.json") -> Dict[str, Any]:
+def load_state(file_name: str = "state.json", directory: str = None) -> Dict[str, Any]:
     """저장된 실행 상태를 로드합니다."""
-    file_path = os.path.join(config.OUTPUT_DIR, file_name)
+    file_path = os.path.join(directory or config.OUTPUT_DIR, file_name)
     
     if not os.path.exists(file_path):
         logging.info(f"No saved state found at {file_path}")
@@ -265,3 +590,290 @@ def load_state(file_name: str = "state.json") -> Dict[str, Any]:
     except Exception as e:
         logging.error(f"Error loading state: {e}")
         return {}
+
+def archive_previous_run(directory: str, names: List[str]) -> Optional[str]:
+    """이전 실행의 상태 파일/폴더를 directory/archive/<시각>/ 으로 옮깁니다.
+    
+    새로 시작하는 실행이 이전 실행의 저널이나 중간 저장본에 이어 쓰지 않도록 합니다.
+    옮긴 것이 없으면 None 을 반환합니다.
+    """
+    existing = [name for name in names if os.path.exists(os.path.join(directory, name))]
+    if not existing:
+        return None
+    
+    archive_dir = os.path.join(directory, "archive", datetime.now().strftime('%Y%m%d_%H%M%S_%f'))
+    os.makedirs(archive_dir)
+    for name in existing:
+        shutil.move(os.path.join(directory, name), os.path.join(archive_dir, name))
+    logging.info(f"Archived previous run state ({', '.join(existing)}) to {archive_dir}")
+    return archive_dir
+
+class StateJournal:
+    """추가 전용(append-only) 상태 저널
+    
+    매 반복마다 전체 상태를 다시 쓰는 대신, 그 반복에서 바뀐 내용(새 질문/답변, 현재 질문 등)만
+    한 줄의 JSON 레코드로 저널 파일에 덧붙입니다. snapshot_interval 반복마다 전체 상태를
+    state.json 스냅샷으로 원자적으로 저장하고 저널을 비웁니다.
+    복구 시에는 마지막 스냅샷을 읽고 그 이후의 저널 레코드를 순서대로 재적용합니다.
+    
+    레코드와 스냅샷에는 실행 ID 가 기록되며, 복구 시 스냅샷과 다른 실행의 레코드는 무시합니다.
+    새 실행은 new_run() 으로 ID 를 만들고, 이어서 실행할 때는 load() 가 이전 ID 를 이어받습니다.
+    
+    fsync 정책:
+        "always"   - 레코드마다 디스크에 동기화 (가장 안전, 가장 느림)
+        "interval" - fsync_interval 초마다 동기화
+        "never"    - 운영체제에 맡김 (프로세스 종료에는 안전, 전원 장애에는 취약)
+    """
+    
+    def __init__(self, snapshot_name: str = "state.json", journal_name: str = "state_journal.jsonl",
+                 fsync: str = None, fsync_interval: float = None, snapshot_interval: int = None,
+                 directory: str = None):
+        self.directory = directory or config.OUTPUT_DIR
+        self.snapshot_name = snapshot_name
+        self.journal_path = os.path.join(self.directory, journal_name)
+        self.fsync = config.STATE_FSYNC if fsync is None else fsync
+        self.fsync_interval = config.STATE_FSYNC_INTERVAL if fsync_interval is None else fsync_interval
+        self.snapshot_interval = config.STATE_SNAPSHOT_INTERVAL if snapshot_interval is None else snapshot_interval
+        self.records_since_snapshot = 0
+        self.run_id: Optional[str] = None
+        self._file = None
+        self._last_sync = time.monotonic()
+    
+    @property
+    def snapshot_path(self) -> str:
+        return os.path.join(self.directory, self.snapshot_name)
+    
+    def new_run(self) -> str:
+        """새 실행 ID 를 만듭니다. 이후 기록되는 레코드와 스냅샷에 포함됩니다."""
+        self.run_id = uuid.uuid4().hex[:12]
+        return self.run_id
+    
+    def _open(self):
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.journal_path), exist_ok=True)
+            self._file = open(self.journal_path, 'a', encoding='utf-8')
+        return self._file
+    
+    def append(self, record: Dict[str, Any]):
+        """변경 레코드 하나를 저널에 추가합니다."""
+        if self.run_id is not None:
+            record = {"run": self.run_id, **record}
+        f = self._open()
+        f.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+        f.flush()
+        
+        now = time.monotonic()
+        if self.fsync == "always" or (self.fsync == "interval" and now - self._last_sync >= self.fsync_interval):
+            os.fsync(f.fileno())
+            self._last_sync = now
+        
+        self.records_since_snapshot += 1
+    
+    def snapshot_due(self) -> bool:
+        """스냅샷을 만들 때가 되었는지 여부"""
+        return self.records_since_snapshot >= self.snapshot_interval
+    
+    def snapshot(self, state: Dict[str, Any]):
+        """전체 상태를 스냅샷으로 저장하고 저널을 비웁니다."""
+        if self.run_id is not None:
+            state = {**state, "run_id": self.run_id}
+        save_state(state, self.snapshot_name, self.directory)
+        
+        # 스냅샷이 디스크에 반영된 뒤에 저널을 비움 (그 사이 중단되면 복구 시 반복 번호로 중복을 건너뜀)
+        self.close()
+        with open(self.journal_path, 'w', encoding='utf-8'):
+            pass
+        self.records_since_snapshot = 0
+    
+    def load(self, max_history: int = config.MAX_CONVERSATION_HISTORY) -> Dict[str, Any]:
+        """마지막 스냅샷에 저널을 재적용하여 상태를 복구합니다."""
+        state = load_state(self.snapshot_name, self.directory)
+        self.run_id = state.get("run_id")
+        
+        if not os.path.exists(self.journal_path):
+            return state
+        
+        # 요약 대기 중인 대화는 최근 대화 바로 앞에 이어지므로 하나의 목록으로 재구성
+        pending = [tuple(turn) for turn in state.get("summary_pending", [])]
+        turns = pending + [tuple(turn) for turn in state.get("conversation_history", [])]
+        pending_count = len(pending)
+        replayed = 0
+        skipped = 0
+        
+        with open(self.journal_path, 'r', encoding='utf-8') as f:
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # 기록 도중 중단된 마지막 줄은 버림
+                    logging.warning(f"Ignoring truncated journal record at line {line_number}")
+                    break
+                
+                # 스냅샷이 없으면 저널의 첫 레코드가 속한 실행을 이어받음
+                if not state and not replayed and self.run_id is None:
+                    self.run_id = record.get("run")
+                if record.get("run") != self.run_id:
+                    skipped += 1
+                    continue
+                if record.get("iteration", 0) <= state.get("iteration", 0):
+                    continue
+                
+                turns.append(tuple(record["turn"]))
+                for key in ("iteration", "current_question", "current_module", "last_updated"):
+                    if key in record:
+                        state[key] = record[key]
+                if "summary" in record:
+                    state["summary"] = record["summary"]
+                pending_count = record.get("pending_count", pending_count)
+                replayed += 1
+        
+        if replayed:
+            history_start = max(0, len(turns) - max_history)
+            state["conversation_history"] = turns[history_start:]
+            state["summary_pending"] = turns[max(0, history_start - pending_count):history_start]
+            logging.info(f"Replayed {replayed} journal records on top of snapshot")
+        if skipped:
+            logging.warning(f"Ignored {skipped} journal records from another run")
+        
+        self.records_since_snapshot = replayed
+        return state
+    
+    def close(self):
+        """저널 파일을 디스크에 동기화하고 닫습니다."""
+        if self._file is not None:
+            self._file.flush()
+            if self.fsync != "never":
+                os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
+
+class ProjectCheckpointer:
+    """프로젝트 중간 저장을 담당합니다.
+    
+    컴포넌트마다 별도의 JSON 파일로 저장하고, 마지막 저장 이후 바뀐 컴포넌트만 다시 씁니다.
+    스니펫 저장소에 기록이 끝나 메모리에서 내린 코드는 파일에서 다시 읽지 않고 저장소 참조(digest, filename)로
+    기록합니다. store 가 주어지면 컴포넌트 파일과 메타 파일을 쓰기 전에 그때까지 넘긴 스니펫 기록이
+    끝나기를 기다려, 실행이 중단되어도 중간 저장본이 디스크에 없는 스니펫 파일을 가리키지 않습니다.
+    변경된 컴포넌트의 사전 변환만 호출한 스레드에서 하고, 직렬화와 디스크 쓰기는
+    백그라운드 스레드에서 임시 파일 + 이름 변경 방식으로 처리하여 생성 루프가 멈추지 않습니다.
+    """
+    
+    META_FILE = "project_meta.json"
+    
+    def __init__(self, directory: str = None, store=None):
+        self.directory = directory or os.path.join(config.OUTPUT_DIR, "checkpoint")
+        self.store = store
+        self._versions: Dict[int, Tuple] = {}
+        self._jobs: "queue.Queue" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+    
+    @staticmethod
+    def _version(component) -> Tuple:
+        """컴포넌트 변경 여부를 판단하기 위한 값 (기능과 스니펫은 추가만 되므로 개수로 충분)"""
+        return (
+            component.name,
+            component.description,
+            len(component.aliases),
+            len(component.features),
+            sum(len(feature.code_snippets) for feature in component.features)
+        )
+    
+    def _component_path(self, index: int) -> str:
+        return os.path.join(self.directory, f"component_{index:05d}.json")
+    
+    def mark_saved(self, project: Project):
+        """불러온 프로젝트를 이미 저장된 상태로 표시합니다.
+        
+        중간 저장 파일이 없으면(예: project.json 에서 복구한 경우) 아무것도 표시하지 않아
+        다음 save 에서 모든 컴포넌트 파일을 씁니다.
+        """
+        if not os.path.exists(os.path.join(self.directory, self.META_FILE)):
+            self._versions = {}
+            return
+        self._versions = {index: self._version(component) for index, component in enumerate(project.components)}
+    
+    def save(self, project: Project) -> int:
+        """바뀐 컴포넌트를 백그라운드 저장 대기열에 넣고, 그 개수를 반환합니다."""
+        changed = []
+        for index, component in enumerate(project.components):
+            version = self._version(component)
+            if self._versions.get(index) != version:
+                changed.append((index, component.to_dict(inline_code=False)))
+                self._versions[index] = version
+        
+        meta = {
+            "name": project.name,
+            "description": project.description,
+            "component_count": len(project.components),
+            "created_at": project.created_at.isoformat(),
+            "updated_at": project.updated_at.isoformat()
+        }
+        
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run_worker, name="project-checkpoint", daemon=True)
+            self._worker.start()
+        self._jobs.put((meta, changed))
+        
+        return len(changed)
+    
+    def _run_worker(self):
+        while True:
+            job = self._jobs.get()
+            try:
+                if job is None:
+                    break
+                meta, changed = job
+                # 컴포넌트 파일이 참조할 수 있는 스니펫 파일이 먼저 디스크에 있도록 함
+                if self.store is not None:
+                    self.store.wait()
+                for index, data in changed:
+                    atomic_write_json(self._component_path(index), data)
+                # 메타 파일은 컴포넌트 파일이 모두 쓰인 뒤에 갱신
+                atomic_write_json(os.path.join(self.directory, self.META_FILE), meta)
+            except Exception as e:
+                logging.error(f"Project checkpoint failed: {e}")
+            finally:
+                self._jobs.task_done()
+    
+    def flush(self):
+        """대기 중인 저장이 모두 끝날 때까지 기다립니다."""
+        if self._worker is not None and self._worker.is_alive():
+            self._jobs.join()
+    
+    def close(self):
+        """대기 중인 저장을 마치고 작업 스레드를 종료합니다."""
+        self.flush()
+        if self._worker is not None and self._worker.is_alive():
+            self._jobs.put(None)
+            self._worker.join()
+    
+    @classmethod
+    def load(cls, directory: str = None, base_dir: str = None) -> Optional[Project]:
+        """중간 저장된 프로젝트를 불러옵니다. 없으면 None.
+        
+        base_dir 는 스니펫 저장소가 있는 출력 폴더입니다 (기본값: config.OUTPUT_DIR).
+        """
+        base_dir = base_dir or config.OUTPUT_DIR
+        directory = directory or os.path.join(base_dir, "checkpoint")
+        meta_path = os.path.join(directory, cls.META_FILE)
+        if not os.path.exists(meta_path):
+            return None
+        
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        
+        # 스니펫 코드는 저장소 참조로 기록되어 있으므로 필요할 때 저장소 파일에서 읽음
+        components = []
+        for index in range(meta.get("component_count", 0)):
+            with open(os.path.join(directory, f"component_{index:05d}.json"), 'r', encoding='utf-8') as f:
+                components.append(Component.from_dict(json.load(f), base_dir))
+        
+        return Project(
+            name=meta.get("name", ""),
+            description=meta.get("description", ""),
+            components=components,
+            created_at=datetime.fromisoformat(meta["created_at"]) if meta.get("created_at") else datetime.now(),
+            updated_at=datetime.fromisoformat(meta["updated_at"]) if meta.get("updated_at") else datetime.now()
+        )